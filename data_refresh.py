@@ -24,6 +24,7 @@ from collections import defaultdict
 # 导入项目模块
 from database import DatabaseManager
 from enhanced_data_fetcher import EnhancedDataFetcher
+from utils import get_failed_log_path, append_failed_record, replay_failed_log
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -639,7 +640,11 @@ class DataRefreshManager:
             with open(progress_file, 'r', encoding='utf-8') as f:
                 progress_data = json.load(f)
             
-            failed_symbols = progress_data.get('failed_symbols', [])
+            # 失败股票记录在失败日志中（旧版进度文件中仍可能带有列表）
+            failed_log_path = get_failed_log_path(progress_file)
+            failed_set = set(progress_data.get('failed_symbols', []))
+            replay_failed_log(failed_log_path, failed_set, set())
+            failed_symbols = sorted(failed_set)
             if not failed_symbols:
                 logger.info("没有失败的股票需要检查")
                 return {'total_failed': 0, 'checked': 0, 'cleaned': 0, 'still_failed': 0}
@@ -675,7 +680,8 @@ class DataRefreshManager:
             
             # 更新进度文件
             if cleaned_symbols:
-                progress_data['failed_symbols'] = still_failed_symbols
+                if 'failed_symbols' in progress_data:
+                    progress_data['failed_symbols'] = still_failed_symbols
                 progress_data['failed_count'] = len(still_failed_symbols)
                 progress_data['last_cleanup'] = datetime.now().isoformat()
                 
@@ -685,9 +691,13 @@ class DataRefreshManager:
                     json.dump(progress_data, f, indent=2, ensure_ascii=False)
                 logger.info(f"原进度文件已备份到: {backup_file}")
                 
-                # 写入更新后的文件
+                # 写入更新后的文件，并在失败日志中标记已恢复的股票
                 with open(progress_file, 'w', encoding='utf-8') as f:
                     json.dump(progress_data, f, indent=2, ensure_ascii=False)
+                with open(failed_log_path, 'a', encoding='utf-8') as f:
+                    for symbol in cleaned_symbols:
+                        append_failed_record(f, symbol, 'recovered')
+                self.db.upsert_batch_state([(symbol, 'ok', 0, '') for symbol in cleaned_symbols])
                 
                 logger.info(f"进度文件已更新，清除了 {len(cleaned_symbols)} 只股票")
             
@@ -15,6 +15,13 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _date_column_as_text(data: pd.DataFrame) -> pd.DataFrame:
+    """日期列为datetime类型时转换为 YYYY-MM-DD 文本（SQLite以TEXT存储日期）"""
+    if 'date' in data.columns and pd.api.types.is_datetime64_any_dtype(data['date']):
+        return data.assign(date=data['date'].dt.strftime('%Y-%m-%d'))
+    return data
+
+
 class DatabaseManager:
     """SQLite数据库管理类"""
     
@@ -116,6 +123,35 @@ class DatabaseManager:
                 )
             ''')
             
+            # 批量更新状态表（每只股票一行）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS batch_state (
+                    symbol TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    records INTEGER DEFAULT 0,
+                    last_err TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 技术指标递推状态表（每只股票一行，保存EMA类指标末行的递推值，用于热启动）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS indicator_state (
+                    symbol TEXT PRIMARY KEY,
+                    date DATE NOT NULL,
+                    params TEXT NOT NULL,
+                    close REAL NOT NULL,
+                    ema_fast REAL,
+                    ema_slow REAL,
+                    macd_signal REAL,
+                    rsi_avg_gain REAL,
+                    rsi_avg_loss REAL,
+                    kdj_k REAL,
+                    kdj_d REAL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
             # 创建索引以提高查询性能
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_data_symbol_date ON daily_data(symbol, date)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_technical_indicators_symbol_date ON technical_indicators(symbol, date)')
@@ -188,7 +224,8 @@ class DatabaseManager:
         """
         if data.empty:
             return 0
-            
+        
+        data = _date_column_as_text(data)
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -225,6 +262,59 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    def insert_daily_data_batch(self, frames: List[tuple]) -> int:
+        """
+        批量插入多只股票的日线数据（单个事务）
+        
+        Args:
+            frames: (股票代码, 日线数据DataFrame) 列表
+            
+        Returns:
+            插入的记录数
+        """
+        records = []
+        for symbol, data in frames:
+            if data.empty:
+                continue
+            data = _date_column_as_text(data)
+            for row in data.itertuples(index=False):
+                records.append((
+                    symbol,
+                    getattr(row, 'date', ''),
+                    getattr(row, 'open', 0),
+                    getattr(row, 'high', 0),
+                    getattr(row, 'low', 0),
+                    getattr(row, 'close', 0),
+                    getattr(row, 'volume', 0),
+                    getattr(row, 'amount', 0),
+                    getattr(row, 'turnover_rate', 0)
+                ))
+        
+        if not records:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO daily_data 
+                (symbol, date, open, high, low, close, volume, amount, turnover_rate, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', records)
+            
+            conn.commit()
+            inserted_count = cursor.rowcount
+            logger.info(f"批量插入 {len(frames)} 只股票日线数据 {inserted_count} 条")
+            return inserted_count
+            
+        except Exception as e:
+            logger.error(f"批量插入日线数据失败: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
     def get_stock_list(self) -> pd.DataFrame:
         """
         获取股票列表
@@ -243,6 +333,23 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    def get_stock_symbols(self) -> List[str]:
+        """
+        获取全部股票代码，不构建DataFrame
+        
+        Returns:
+            按代码排序的股票代码列表
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute("SELECT symbol FROM stock_info ORDER BY symbol")
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"获取股票代码列表失败: {e}")
+            return []
+        finally:
+            conn.close()
+    
     def get_stock_list_exclude_incomplete(self, report_file: str = "data/completeness_report.json") -> pd.DataFrame:
         """
         根据完整性报告获取数据完整的股票列表（排除不完整的股票）
@@ -324,6 +431,49 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    def get_stock_data_batch(self, symbols: List[str], days: int = 60,
+                             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        一次查询获取多只股票最近N天的历史数据
+        
+        Args:
+            symbols: 股票代码列表
+            days: 每只股票获取天数
+            columns: 需要读取的列（symbol、date 总会包含），默认读取全部列
+        
+        Returns:
+            历史数据DataFrame，按股票代码和日期正序排列
+        """
+        if not symbols:
+            return pd.DataFrame()
+        
+        if columns:
+            select_columns = ', '.join(dict.fromkeys(['symbol', 'date', *columns]))
+        else:
+            select_columns = '*'
+        
+        conn = self.get_connection()
+        try:
+            placeholders = ','.join(['?' for _ in symbols])
+            query = f'''
+                SELECT * FROM (
+                    SELECT {select_columns}, ROW_NUMBER() OVER (
+                        PARTITION BY symbol ORDER BY date DESC
+                    ) AS rn
+                    FROM daily_data
+                    WHERE symbol IN ({placeholders})
+                )
+                WHERE rn <= ?
+                ORDER BY symbol, date
+            '''
+            df = pd.read_sql_query(query, conn, params=list(symbols) + [days])
+            return df.drop(columns=['rn']).reset_index(drop=True)
+        except Exception as e:
+            logger.error(f"批量获取股票数据失败: {e}")
+            return pd.DataFrame()
+        finally:
+            conn.close()
+    
     def get_last_update_date(self, symbol: str) -> Optional[str]:
         """
         获取指定股票的最后更新日期
@@ -353,6 +503,35 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    def get_last_update_dates(self, symbols: List[str]) -> Dict[str, str]:
+        """
+        一次查询获取多只股票的最后更新日期
+        
+        Args:
+            symbols: 股票代码列表
+        
+        Returns:
+            {股票代码: 最后更新日期字符串}，没有数据的股票不包含在内
+        """
+        if not symbols:
+            return {}
+        
+        conn = self.get_connection()
+        try:
+            placeholders = ','.join(['?' for _ in symbols])
+            cursor = conn.execute(f'''
+                SELECT symbol, MAX(date) as last_date
+                FROM daily_data
+                WHERE symbol IN ({placeholders})
+                GROUP BY symbol
+            ''', list(symbols))
+            return {row['symbol']: row['last_date'] for row in cursor.fetchall() if row['last_date']}
+        except Exception as e:
+            logger.error(f"批量获取最后更新日期失败: {e}")
+            return {}
+        finally:
+            conn.close()
+    
     def insert_technical_indicators(self, symbol: str, indicators_data: pd.DataFrame) -> int:
         """
         插入技术指标数据
@@ -498,7 +677,7 @@ class DatabaseManager:
         
         try:
             # 清除所有表的数据
-            tables = ['selection_results', 'technical_indicators', 'daily_data', 'stock_info']
+            tables = ['selection_results', 'technical_indicators', 'indicator_state', 'daily_data', 'stock_info']
             
             for table in tables:
                 cursor.execute(f'DELETE FROM {table}')
@@ -554,6 +733,8 @@ class DatabaseManager:
         cursor = conn.cursor()
         
         try:
+            # 递推状态由日线数据算出，随日线数据一起清除
+            cursor.execute('DELETE FROM indicator_state')
             cursor.execute('DELETE FROM daily_data')
             conn.commit()
             
@@ -568,6 +749,164 @@ class DatabaseManager:
         finally:
             conn.close()
     
+    def upsert_batch_state(self, rows: List[tuple]) -> int:
+        """
+        批量写入股票的批处理状态（单个事务）
+        
+        Args:
+            rows: (股票代码, 状态, 记录数, 错误信息) 列表，状态为 ok / failed / paused
+        
+        Returns:
+            写入的行数
+        """
+        if not rows:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO batch_state
+                (symbol, status, records, last_err, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', rows)
+            
+            conn.commit()
+            return cursor.rowcount
+        
+        except Exception as e:
+            logger.error(f"写入批处理状态失败: {e}")
+            conn.rollback()
+            return 0
+        finally:
+            conn.close()
+    
+    def get_indicator_states(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        一次查询获取多只股票保存的技术指标递推状态
+        
+        Args:
+            symbols: 股票代码列表
+        
+        Returns:
+            {股票代码: 状态字典}，没有保存状态的股票不包含在内
+        """
+        if not symbols:
+            return {}
+        
+        conn = self.get_connection()
+        try:
+            placeholders = ','.join(['?' for _ in symbols])
+            cursor = conn.execute(f'''
+                SELECT symbol, date, params, close, ema_fast, ema_slow, macd_signal,
+                       rsi_avg_gain, rsi_avg_loss, kdj_k, kdj_d
+                FROM indicator_state
+                WHERE symbol IN ({placeholders})
+            ''', list(symbols))
+            return {row['symbol']: dict(row) for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"批量获取技术指标状态失败: {e}")
+            return {}
+        finally:
+            conn.close()
+    
+    def upsert_indicator_states(self, rows: List[tuple]) -> int:
+        """
+        批量写入技术指标递推状态（单个事务）
+        
+        Args:
+            rows: (股票代码, 日期, 参数标识, 收盘价, ema_fast, ema_slow, macd_signal,
+                   rsi_avg_gain, rsi_avg_loss, kdj_k, kdj_d) 列表
+        
+        Returns:
+            写入的行数
+        """
+        if not rows:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO indicator_state
+                (symbol, date, params, close, ema_fast, ema_slow, macd_signal,
+                 rsi_avg_gain, rsi_avg_loss, kdj_k, kdj_d, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', rows)
+            
+            conn.commit()
+            return cursor.rowcount
+        
+        except Exception as e:
+            logger.error(f"写入技术指标状态失败: {e}")
+            conn.rollback()
+            return 0
+        finally:
+            conn.close()
+    
+    def get_batch_state_counts(self) -> Dict[str, int]:
+        """
+        按状态统计批处理股票数量
+        
+        Returns:
+            {状态: 股票数}
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute('SELECT status, COUNT(*) AS count FROM batch_state GROUP BY status')
+            return {row['status']: row['count'] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"统计批处理状态失败: {e}")
+            return {}
+        finally:
+            conn.close()
+    
+    def get_batch_state_symbols(self, statuses: List[str]) -> List[str]:
+        """
+        获取指定状态的股票代码
+        
+        Args:
+            statuses: 状态列表
+        
+        Returns:
+            按代码排序的股票代码列表
+        """
+        conn = self.get_connection()
+        try:
+            placeholders = ','.join(['?' for _ in statuses])
+            cursor = conn.execute(
+                f'SELECT symbol FROM batch_state WHERE status IN ({placeholders}) ORDER BY symbol',
+                list(statuses))
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"获取批处理状态股票失败: {e}")
+            return []
+        finally:
+            conn.close()
+    
+    def clear_batch_state(self) -> bool:
+        """
+        清空批处理状态表（开始新一轮批处理时调用）
+        
+        Returns:
+            清除是否成功
+        """
+        conn = self.get_connection()
+        
+        try:
+            conn.execute('DELETE FROM batch_state')
+            conn.commit()
+            return True
+        
+        except Exception as e:
+            logger.error(f"清空批处理状态表失败: {e}")
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+    
     def backup_database(self, backup_path: str = None) -> bool:
         """
         备份数据库
@@ -5,16 +5,27 @@
 """
 
 import akshare as ak
+import numpy as np
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, date, timedelta
 from typing import List, Optional, Dict, Tuple
 import time
 import logging
 import random
 import math
+import re
+import io
+import os
+import threading
+import hashlib
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from database import DatabaseManager
 import warnings
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 
 # 忽略警告信息
@@ -24,6 +35,102 @@ warnings.filterwarnings('ignore')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 从异常信息中提取 Retry-After 秒数
+_RETRY_AFTER_RE = re.compile(r'retry[-_ ]after\D{0,3}(\d+(?:\.\d+)?)', re.I)
+
+# ST、退市股票名称匹配
+_ST_PATTERN = re.compile(r'ST|退')
+
+# 永久性错误（不需要重试）：HTTP状态码与兜底的错误信息匹配
+_PERMANENT_HTTP = frozenset({404, 410})
+_PERM_RE = re.compile(r'not found|404|invalid symbol|delisted|suspended', re.I)
+
+# 日期格式
+_FMT_YMD = '%Y%m%d'
+_FMT_DATE = '%Y-%m-%d'
+
+# 股票列表列名映射
+_STOCK_LIST_COLMAP = {
+    '代码': 'symbol',
+    '名称': 'name',
+    '最新价': 'price',
+    '涨跌幅': 'change_pct',
+    '涨跌额': 'change_amount',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '振幅': 'amplitude',
+    '最高': 'high',
+    '最低': 'low',
+    '今开': 'open',
+    '昨收': 'pre_close',
+    '换手率': 'turnover_rate',
+    '市盈率-动态': 'pe_ratio',
+    '市净率': 'pb_ratio',
+    '总市值': 'total_market_cap',
+    '流通市值': 'circulating_market_cap'
+}
+_STOCK_LIST_COLS_FROZEN = frozenset(_STOCK_LIST_COLMAP)
+
+# 历史数据列名映射
+_HIST_COLMAP = {
+    '日期': 'date',
+    '开盘': 'open',
+    '收盘': 'close',
+    '最高': 'high',
+    '最低': 'low',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '振幅': 'amplitude',
+    '涨跌幅': 'change_pct',
+    '涨跌额': 'change_amount',
+    '换手率': 'turnover_rate'
+}
+_HIST_COLS_FROZEN = frozenset(_HIST_COLMAP)
+_HIST_SCHEMA_FROZEN = frozenset(_HIST_COLMAP.values())
+
+# 东方财富K线接口（直连，跳过akshare的DataFrame重命名与类型转换）
+EASTMONEY_KLINE_URL = "https://push2his.eastmoney.com/api/qt/stock/kline/get"
+_EASTMONEY_KLT = {'daily': '101', 'weekly': '102', 'monthly': '103'}
+_EASTMONEY_KLINE_COLUMNS = ['date', 'open', 'close', 'high', 'low', 'volume', 'amount',
+                            'amplitude', 'change_pct', 'change_amount', 'turnover_rate']
+# 解析时一律使用float64，价格和成交额原样保留到写库；需要省内存的列由 _downcast_history 在内存中处理
+_EASTMONEY_KLINE_DTYPES = {
+    'open': np.float64, 'close': np.float64, 'high': np.float64, 'low': np.float64,
+    'volume': np.int64, 'amount': np.float64,
+    'amplitude': np.float64, 'change_pct': np.float64,
+    'change_amount': np.float64, 'turnover_rate': np.float64
+}
+
+# 历史数据数值列
+_NUMERIC_COLS_HIST = ('open', 'close', 'high', 'low', 'volume', 'amount', 'turnover_rate')
+
+# 可安全降为float32的列：只包括不写入数据库的百分比类列。
+# 价格、成交额和换手率会写入数据库(REAL为float64)，float32只有约7位有效数字，
+# 会把 12.34 存成 12.34000015258789、把十亿级成交额存偏几十元，因此保持float64
+_FLOAT32_COLS_HIST = ('change_pct', 'amplitude')
+
+
+@lru_cache(maxsize=512)
+def _parse_date(value: str, fmt: str = _FMT_YMD) -> datetime:
+    """解析日期字符串（批量处理时相同日期反复出现，结果缓存）"""
+    return datetime.strptime(value, fmt)
+
+
+def _parse_eastmoney_klines(raw: str) -> pd.DataFrame:
+    """
+    解析东方财富K线文本（每行一根K线，逗号分隔）
+    
+    Args:
+        raw: 以换行连接的K线文本
+        
+    Returns:
+        已是目标列名与类型的历史数据DataFrame
+    """
+    if not raw:
+        return pd.DataFrame(columns=_EASTMONEY_KLINE_COLUMNS)
+    return pd.read_csv(io.StringIO(raw), header=None, names=_EASTMONEY_KLINE_COLUMNS,
+                       dtype=_EASTMONEY_KLINE_DTYPES, parse_dates=['date'])
+
 
 class NetworkStatus(Enum):
     """网络状态枚举"""
@@ -33,6 +140,18 @@ class NetworkStatus(Enum):
     BAD = "bad"             # 成功率 < 60%
 
 
+class CircuitState(Enum):
+    """熔断器状态枚举"""
+    CLOSED = "closed"        # 正常放行
+    OPEN = "open"            # 熔断中，直接拒绝请求
+    HALF_OPEN = "half_open"  # 冷却结束，放行少量探测请求
+
+
+class OpenCircuitError(Exception):
+    """熔断器处于打开状态时抛出的异常"""
+    pass
+
+
 @dataclass
 class RequestMetrics:
     """请求指标数据类"""
@@ -40,7 +159,7 @@ class RequestMetrics:
     successful_requests: int = 0
     failed_requests: int = 0
     total_time: float = 0.0
-    last_success_time: Optional[float] = None
+    last_success_time: Optional[float] = None  # time.monotonic() 时间戳
     consecutive_failures: int = 0
     
     @property
@@ -58,6 +177,179 @@ class RequestMetrics:
         return self.total_time / self.successful_requests
 
 
+class CircuitBreaker:
+    """熔断器 - CLOSED/OPEN/HALF_OPEN 三态"""
+    
+    def __init__(self,
+                 failure_threshold: int = 10,
+                 cooldown: float = 30.0,
+                 half_open_max_calls: int = 3):
+        """
+        初始化熔断器
+        
+        Args:
+            failure_threshold: 连续失败多少次后打开熔断器
+            cooldown: 打开后的冷却时间（秒）
+            half_open_max_calls: 半开状态下允许的探测请求数
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.half_open_max_calls = half_open_max_calls
+        
+        self._state = CircuitState.CLOSED
+        self.opened_at: Optional[float] = None
+        self._failure_count = 0
+        self._half_open_calls = 0
+        self._half_open_successes = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> CircuitState:
+        """当前状态（冷却结束时自动从OPEN进入HALF_OPEN）"""
+        with self._lock:
+            return self._current_state()
+    
+    def _current_state(self) -> CircuitState:
+        if (self._state == CircuitState.OPEN and
+                time.monotonic() - self.opened_at >= self.cooldown):
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+            self._half_open_successes = 0
+            logger.info("熔断器冷却结束，进入半开状态")
+        return self._state
+    
+    def allow_request(self) -> bool:
+        """判断是否放行请求，半开状态下会占用一个探测名额"""
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return True
+            if state == CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+    
+    def release(self):
+        """归还半开状态下占用的探测名额（请求结果不反映网络状况时调用）"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+    
+    def record_success(self):
+        """记录成功请求"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN:
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._close()
+            else:
+                self._failure_count = 0
+    
+    def record_failure(self):
+        """记录失败请求"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN:
+                self._open()
+                return
+            
+            self._failure_count += 1
+            if self._state == CircuitState.CLOSED and self._failure_count >= self.failure_threshold:
+                self._open()
+    
+    def _open(self):
+        self._state = CircuitState.OPEN
+        self.opened_at = time.monotonic()
+        logger.warning(f"熔断器打开，{self.cooldown:.0f} 秒内跳过请求")
+    
+    def _close(self):
+        self._state = CircuitState.CLOSED
+        self.opened_at = None
+        self._failure_count = 0
+        logger.info("探测请求成功，熔断器关闭")
+
+
+class TokenBucket:
+    """令牌桶限流器 - 允许突发，稳态速率受 refill_rate 限制"""
+    
+    def __init__(self, capacity: float = 8, refill_rate: float = 4.0,
+                 min_rate: float = 0.1, max_rate: Optional[float] = None):
+        """
+        初始化令牌桶
+        
+        Args:
+            capacity: 桶容量（允许的最大突发请求数）
+            refill_rate: 每秒补充的令牌数
+            min_rate: 补充速率下限
+            max_rate: 补充速率上限，默认等于初始速率
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else refill_rate
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.refill_rate)
+        self._last_refill = now
+    
+    def acquire(self) -> float:
+        """
+        获取一个令牌
+        
+        Returns:
+            需要等待的时间（秒），有可用令牌时为0
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            
+            # 预支令牌，调用方等待到令牌补足即可
+            wait = (1 - self._tokens) / self.refill_rate
+            self._tokens -= 1
+            return wait
+    
+    def wait(self) -> float:
+        """
+        阻塞等待直到获得令牌（所有线程共享同一个桶，整体速率受限）
+        
+        Returns:
+            实际等待的时间（秒）
+        """
+        delay = self.acquire()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+    
+    def slow_down(self):
+        """请求失败时降低补充速率"""
+        with self._lock:
+            self._refill()
+            self.refill_rate = max(self.min_rate, self.refill_rate * 0.8)
+    
+    def speed_up(self):
+        """请求成功时逐步恢复补充速率"""
+        with self._lock:
+            self._refill()
+            self.refill_rate = min(self.max_rate, self.refill_rate * 1.05)
+    
+    def throttle(self, factor: float = 0.5):
+        """网络状态差时按比例降低补充速率"""
+        with self._lock:
+            self._refill()
+            self.refill_rate = max(self.min_rate, self.refill_rate * factor)
+    
+    def restore(self):
+        """网络恢复后回到最大补充速率"""
+        with self._lock:
+            self._refill()
+            self.refill_rate = self.max_rate
+
+
 class FixedDelayManager:
     """固定延迟管理器 - 专为东方财富API优化"""
     
@@ -65,7 +357,8 @@ class FixedDelayManager:
                  min_delay: float = 0.3,
                  max_delay: float = 1.0,
                  retry_delay: float = 2.0,
-                 enterprise_mode: bool = False):
+                 enterprise_mode: bool = False,
+                 max_concurrent_requests: int = 8):
         """
         初始化固定延迟管理器
         
@@ -74,6 +367,7 @@ class FixedDelayManager:
             max_delay: 最大延迟时间（秒）
             retry_delay: 重试延迟时间（秒）
             enterprise_mode: 是否启用企业网络模式
+            max_concurrent_requests: 同时在途的网络请求上限
         """
         # 企业网络模式使用更保守的延迟设置
         if enterprise_mode:
@@ -89,24 +383,51 @@ class FixedDelayManager:
         
         self.metrics = RequestMetrics()
         self.enterprise_mode = enterprise_mode
+        self.circuit_breaker = CircuitBreaker()
+        self._lock = threading.Lock()
+        
+        # 自适应退避基数：成功时收缩，失败时放大
+        self._adaptive_base = self.min_delay
+        self._backoff_factor = 2.0
+        self._max_backoff = self.retry_delay * 5
+        
+        # 正常请求的令牌桶，企业模式下稳态速率为 1/min_delay
+        refill_rate = 1.0 / self.min_delay if enterprise_mode else 4.0
+        self.token_bucket = TokenBucket(capacity=8, refill_rate=refill_rate,
+                                        min_rate=1.0 / (self.max_delay * 4))
+        
+        # 并发上限：令牌桶控制速率，信号量控制同时在途的请求数
+        if enterprise_mode:
+            max_concurrent_requests = min(max_concurrent_requests, 2)
+        self.request_semaphore = threading.BoundedSemaphore(max_concurrent_requests)
     
-    def get_delay(self, is_retry: bool = False, retry_count: int = 0) -> float:
+    def get_delay(self, is_retry: bool = False, retry_count: int = 0,
+                  error: Optional[Exception] = None) -> float:
         """
         获取延迟时间
         
         Args:
             is_retry: 是否为重试请求
             retry_count: 重试次数
+            error: 上一次失败的异常（用于解析 Retry-After）
             
         Returns:
             延迟时间（秒）
         """
         if is_retry:
-            # 重试时使用固定延迟，避免过于激进
-            delay = self.retry_delay * (1 + retry_count * 0.5)  # 递增延迟
+            # 服务端明确给出 Retry-After 时以其为准，但不超过最大退避时间
+            if error is not None:
+                match = _RETRY_AFTER_RE.search(str(error))
+                if match:
+                    return min(self._max_backoff, float(match.group(1)))
+            
+            # 自适应指数退避 + 随机抖动
+            delay = min(self._max_backoff,
+                        self._adaptive_base * (self._backoff_factor ** retry_count))
+            delay += random.uniform(0, 0.5 * self._adaptive_base)
         else:
-            # 正常请求使用随机延迟，避免请求同步
-            delay = random.uniform(self.min_delay, self.max_delay)
+            # 正常请求由令牌桶限流，桶内有令牌时无需等待
+            delay = self.token_bucket.acquire()
         
         return delay
     
@@ -118,16 +439,31 @@ class FixedDelayManager:
             success: 请求是否成功
             response_time: 响应时间
         """
-        self.metrics.total_requests += 1
+        with self._lock:
+            self.metrics.total_requests += 1
+            
+            if success:
+                self.metrics.successful_requests += 1
+                self.metrics.total_time += response_time
+                self.metrics.last_success_time = time.monotonic()
+                self.metrics.consecutive_failures = 0
+                self._adaptive_base = max(self.min_delay, self._adaptive_base * 0.9)
+            else:
+                self.metrics.failed_requests += 1
+                self.metrics.consecutive_failures += 1
+                self._adaptive_base = min(self.max_delay * 4, self._adaptive_base * 1.5)
         
         if success:
-            self.metrics.successful_requests += 1
-            self.metrics.total_time += response_time
-            self.metrics.last_success_time = time.time()
-            self.metrics.consecutive_failures = 0
+            self.circuit_breaker.record_success()
+            self.token_bucket.speed_up()
         else:
-            self.metrics.failed_requests += 1
-            self.metrics.consecutive_failures += 1
+            self.circuit_breaker.record_failure()
+            self.token_bucket.slow_down()
+    
+    def snapshot_metrics(self) -> RequestMetrics:
+        """获取请求指标的一致性快照（多线程下避免读到更新一半的数据）"""
+        with self._lock:
+            return replace(self.metrics)
     
     def get_network_status(self) -> NetworkStatus:
         """获取当前网络状态"""
@@ -143,16 +479,8 @@ class FixedDelayManager:
             return NetworkStatus.BAD
     
     def should_pause(self) -> bool:
-        """判断是否应该暂停请求"""
-        # 连续失败超过15次，建议暂停（比之前更宽松）
-        if self.metrics.consecutive_failures > 15:
-            return True
-        
-        # 成功率过低且请求数量足够多，建议暂停
-        if self.metrics.total_requests > 30 and self.metrics.success_rate < 0.2:
-            return True
-        
-        return False
+        """判断是否应该暂停请求（熔断器处于打开状态）"""
+        return self.circuit_breaker.state == CircuitState.OPEN
 
 
 class EnhancedDataFetcher:
@@ -176,15 +504,45 @@ class EnhancedDataFetcher:
             self.retry_delays = [5, 15]  # 增加重试延迟
             self.request_timeout = 60  # 增加超时时间
             self.batch_pause_threshold = 0.3  # 提高暂停阈值
-            self.segment_days = 15  # 减少分段天数
             logger.info("增强版数据获取器初始化完成 - 企业网络模式")
         else:
             self.max_retry_times = 3
             self.retry_delays = [2, 5, 10]
             self.request_timeout = 30
             self.batch_pause_threshold = 0.2
-            self.segment_days = 30
             logger.info("增强版数据获取器初始化完成 - 使用东方财富优先数据源")
+        
+        # 复用的HTTP会话：连接池 + keep-alive，重试由本类自行控制
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                          '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Connection': 'keep-alive'
+        })
+        
+        # 历史数据缓存：内存LRU + 数据库旁的磁盘缓存
+        self._cache_dir = os.path.join(os.path.dirname(self.db.db_path) or '.', 'cache', 'history')
+        # 内存缓存的值为 (写入时间戳, DataFrame)，与磁盘缓存使用相同的过期时间点
+        self._memory_cache: "OrderedDict[str, Tuple[float, pd.DataFrame]]" = OrderedDict()
+        self._memory_cache_size = 2048
+        self._cache_lock = threading.Lock()
+        self._prune_history_cache()
+        
+        # 交易日历缓存，首次需要时获取（获取失败时为空列表）
+        self._trading_calendar: Optional[List[date]] = None
+        
+        # 各数据源按市场前缀统计的请求指标，用于动态调整数据源顺序
+        self._source_stats: Dict[Tuple[str, str], RequestMetrics] = defaultdict(RequestMetrics)
+        self._source_lock = threading.Lock()
+        self._source_explore_rate = 0.05
+        
+        # 批量更新时待写入数据库的日线数据
+        self._pending: List[Tuple[str, pd.DataFrame]] = []
+        self._pending_rows = 0
+        self._pending_flush_rows = 5000
     
     def get_stock_list(self) -> pd.DataFrame:
         """
@@ -195,13 +553,15 @@ class EnhancedDataFetcher:
         """
         logger.info("开始获取A股股票列表...")
         
+        last_error = None
         for attempt in range(self.max_retry_times):
             start_time = time.time()
             
             try:
                 # 应用延迟
                 if attempt > 0:
-                    delay = self.delay_manager.get_delay(is_retry=True, retry_count=attempt)
+                    delay = self.delay_manager.get_delay(is_retry=True, retry_count=attempt,
+                                                         error=last_error)
                     logger.info(f"重试前等待 {delay:.2f} 秒...")
                     time.sleep(delay)
                 
@@ -226,6 +586,7 @@ class EnhancedDataFetcher:
                 return stock_list
                 
             except Exception as e:
+                last_error = e
                 response_time = time.time() - start_time
                 self.delay_manager.record_request(False, response_time)
                 
@@ -256,31 +617,44 @@ class EnhancedDataFetcher:
         """
         # 设置默认日期范围
         if not end_date:
-            end_date = datetime.now().strftime('%Y%m%d')
+            end_date = datetime.now().strftime(_FMT_YMD)
         if not start_date:
-            start_date = (datetime.now() - timedelta(days=90)).strftime('%Y%m%d')
+            start_date = (datetime.now() - timedelta(days=90)).strftime(_FMT_YMD)
+        
+        # 优先读取缓存，命中时完全不访问网络
+        cache_key = self._cache_key(symbol, period, start_date, end_date)
+        cached = self._load_cached_history(cache_key)
+        if cached is not None:
+            logger.debug(f"股票 {symbol} 命中历史数据缓存，共 {len(cached)} 条记录")
+            return cached
         
+        last_error = None
         for attempt in range(self.max_retry_times):
+            # 熔断器打开时直接返回，不再等待
+            if not self.delay_manager.circuit_breaker.allow_request():
+                raise OpenCircuitError(f"熔断器已打开，跳过股票 {symbol}")
+            
             start_time = time.time()
             
             try:
                 # 应用延迟策略
                 if attempt > 0:
-                    delay = self.delay_manager.get_delay(is_retry=True, retry_count=attempt)
+                    delay = self.delay_manager.get_delay(is_retry=True, retry_count=attempt,
+                                                         error=last_error)
                     logger.debug(f"股票 {symbol} 重试前等待 {delay:.2f} 秒...")
                     time.sleep(delay)
                 else:
-                    # 正常请求延迟
-                    delay = self.delay_manager.get_delay()
-                    time.sleep(delay)
+                    # 正常请求由共享令牌桶统一限速
+                    self.delay_manager.token_bucket.wait()
                 
                 # 尝试多个数据源获取历史数据
-                hist_data = self._get_stock_history_multi_source(
-                    symbol=symbol,
-                    period=period,
-                    start_date=start_date,
-                    end_date=end_date
-                )
+                with self.delay_manager.request_semaphore:
+                    hist_data = self._get_stock_history_multi_source(
+                        symbol=symbol,
+                        period=period,
+                        start_date=start_date,
+                        end_date=end_date
+                    )
                 
                 response_time = time.time() - start_time
                 
@@ -295,24 +669,29 @@ class EnhancedDataFetcher:
                 # 记录成功请求
                 self.delay_manager.record_request(True, response_time)
                 
+                self._save_cached_history(cache_key, hist_data, end_date)
+                
                 logger.debug(f"成功获取股票 {symbol} 历史数据，共 {len(hist_data)} 条记录")
                 return hist_data
                 
             except Exception as e:
+                last_error = e
                 response_time = time.time() - start_time
-                self.delay_manager.record_request(False, response_time)
                 
-                # 详细错误日志 - 提升到INFO级别确保用户能看到
-                import traceback
-                logger.info(f"股票 {symbol} 获取数据异常: {type(e).__name__}: {str(e)}")
-                logger.info(f"错误堆栈: {traceback.format_exc()}")
+                # 永久性错误不反映网络状况，不计入失败统计
+                permanent = self._is_permanent_error(e)
+                if permanent:
+                    # 归还探测名额，避免半开状态下名额被永久性错误耗尽
+                    self.delay_manager.circuit_breaker.release()
+                else:
+                    self.delay_manager.record_request(False, response_time)
                 
-                # 打印到控制台确保用户能看到
-                print(f"❌ 股票 {symbol} 数据获取失败: {e}")
-                print(f"🔍 错误类型: {type(e).__name__}")
+                # 错误日志，仅在DEBUG级别下附带堆栈
+                logger.warning("股票 %s 获取数据异常: %s: %s", symbol, type(e).__name__, e,
+                               exc_info=logger.isEnabledFor(logging.DEBUG))
                 
                 # 根据错误类型决定是否继续重试
-                if self._is_permanent_error(e):
+                if permanent:
                     logger.debug(f"股票 {symbol} 遇到永久性错误，停止重试: {e}")
                     break
                 
@@ -326,6 +705,115 @@ class EnhancedDataFetcher:
         logger.debug(f"股票 {symbol} 历史数据获取最终失败")
         return pd.DataFrame()
     
+    def _cache_key(self, symbol: str, period: str, start_date: str, end_date: str) -> str:
+        """根据 (symbol, period, start, end) 生成缓存键"""
+        raw = f"{symbol}|{period}|{start_date}|{end_date}".encode('utf-8')
+        return hashlib.blake2b(raw, digest_size=8).hexdigest()
+    
+    def _cache_path(self, cache_key: str) -> str:
+        """缓存文件路径"""
+        return os.path.join(self._cache_dir, f"{cache_key}.pkl")
+    
+    def _load_cached_history(self, cache_key: str) -> Optional[pd.DataFrame]:
+        """
+        读取缓存的历史数据
+        
+        Args:
+            cache_key: 缓存键
+            
+        Returns:
+            缓存的DataFrame，未命中或已过期时返回None
+        """
+        cutoff = self._history_cache_cutoff()
+        with self._cache_lock:
+            entry = self._memory_cache.get(cache_key)
+            if entry is not None:
+                cached_at, hist_data = entry
+                if cached_at > cutoff:
+                    self._memory_cache.move_to_end(cache_key)
+                    return hist_data
+                del self._memory_cache[cache_key]
+        
+        path = self._cache_path(cache_key)
+        try:
+            if not os.path.exists(path):
+                return None
+            # 最近一次开盘前写入的缓存视为过期，顺便删除文件
+            cached_at = os.path.getmtime(path)
+            if cached_at <= cutoff:
+                os.remove(path)
+                return None
+            hist_data = pd.read_pickle(path)
+        except Exception as e:
+            logger.debug(f"读取历史数据缓存失败: {e}")
+            return None
+        
+        self._remember(cache_key, hist_data, cached_at)
+        return hist_data
+    
+    @staticmethod
+    def _history_cache_cutoff() -> float:
+        """缓存过期时间点（不晚于当前时刻的最近一次9:30开盘时刻的时间戳）"""
+        now = datetime.now()
+        last_open = now.replace(hour=9, minute=30, second=0, microsecond=0)
+        if last_open > now:
+            # 开盘前重复运行时，今日早些时候写入的缓存仍然有效
+            last_open -= timedelta(days=1)
+        return last_open.timestamp()
+    
+    def _prune_history_cache(self):
+        """删除最近一次开盘前写入的过期缓存文件，避免缓存目录无限增长"""
+        if not os.path.isdir(self._cache_dir):
+            return
+        
+        cutoff = self._history_cache_cutoff()
+        removed = 0
+        try:
+            with os.scandir(self._cache_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.pkl'):
+                        continue
+                    try:
+                        if entry.stat().st_mtime <= cutoff:
+                            os.remove(entry.path)
+                            removed += 1
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.debug(f"清理历史数据缓存失败: {e}")
+            return
+        
+        if removed:
+            logger.info(f"已清理 {removed} 个过期的历史数据缓存文件")
+    
+    def _save_cached_history(self, cache_key: str, hist_data: pd.DataFrame, end_date: str):
+        """
+        写入历史数据缓存（盘中包含今日未收盘数据时不写入）
+        
+        Args:
+            cache_key: 缓存键
+            hist_data: 清洗后的历史数据
+            end_date: 结束日期
+        """
+        now = datetime.now()
+        if end_date >= now.strftime(_FMT_YMD) and now.weekday() < 5 and 9 <= now.hour < 15:
+            return
+        
+        self._remember(cache_key, hist_data)
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            hist_data.to_pickle(self._cache_path(cache_key))
+        except Exception as e:
+            logger.debug(f"写入历史数据缓存失败: {e}")
+    
+    def _remember(self, cache_key: str, hist_data: pd.DataFrame, cached_at: Optional[float] = None):
+        """放入内存LRU缓存（cached_at 为数据写入时间，默认当前时间）"""
+        with self._cache_lock:
+            self._memory_cache[cache_key] = (cached_at or time.time(), hist_data)
+            self._memory_cache.move_to_end(cache_key)
+            if len(self._memory_cache) > self._memory_cache_size:
+                self._memory_cache.popitem(last=False)
+    
     def _is_permanent_error(self, error: Exception) -> bool:
         """
         判断是否为永久性错误（不需要重试）
@@ -336,92 +824,91 @@ class EnhancedDataFetcher:
         Returns:
             是否为永久性错误
         """
-        error_str = str(error).lower()
+        if isinstance(error, requests.HTTPError):
+            response = error.response
+            if response is not None:
+                return response.status_code in _PERMANENT_HTTP
         
-        # 常见的永久性错误
-        permanent_errors = [
-            'not found',
-            '404',
-            'invalid symbol',
-            'delisted',
-            'suspended'
-        ]
+        # 网络层异常一定是临时性的
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return False
         
-        return any(pe in error_str for pe in permanent_errors)
+        # 无法从类型判断时，回退到错误信息匹配
+        return bool(_PERM_RE.search(str(error)))
     
-    def update_stock_data_with_fixed_delay(self, symbol: str, days: int = 60) -> int:
+    def _fetch_missing_history(self, symbol: str, days: int = 60) -> pd.DataFrame:
         """
-        使用固定延迟更新单只股票数据 - 支持数据分段获取
+        获取数据库中尚缺失的历史数据（不写入数据库）
         
         Args:
             symbol: 股票代码
             days: 获取天数
             
         Returns:
-            更新的记录数
+            缺失区间的历史数据DataFrame，数据已是最新时返回空
         """
-        try:
-            # 检查数据库中最后更新日期
-            last_date = self.db.get_last_update_date(symbol)
+        # 检查数据库中最后更新日期
+        last_date = self.db.get_last_update_date(symbol)
+        
+        # 确定开始日期
+        if last_date:
+            start_date = (_parse_date(last_date, _FMT_DATE) + timedelta(days=1)).strftime(_FMT_YMD)
+        else:
+            start_date = (datetime.now() - timedelta(days=days)).strftime(_FMT_YMD)
+        
+        end_date = datetime.now().strftime(_FMT_YMD)
+        
+        # 如果开始日期大于等于结束日期，说明数据已是最新
+        if start_date >= end_date:
+            logger.debug(f"股票 {symbol} 数据已是最新")
+            return pd.DataFrame()
+        
+        # 东方财富接口不限制日期跨度，整段一次获取
+        return self.get_stock_history(symbol, start_date=start_date, end_date=end_date)
+    
+    def fetch_only(self, symbol: str, days: int = 60) -> pd.DataFrame:
+        """
+        获取单只股票缺失的历史数据但不写库，供调用方批量写入
+        
+        Args:
+            symbol: 股票代码
+            days: 获取天数
             
-            # 确定开始日期
-            if last_date:
-                start_date = (datetime.strptime(last_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y%m%d')
-            else:
-                start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
+        Returns:
+            缺失区间的历史数据DataFrame，失败或已是最新时返回空
+        """
+        try:
+            return self._fetch_missing_history(symbol, days)
             
-            end_date = datetime.now().strftime('%Y%m%d')
+        except OpenCircuitError:
+            raise
+        except Exception as e:
+            logger.error("获取股票 %s 数据失败: %s: %s", symbol, type(e).__name__, e,
+                         exc_info=logger.isEnabledFor(logging.DEBUG))
+            return pd.DataFrame()
+    
+    def update_stock_data_with_fixed_delay(self, symbol: str, days: int = 60) -> int:
+        """
+        使用固定延迟更新单只股票数据
+        
+        Args:
+            symbol: 股票代码
+            days: 获取天数
             
-            # 如果开始日期大于等于结束日期，说明数据已是最新
-            if start_date >= end_date:
-                logger.debug(f"股票 {symbol} 数据已是最新")
+        Returns:
+            更新的记录数
+        """
+        try:
+            hist_data = self._fetch_missing_history(symbol, days)
+            if hist_data.empty:
                 return 0
+            return self.db.insert_daily_data(symbol, hist_data)
             
-            # 计算日期差，决定是否需要分段获取
-            start_dt = datetime.strptime(start_date, '%Y%m%d')
-            end_dt = datetime.strptime(end_date, '%Y%m%d')
-            date_diff = (end_dt - start_dt).days
-            
-            total_records = 0
-            
-            if date_diff > self.segment_days:
-                # 需要分段获取
-                logger.debug(f"股票 {symbol} 需要分段获取数据，总天数: {date_diff}")
-                
-                # 分成两段
-                mid_date = start_dt + timedelta(days=self.segment_days)
-                mid_date_str = mid_date.strftime('%Y%m%d')
-                
-                # 获取第一段数据
-                logger.debug(f"获取第一段数据: {start_date} 到 {mid_date_str}")
-                hist_data1 = self.get_stock_history(symbol, start_date=start_date, end_date=mid_date_str)
-                if not hist_data1.empty:
-                    total_records += self.db.insert_daily_data(symbol, hist_data1)
-                
-                # 延迟后获取第二段数据
-                delay = self.delay_manager.get_delay()
-                logger.debug(f"分段间延迟 {delay:.2f} 秒")
-                time.sleep(delay)
-                
-                # 获取第二段数据
-                second_start = (mid_date + timedelta(days=1)).strftime('%Y%m%d')
-                logger.debug(f"获取第二段数据: {second_start} 到 {end_date}")
-                hist_data2 = self.get_stock_history(symbol, start_date=second_start, end_date=end_date)
-                if not hist_data2.empty:
-                    total_records += self.db.insert_daily_data(symbol, hist_data2)
-                
-            else:
-                # 单次获取
-                hist_data = self.get_stock_history(symbol, start_date=start_date, end_date=end_date)
-                if not hist_data.empty:
-                    total_records = self.db.insert_daily_data(symbol, hist_data)
-            
-            return total_records
-            
+        except OpenCircuitError:
+            raise
         except Exception as e:
-            import traceback
-            logger.error(f"更新股票 {symbol} 数据失败: {type(e).__name__}: {str(e)}")
-            logger.error(f"详细错误堆栈: {traceback.format_exc()}")
+            logger.error("更新股票 %s 数据失败: %s: %s", symbol, type(e).__name__, e,
+                         exc_info=logger.isEnabledFor(logging.DEBUG))
             return 0
     
     # 保持向后兼容性
@@ -430,14 +917,16 @@ class EnhancedDataFetcher:
         return self.update_stock_data_with_fixed_delay(symbol, days)
     
     def batch_update_with_monitoring(self, symbols: Optional[List[str]] = None, 
-                                   days: int = 60, max_stocks: int = 100) -> Dict[str, int]:
+                                   days: int = 60, max_stocks: int = 100,
+                                   max_workers: int = 8) -> Dict[str, int]:
         """
-        带监控的批量更新股票数据
+        带监控的批量更新股票数据（线程池并发获取，主线程统一写库）
         
         Args:
             symbols: 股票代码列表
             days: 获取天数
             max_stocks: 最大处理股票数量
+            max_workers: 并发获取的线程数
             
         Returns:
             更新结果字典
@@ -455,26 +944,42 @@ class EnhancedDataFetcher:
         logger.info(f"开始批量更新 {total_stocks} 只股票的历史数据...")
         logger.info(f"初始网络状态: {self.delay_manager.get_network_status().value}")
         
-        for i, symbol in enumerate(symbols, 1):
-            try:
-                # 检查是否需要暂停
-                if self.delay_manager.should_pause():
-                    logger.warning(f"网络状态过差，暂停批处理。已处理 {i-1}/{total_stocks}")
-                    break
-                
-                logger.info(f"正在更新 {symbol} ({i}/{total_stocks})")
-                updated_count = self.update_stock_data_with_fixed_delay(symbol, days)
-                results[symbol] = updated_count
-                
-                # 每处理50只股票显示一次状态
-                if i % 50 == 0:
-                    status = self.delay_manager.get_network_status()
-                    success_rate = self.delay_manager.metrics.success_rate
-                    logger.info(f"进度: {i}/{total_stocks}, 网络状态: {status.value}, 成功率: {success_rate:.2%}")
-                
-            except Exception as e:
-                logger.error(f"更新股票 {symbol} 失败: {e}")
-                results[symbol] = 0
+        skipped_count = 0
+        
+        # 网络请求在线程池中执行（socket读取期间释放GIL），数据库写入留在主线程
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._fetch_missing_history, symbol, days): symbol
+                       for symbol in symbols}
+            
+            for i, future in enumerate(as_completed(futures), 1):
+                symbol = futures[future]
+                try:
+                    hist_data = future.result()
+                    results[symbol] = len(hist_data)
+                    logger.info(f"已更新 {symbol} ({i}/{total_stocks})")
+                    
+                    # 缓冲待写入数据，累计到一定行数后单事务批量写入
+                    if not hist_data.empty:
+                        self._pending.append((symbol, hist_data))
+                        self._pending_rows += len(hist_data)
+                        if self._pending_rows >= self._pending_flush_rows:
+                            self._flush_pending(results)
+                    
+                    # 每处理50只股票显示一次状态
+                    if i % 50 == 0:
+                        status = self.delay_manager.get_network_status()
+                        success_rate = self.delay_manager.metrics.success_rate
+                        logger.info(f"进度: {i}/{total_stocks}, 网络状态: {status.value}, 成功率: {success_rate:.2%}")
+                    
+                except OpenCircuitError:
+                    # 熔断期间直接跳过，不产生任何等待
+                    skipped_count += 1
+                    results[symbol] = 0
+                except Exception as e:
+                    logger.error(f"更新股票 {symbol} 失败: {e}")
+                    results[symbol] = 0
+        
+        self._flush_pending(results)
         
         # 统计结果
         total_updated = sum(results.values())
@@ -483,40 +988,147 @@ class EnhancedDataFetcher:
         
         logger.info(f"批量更新完成: 成功 {success_count}/{len(results)} 只股票")
         logger.info(f"共更新 {total_updated} 条记录，最终成功率: {final_success_rate:.2%}")
+        if skipped_count:
+            logger.warning(f"熔断期间跳过 {skipped_count} 只股票")
         
         return results
     
+    def update_stocks_bulk(self, symbols: List[str]) -> Dict[str, int]:
+        """
+        使用全市场实时行情快照一次性写入多只股票的当日数据
+        仅在收盘后可用，且只用于最后数据日期恰为上一交易日的股票（快照只有当日一根K线，
+        落后更多的股票若写入快照，缺失的日期将无法再补）；其余股票、快照中缺失或停牌的股票
+        需由调用方逐只获取
+        
+        Args:
+            symbols: 股票代码列表
+            
+        Returns:
+            {股票代码: 写入记录数} 字典，只包含成功写入的股票
+        """
+        now = datetime.now()
+        if now.weekday() >= 5 or now.hour < 15:
+            logger.debug("未收盘，跳过行情快照批量更新")
+            return {}
+        
+        # 只有数据已更新到上一交易日的股票才能直接补上当日K线
+        previous_day = self._previous_trading_day(now.date())
+        if previous_day is None:
+            return {}
+        last_dates = self.db.get_last_update_dates(symbols)
+        eligible = {symbol for symbol in symbols
+                    if str(last_dates.get(symbol, ''))[:10] == previous_day.isoformat()}
+        if not eligible:
+            logger.debug("没有数据恰好更新到上一交易日的股票，跳过行情快照批量更新")
+            return {}
+        
+        start_time = time.time()
+        try:
+            self.delay_manager.token_bucket.wait()
+            snapshot = ak.stock_zh_a_spot_em()
+        except Exception as e:
+            self.delay_manager.record_request(False, time.time() - start_time)
+            logger.warning("获取行情快照失败，改为逐只获取: %s", e)
+            return {}
+        self.delay_manager.record_request(True, time.time() - start_time)
+        
+        available_columns = [col for col in snapshot.columns if col in _STOCK_LIST_COLS_FROZEN]
+        snapshot = snapshot.loc[:, available_columns].rename(columns=_STOCK_LIST_COLMAP, copy=False)
+        snapshot = snapshot[snapshot['symbol'].isin(eligible)]
+        
+        # 停牌或无成交的股票没有当日K线
+        snapshot = snapshot[(snapshot['volume'] > 0) & snapshot['price'].notna()]
+        if snapshot.empty:
+            return {}
+        
+        today = pd.Timestamp(now.date())
+        frames = []
+        for row in snapshot.itertuples(index=False):
+            frames.append((row.symbol, pd.DataFrame({
+                'date': [today],
+                'open': [row.open],
+                'high': [row.high],
+                'low': [row.low],
+                'close': [row.price],
+                'volume': [row.volume],
+                'amount': [row.amount],
+                'turnover_rate': [getattr(row, 'turnover_rate', 0)]
+            })))
+        
+        try:
+            self.db.insert_daily_data_batch(frames)
+        except Exception as e:
+            logger.warning("行情快照批量写入失败，改为逐只获取: %s", e)
+            return {}
+        
+        logger.info(f"行情快照批量写入 {len(frames)} 只股票当日数据")
+        return {symbol: 1 for symbol, _ in frames}
+    
+    def _previous_trading_day(self, today: date) -> Optional[date]:
+        """
+        获取指定日期之前的最近一个交易日
+        
+        优先使用交易日历（每个实例只获取一次）；日历获取失败时退回上一个工作日。
+        节假日后的工作日不是交易日时不会有股票匹配，所有股票都走逐只获取，结果偏保守但不会漏数据
+        
+        Args:
+            today: 当前日期
+            
+        Returns:
+            上一交易日
+        """
+        if self._trading_calendar is None:
+            try:
+                calendar = ak.tool_trade_date_hist_sina()
+                self._trading_calendar = sorted(pd.to_datetime(calendar['trade_date']).dt.date)
+            except Exception as e:
+                logger.warning("获取交易日历失败，按上一个工作日处理: %s", e)
+                self._trading_calendar = []
+        
+        if self._trading_calendar:
+            earlier = [day for day in self._trading_calendar if day < today]
+            return earlier[-1] if earlier else None
+        
+        previous_day = today - timedelta(days=1)
+        while previous_day.weekday() >= 5:
+            previous_day -= timedelta(days=1)
+        return previous_day
+    
+    def _flush_pending(self, results: Dict[str, int]):
+        """
+        将缓冲的日线数据一次性写入数据库
+        
+        写入失败时保留缓冲区以便下次刷新重试，并将该批次内的股票结果记为0；
+        写入成功后才清空缓冲区并恢复对应股票的更新条数。
+        
+        Args:
+            results: 更新结果字典
+        """
+        if not self._pending:
+            return
+        
+        try:
+            self.db.insert_daily_data_batch(self._pending)
+        except Exception as e:
+            logger.error(f"批量写入 {len(self._pending)} 只股票数据失败: {e}")
+            for symbol, _ in self._pending:
+                results[symbol] = 0
+            return
+        
+        for symbol, data in self._pending:
+            results[symbol] = len(data)
+        self._pending = []
+        self._pending_rows = 0
+    
     def _clean_stock_list(self, stock_list: pd.DataFrame) -> pd.DataFrame:
         """清洗股票列表数据"""
-        # 重命名列
-        column_mapping = {
-            '代码': 'symbol',
-            '名称': 'name',
-            '最新价': 'price',
-            '涨跌幅': 'change_pct',
-            '涨跌额': 'change_amount',
-            '成交量': 'volume',
-            '成交额': 'amount',
-            '振幅': 'amplitude',
-            '最高': 'high',
-            '最低': 'low',
-            '今开': 'open',
-            '昨收': 'pre_close',
-            '换手率': 'turnover_rate',
-            '市盈率-动态': 'pe_ratio',
-            '市净率': 'pb_ratio',
-            '总市值': 'total_market_cap',
-            '流通市值': 'circulating_market_cap'
-        }
-        
         # 选择需要的列并重命名
-        available_columns = [col for col in column_mapping.keys() if col in stock_list.columns]
-        stock_list = stock_list[available_columns].copy()
-        stock_list.rename(columns=column_mapping, inplace=True)
+        available_columns = [col for col in stock_list.columns if col in _STOCK_LIST_COLS_FROZEN]
+        stock_list = stock_list.loc[:, available_columns].rename(columns=_STOCK_LIST_COLMAP, copy=False)
         
         # 过滤掉ST、*ST等特殊股票
         if 'name' in stock_list.columns:
-            stock_list = stock_list[~stock_list['name'].str.contains('ST|退', na=False)]
+            stock_list = stock_list[~stock_list['name'].str.contains(_ST_PATTERN, na=False)]
         
         # 过滤掉价格异常的股票
         if 'price' in stock_list.columns:
@@ -527,62 +1139,65 @@ class EnhancedDataFetcher:
         
         # 添加市场信息
         if 'symbol' in stock_list.columns:
-            stock_list['market'] = stock_list['symbol'].apply(self._get_market_info)
-        
-        # 重置索引
-        stock_list.reset_index(drop=True, inplace=True)
+            stock_list = stock_list.assign(market=self._get_market_info(stock_list['symbol']))
         
-        return stock_list
+        return stock_list.reset_index(drop=True)
     
-    def _get_market_info(self, symbol: str) -> str:
+    def _get_market_info(self, symbols: pd.Series) -> pd.Categorical:
         """根据股票代码判断所属市场"""
-        if symbol.startswith('00') or symbol.startswith('30'):
-            return '深圳'
-        elif symbol.startswith('60') or symbol.startswith('68'):
-            return '上海'
-        else:
-            return '其他'
+        symbols = symbols.astype(str)
+        market = np.select(
+            [symbols.str.startswith(('00', '30')), symbols.str.startswith(('60', '68'))],
+            ['深圳', '上海'],
+            default='其他'
+        )
+        return pd.Categorical(market, categories=['深圳', '上海', '其他'])
     
     def _clean_history_data(self, hist_data: pd.DataFrame) -> pd.DataFrame:
         """清洗历史数据"""
-        # 重命名列
-        column_mapping = {
-            '日期': 'date',
-            '开盘': 'open',
-            '收盘': 'close',
-            '最高': 'high',
-            '最低': 'low',
-            '成交量': 'volume',
-            '成交额': 'amount',
-            '振幅': 'amplitude',
-            '涨跌幅': 'change_pct',
-            '涨跌额': 'change_amount',
-            '换手率': 'turnover_rate'
-        }
-        
-        # 选择需要的列并重命名
-        available_columns = [col for col in column_mapping.keys() if col in hist_data.columns]
-        hist_data = hist_data[available_columns].copy()
-        hist_data.rename(columns=column_mapping, inplace=True)
+        if _HIST_COLS_FROZEN.isdisjoint(hist_data.columns):
+            # 已是目标列名（东方财富直连、腾讯数据源），只保留需要的列
+            available_columns = [col for col in hist_data.columns if col in _HIST_SCHEMA_FROZEN]
+            hist_data = hist_data.loc[:, available_columns]
+        else:
+            # 选择需要的列并重命名
+            available_columns = [col for col in hist_data.columns if col in _HIST_COLS_FROZEN]
+            hist_data = hist_data.loc[:, available_columns].rename(columns=_HIST_COLMAP, copy=False)
         
-        # 数据类型转换
-        if 'date' in hist_data.columns:
-            hist_data['date'] = pd.to_datetime(hist_data['date']).dt.strftime('%Y-%m-%d')
+        # 数据类型转换（类型已正确时跳过）
+        if 'date' in hist_data.columns and not pd.api.types.is_datetime64_any_dtype(hist_data['date']):
+            hist_data['date'] = pd.to_datetime(hist_data['date'])
         
         # 数值列转换
-        numeric_columns = ['open', 'close', 'high', 'low', 'volume', 'amount', 'turnover_rate']
-        for col in numeric_columns:
-            if col in hist_data.columns:
-                hist_data[col] = pd.to_numeric(hist_data[col], errors='coerce')
+        num_cols = [col for col in _NUMERIC_COLS_HIST
+                    if col in hist_data.columns and not pd.api.types.is_numeric_dtype(hist_data[col])]
+        if num_cols:
+            hist_data[num_cols] = hist_data[num_cols].apply(pd.to_numeric, errors='coerce')
         
         # 去除空值行
         hist_data.dropna(subset=['date', 'close'], inplace=True)
         
+        # 数值列降精度，减少内存占用
+        hist_data = self._downcast_history(hist_data)
+        
         # 按日期排序
-        hist_data.sort_values('date', inplace=True)
-        hist_data.reset_index(drop=True, inplace=True)
+        return hist_data.sort_values('date', ignore_index=True)
+    
+    def _downcast_history(self, hist_data: pd.DataFrame) -> pd.DataFrame:
+        """将百分比类列转换为float32，成交量转换为int64（含无穷值或空值的列保持原类型）"""
+        dtypes = {}
+        for col in _FLOAT32_COLS_HIST:
+            if (col in hist_data.columns and hist_data[col].dtype != np.float32
+                    and pd.api.types.is_numeric_dtype(hist_data[col])):
+                values = hist_data[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                if not np.isinf(values).any():
+                    dtypes[col] = np.float32
         
-        return hist_data
+        if ('volume' in hist_data.columns and hist_data['volume'].dtype != np.int64
+                and hist_data['volume'].notna().all()):
+            dtypes['volume'] = np.int64
+        
+        return hist_data.astype(dtypes, copy=False) if dtypes else hist_data
     
     def _get_stock_history_multi_source(self, symbol: str, period: str = "daily",
                                       start_date: str = None, end_date: str = None) -> pd.DataFrame:
@@ -598,35 +1213,79 @@ class EnhancedDataFetcher:
         Returns:
             历史数据DataFrame
         """
-        # 重新排序数据源，东方财富优先
+        # 可返回完整请求区间的数据源，默认东方财富优先
         data_sources = [
             self._get_from_eastmoney, # 东方财富 - 主要数据源
-            self._get_from_simple,    # 简化版本 - 备用
-            self._get_from_tencent    # 腾讯数据源 - 最后备用
+            self._get_from_tencent    # 腾讯数据源 - 备用
         ]
         
+        # 按该市场前缀下的历史成功率重新排序，小概率随机打乱以持续探索
+        prefix = symbol[:2]
+        if random.random() < self._source_explore_rate:
+            random.shuffle(data_sources)
+        else:
+            with self._source_lock:
+                data_sources.sort(key=lambda f: self._source_rank(prefix, f.__name__))
+        
+        # 简化版本只能取最近30天，仅在请求区间全部落在其中时作为最后的兜底，
+        # 避免长区间请求拿到截断的数据后被当作完整结果写库和缓存
+        recent_start = (datetime.now() - timedelta(days=30)).strftime(_FMT_YMD)
+        if start_date and start_date.replace('-', '') >= recent_start:
+            data_sources.append(self._get_from_simple)
+        
         for i, get_data_func in enumerate(data_sources):
+            start_time = time.time()
             try:
                 logger.debug(f"尝试数据源 {i+1}: {get_data_func.__name__}")
                 hist_data = get_data_func(symbol, period, start_date, end_date)
-                
-                if not hist_data.empty:
-                    logger.debug(f"数据源 {i+1} 成功获取 {len(hist_data)} 条记录")
-                    return hist_data
-                else:
-                    logger.debug(f"数据源 {i+1} 返回空数据")
-                    
             except Exception as e:
                 logger.debug(f"数据源 {i+1} 失败: {e}")
+                self._record_source(prefix, get_data_func.__name__, False, time.time() - start_time)
                 continue
+            
+            # 返回空数据（如区间内没有新K线）不代表数据源不可用，按成功记录
+            self._record_source(prefix, get_data_func.__name__, True, time.time() - start_time)
+            
+            if not hist_data.empty:
+                logger.debug(f"数据源 {i+1} 成功获取 {len(hist_data)} 条记录")
+                return hist_data
+            logger.debug(f"数据源 {i+1} 返回空数据")
         
         logger.warning(f"所有数据源都失败，股票 {symbol}")
         return pd.DataFrame()
     
+    def _source_rank(self, prefix: str, source_name: str) -> Tuple[float, float]:
+        """
+        数据源排序键：平滑后的成功率高者优先，相同时响应快者优先
+        
+        成功率按 (成功数+1)/(请求数+2) 计算，未使用过的数据源取中性先验0.5，
+        不会仅因没有记录就排在已出现过失败的数据源前面或后面
+        """
+        stats = self._source_stats.get((prefix, source_name))
+        if stats is None:
+            return (-0.5, math.inf)
+        success_rate = (stats.successful_requests + 1) / (stats.total_requests + 2)
+        if stats.successful_requests == 0:
+            return (-success_rate, math.inf)
+        return (-success_rate, stats.average_response_time)
+    
+    def _record_source(self, prefix: str, source_name: str, success: bool, response_time: float):
+        """记录单个数据源的请求结果（仅请求异常记为失败）"""
+        with self._source_lock:
+            stats = self._source_stats[(prefix, source_name)]
+            stats.total_requests += 1
+            if success:
+                stats.successful_requests += 1
+                stats.total_time += response_time
+                stats.consecutive_failures = 0
+            else:
+                stats.failed_requests += 1
+                stats.consecutive_failures += 1
+    
     def _get_from_tencent(self, symbol: str, period: str, start_date: str, end_date: str) -> pd.DataFrame:
         """从腾讯数据源获取数据"""
         try:
-            print(f"🔄 尝试腾讯数据源: {symbol}")
+            logger.debug("尝试腾讯数据源: %s", symbol)
             
             # 使用akshare的腾讯数据源
             hist_data = ak.stock_zh_a_hist_tx(symbol=symbol)
@@ -636,37 +1295,33 @@ class EnhancedDataFetcher:
                 if 'date' in hist_data.columns:
                     # 过滤日期范围
                     hist_data['date'] = pd.to_datetime(hist_data['date'])
-                    start_dt = pd.to_datetime(start_date, format='%Y%m%d')
-                    end_dt = pd.to_datetime(end_date, format='%Y%m%d')
+                    start_dt = _parse_date(start_date)
+                    end_dt = _parse_date(end_date)
                     
                     hist_data = hist_data[
                         (hist_data['date'] >= start_dt) &
                         (hist_data['date'] <= end_dt)
                     ]
-                    
-                    # 转换日期格式
-                    hist_data['date'] = hist_data['date'].dt.strftime('%Y-%m-%d')
                 
-                print(f"✅ 腾讯数据源成功: {len(hist_data)} 条记录")
+                logger.debug("腾讯数据源成功: %d 条记录", len(hist_data))
             else:
-                print(f"⚠️ 腾讯数据源返回空数据")
+                logger.debug("腾讯数据源返回空数据")
                 
             return hist_data
             
         except Exception as e:
-            print(f"❌ 腾讯数据源失败: {e}")
-            logger.debug(f"腾讯数据源异常: {e}")
-            return pd.DataFrame()
+            logger.debug("腾讯数据源异常: %s", e)
+            raise
     
     def _get_from_simple(self, symbol: str, period: str, start_date: str, end_date: str) -> pd.DataFrame:
         """简化版数据获取 - 只获取最近的数据"""
         try:
-            print(f"🔄 尝试简化数据源: {symbol}")
+            logger.debug("尝试简化数据源: %s", symbol)
             
             # 尝试获取最近30天的数据，不指定具体日期范围
             from datetime import datetime, timedelta
-            recent_start = (datetime.now() - timedelta(days=30)).strftime('%Y%m%d')
-            recent_end = datetime.now().strftime('%Y%m%d')
+            recent_start = (datetime.now() - timedelta(days=30)).strftime(_FMT_YMD)
+            recent_end = datetime.now().strftime(_FMT_YMD)
             
             hist_data = ak.stock_zh_a_hist(
                 symbol=symbol,
@@ -679,63 +1334,67 @@ class EnhancedDataFetcher:
             # 如果成功获取到数据，再过滤到用户要求的日期范围
             if not hist_data.empty and 'date' in hist_data.columns:
                 hist_data['date'] = pd.to_datetime(hist_data['date'])
-                start_dt = pd.to_datetime(start_date, format='%Y%m%d')
-                end_dt = pd.to_datetime(end_date, format='%Y%m%d')
+                start_dt = _parse_date(start_date)
+                end_dt = _parse_date(end_date)
                 
                 hist_data = hist_data[
                     (hist_data['date'] >= start_dt) &
                     (hist_data['date'] <= end_dt)
                 ]
                 
-                # 转换日期格式
-                hist_data['date'] = hist_data['date'].dt.strftime('%Y-%m-%d')
-                
-                print(f"✅ 简化数据源成功: {len(hist_data)} 条记录")
+                logger.debug("简化数据源成功: %d 条记录", len(hist_data))
             else:
-                print(f"⚠️ 简化数据源返回空数据")
+                logger.debug("简化数据源返回空数据")
             
             return hist_data
             
         except Exception as e:
-            print(f"❌ 简化数据源失败: {e}")
-            logger.debug(f"简化数据源异常: {e}")
-            return pd.DataFrame()
+            logger.debug("简化数据源异常: %s", e)
+            raise
     
     def _get_from_eastmoney(self, symbol: str, period: str, start_date: str, end_date: str) -> pd.DataFrame:
-        """从东方财富获取数据（原始方法）"""
+        """从东方财富获取数据（直连K线接口，前复权）"""
         try:
-            print(f"🔄 尝试东方财富数据源: {symbol} ({start_date} 到 {end_date})")
+            logger.debug("尝试东方财富数据源: %s (%s 到 %s)", symbol, start_date, end_date)
             
-            # 原始的东方财富数据源
-            hist_data = ak.stock_zh_a_hist(
-                symbol=symbol,
-                period=period,
-                start_date=start_date,
-                end_date=end_date,
-                adjust="qfq"
-            )
+            market_code = 1 if symbol.startswith('6') else 0
+            params = {
+                'fields1': 'f1,f2,f3,f4,f5,f6',
+                'fields2': 'f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61',
+                'ut': '7eea3edcaed734bea9cbfc24409ed989',
+                'klt': _EASTMONEY_KLT.get(period, '101'),
+                'fqt': '1',
+                'secid': f"{market_code}.{symbol}",
+                'beg': start_date,
+                'end': end_date
+            }
+            response = self.session.get(EASTMONEY_KLINE_URL, params=params, timeout=self.request_timeout)
+            response.raise_for_status()
+            
+            data = response.json().get('data') or {}
+            hist_data = _parse_eastmoney_klines('\n'.join(data.get('klines') or []))
             
             if not hist_data.empty:
-                print(f"✅ 东方财富数据源成功: {len(hist_data)} 条记录")
+                logger.debug("东方财富数据源成功: %d 条记录", len(hist_data))
             else:
-                print(f"⚠️ 东方财富数据源返回空数据")
+                logger.debug("东方财富数据源返回空数据")
                 
             return hist_data
             
         except Exception as e:
-            print(f"❌ 东方财富数据源失败: {e}")
-            logger.debug(f"东方财富数据源异常: {e}")
-            return pd.DataFrame()
+            logger.debug("东方财富数据源异常: %s", e)
+            raise
     
     def get_metrics_summary(self) -> Dict[str, any]:
         """获取请求指标摘要"""
-        metrics = self.delay_manager.metrics
+        metrics = self.delay_manager.snapshot_metrics()
         return {
             'total_requests': metrics.total_requests,
             'success_rate': f"{metrics.success_rate:.2%}",
             'average_response_time': f"{metrics.average_response_time:.2f}s",
             'network_status': self.delay_manager.get_network_status().value,
             'consecutive_failures': metrics.consecutive_failures,
+            'circuit_state': self.delay_manager.circuit_breaker.state.value,
             'delay_range': f"{self.delay_manager.min_delay:.1f}-{self.delay_manager.max_delay:.1f}s"
         }
     
@@ -751,23 +1410,24 @@ class EnhancedDataFetcher:
             今天的股票数据DataFrame，如果今天没有数据则返回空
         """
         from datetime import date
-        today = date.today().strftime('%Y%m%d')
+        today = date.today().strftime(_FMT_YMD)
         
         logger.info(f"直接获取股票 {symbol} 今日数据: {today}")
         
+        last_error = None
         for attempt in range(self.max_retry_times):
             start_time = time.time()
             
             try:
                 # 应用延迟策略
                 if attempt > 0:
-                    delay = self.delay_manager.get_delay(is_retry=True, retry_count=attempt)
+                    delay = self.delay_manager.get_delay(is_retry=True, retry_count=attempt,
+                                                         error=last_error)
                     logger.debug(f"股票 {symbol} 重试前等待 {delay:.2f} 秒...")
                     time.sleep(delay)
                 else:
-                    # 正常请求延迟
-                    delay = self.delay_manager.get_delay()
-                    time.sleep(delay)
+                    # 正常请求由共享令牌桶统一限速
+                    self.delay_manager.token_bucket.wait()
                 
                 # 直接调用akshare获取今天的数据
                 print(f"🔄 直接获取今日数据: {symbol} ({today})")
@@ -796,14 +1456,19 @@ class EnhancedDataFetcher:
                 return hist_data
                 
             except Exception as e:
+                last_error = e
                 response_time = time.time() - start_time
-                self.delay_manager.record_request(False, response_time)
+                
+                # 永久性错误不反映网络状况，不计入失败统计
+                permanent = self._is_permanent_error(e)
+                if not permanent:
+                    self.delay_manager.record_request(False, response_time)
                 
                 print(f"❌ 获取失败: {e}")
                 logger.debug(f"股票 {symbol} 获取今日数据失败 (尝试 {attempt + 1}/{self.max_retry_times}): {e}")
                 
                 # 根据错误类型决定是否继续重试
-                if self._is_permanent_error(e):
+                if permanent:
                     logger.debug(f"股票 {symbol} 遇到永久性错误，停止重试: {e}")
                     break
                 
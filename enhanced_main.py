@@ -9,6 +9,9 @@ import sys
 import time
 import json
 import os
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from typing import Optional, List
 import logging
@@ -16,8 +19,26 @@ import pandas as pd
 
 # 导入自定义模块
 from database import DatabaseManager
-from enhanced_data_fetcher import EnhancedDataFetcher, NetworkStatus
-from utils import config_manager, logger
+from enhanced_data_fetcher import EnhancedDataFetcher, NetworkStatus, OpenCircuitError
+from utils import config_manager, logger, get_failed_log_path, append_failed_record, replay_failed_log
+
+# 失败/暂停股票集合单独记录在失败日志中，不写入进度快照
+_SYMBOL_SET_KEYS = ('failed_symbols', 'paused_symbols')
+
+# 重试前的恢复等待时间（秒），按失败比例取斐波那契数列中的一项
+_RECOVERY_WAIT_FIB = (1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def _json_default(obj):
+    """JSON序列化时将集合转换为有序列表"""
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _progress_events_path(progress_file: str) -> str:
+    """进度文件对应的增量事件日志路径"""
+    return os.path.splitext(progress_file)[0] + ".events.jsonl"
 
 
 class EnhancedStockSelectorApp:
@@ -33,14 +54,16 @@ class EnhancedStockSelectorApp:
         mode_info = "企业网络模式" if enterprise_mode else "标准模式"
         logger.info(f"增强版短线选股工具初始化完成 - {mode_info}")
     
-    def update_all_stocks_historical_data_enhanced(self, days: int = 60, resume: bool = True) -> dict:
+    def update_all_stocks_historical_data_enhanced(self, days: int = 60, resume: bool = True,
+                                                   max_concurrency: int = 8) -> dict:
         """
         增强版批量更新所有股票历史数据
-        支持动态延迟、网络状态监控、智能暂停等功能
+        支持动态延迟、网络状态监控、智能暂停、并发获取等功能
         
         Args:
             days: 历史数据天数
             resume: 是否从上次中断处继续
+            max_concurrency: 同时在途的请求数上限
             
         Returns:
             处理结果统计
@@ -49,14 +72,13 @@ class EnhancedStockSelectorApp:
         logger.info(f"开始增强版批量更新所有股票近{days}天的历史数据...")
         
         try:
-            # 获取所有股票列表
-            stock_list = self.db.get_stock_list()
-            if stock_list.empty:
+            # 获取所有股票代码
+            all_symbols = self.db.get_stock_symbols()
+            if not all_symbols:
                 logger.error("没有股票列表，请先更新股票列表")
                 return {}
             
-            total_stocks = len(stock_list)
-            all_symbols = stock_list['symbol'].tolist()
+            total_stocks = len(all_symbols)
             
             # 加载之前的进度
             progress_data = {}
@@ -84,140 +106,291 @@ class EnhancedStockSelectorApp:
                     'network_pauses': 0,  # 网络暂停次数
                     'total_pause_time': 0.0  # 总暂停时间
                 }
+                self.db.clear_batch_state()
+            
+            # 失败/暂停股票在内存中以集合维护，保存时再转换为有序列表
+            self._failed_set = set(progress_data.get('failed_symbols', []))
+            self._paused_set = set(progress_data.get('paused_symbols', []))
+            progress_data['failed_symbols'] = self._failed_set
+            progress_data['paused_symbols'] = self._paused_set
+            progress_data['failed_count'] = len(self._failed_set)
+            
+            # 只保留最近的错误堆栈，结束时写入进度文件供排查
+            self._recent_tracebacks = deque(maxlen=20)
             
             symbols_to_process = all_symbols[start_index:]
             logger.info(f"总股票数: {total_stocks:,}, 待处理: {len(symbols_to_process):,}")
             
-            total_start_time = time.time()
-            last_network_check = time.time()
+            # 先落盘一次完整快照（已合并之前的增量事件），之后每只股票只追加一行事件，
+            # 每500只股票再原子替换一次快照
+            self.save_enhanced_progress(progress_data, progress_file)
+            events_file = open(_progress_events_path(progress_file), 'a', encoding='utf-8')
+            
+            # 失败日志先按当前集合压缩一次，之后只追加变化
+            failed_log_path = get_failed_log_path(progress_file)
+            self._compact_failed_log(failed_log_path)
+            failed_log = open(failed_log_path, 'a', encoding='utf-8', buffering=1)
+            
+            total_start_time = time.monotonic()
             
-            # 逐只股票处理
-            for i, symbol in enumerate(symbols_to_process):
-                current_index = start_index + i
+            # 只需当日数据时，先用一次全市场行情快照批量写入，剩余股票再逐只获取
+            bulk_done = set()
+            if days <= 1 and symbols_to_process:
+                bulk_done = set(self.data_fetcher.update_stocks_bulk(symbols_to_process))
+                progress_data['success_count'] += len(bulk_done)
+                progress_data['total_records'] += len(bulk_done)
+                self.db.upsert_batch_state([(symbol, 'ok', 1, '') for symbol in bulk_done])
+                logger.info(f"行情快照批量更新 {len(bulk_done)} 只股票")
+            
+            # 并发处理：线程池大小即同时在途的请求上限，按顺序提交并保持有限的提交窗口，
+            # 这样尚未完成的最小下标之前的股票都已处理完，断点续传位置保持正确
+            symbol_iter = enumerate(symbols_to_process, start_index)
+            pending = {}
+            processed = 0
+            network_aborted = False
+            
+            # 获取到的数据先缓冲，每10只股票在一个事务里批量写库，写库成功后才记为成功；
+            # 每只股票的状态同样缓冲后批量写入 batch_state 表
+            write_buffer = []
+            state_rows = []
+            
+            def durable_last_index() -> int:
+                # 写缓冲中的股票尚未入库，事件中记录的断点不能越过其中最小的下标，
+                # 否则中断后续传会跳过这些既未入库、也不在失败集合中的股票
+                last_index = progress_data['last_processed_index']
+                if write_buffer:
+                    last_index = min(last_index, min(index for index, _, _ in write_buffer) - 1)
+                return last_index
+            
+            def append_event(index: int, event_symbol: str, status: str, records: int):
+                events_file.write(json.dumps({
+                    'idx': index,
+                    'symbol': event_symbol,
+                    'status': status,
+                    'records': records,
+                    'last': durable_last_index()
+                }, ensure_ascii=False) + '\n')
+            
+            def flush_writes():
+                if not write_buffer:
+                    return
                 
-                # 检查网络状态（每50只股票检查一次）
-                if i > 0 and i % 50 == 0:
-                    network_status = self.data_fetcher.delay_manager.get_network_status()
-                    metrics = self.data_fetcher.get_metrics_summary()
-                    
-                    logger.info(f"网络状态检查 - 状态: {network_status.value}, 成功率: {metrics['success_rate']}")
-                    
-                    # 如果网络状态很差，暂停一段时间
-                    if network_status == NetworkStatus.BAD:
-                        pause_time = 60  # 暂停1分钟
-                        logger.warning(f"网络状态差，暂停 {pause_time} 秒...")
-                        time.sleep(pause_time)
-                        progress_data['network_pauses'] += 1
-                        progress_data['total_pause_time'] += pause_time
+                buffered = write_buffer[:]
+                write_buffer.clear()
+                try:
+                    self.db.insert_daily_data_batch([(buffered_symbol, data) for _, buffered_symbol, data in buffered])
+                except Exception as e:
+                    logger.error(f"批量写入 {len(buffered)} 只股票数据失败: {type(e).__name__}: {e}")
+                    for index, buffered_symbol, _ in buffered:
+                        self._failed_set.add(buffered_symbol)
+                        append_failed_record(failed_log, buffered_symbol, 'failed', str(e))
+                        append_event(index, buffered_symbol, 'failed', 0)
+                        state_rows.append((buffered_symbol, 'failed', 0, str(e)))
+                    progress_data['failed_count'] = len(self._failed_set)
+                    return
                 
-                logger.info(f"处理股票 {current_index + 1}/{total_stocks}: {symbol}")
+                for index, buffered_symbol, data in buffered:
+                    progress_data['success_count'] += 1
+                    progress_data['total_records'] += len(data)
+                    append_event(index, buffered_symbol, 'ok', len(data))
+                    state_rows.append((buffered_symbol, 'ok', len(data), ''))
+            
+            def flush_state():
+                if state_rows:
+                    self.db.upsert_batch_state(state_rows)
+                    state_rows.clear()
+            
+            with events_file, failed_log, ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                def submit_next() -> bool:
+                    try:
+                        index, next_symbol = next(symbol_iter)
+                        while next_symbol in bulk_done:
+                            index, next_symbol = next(symbol_iter)
+                    except StopIteration:
+                        return False
+                    future = executor.submit(self.data_fetcher.fetch_only, next_symbol, days)
+                    pending[future] = (index, next_symbol)
+                    return True
                 
-                # 更新单只股票的历史数据
                 try:
-                    updated_count = self.data_fetcher.update_stock_data_with_fixed_delay(symbol, days)
+                    for _ in range(max_concurrency * 2):
+                        if not submit_next():
+                            break
                     
-                    if updated_count > 0:
-                        progress_data['success_count'] += 1
-                        progress_data['total_records'] += updated_count
-                        logger.info(f"  ✅ 成功更新 {updated_count} 条记录")
-                    else:
-                        # 检查是否因为网络问题失败
-                        if self.data_fetcher.delay_manager.should_pause():
-                            progress_data['paused_symbols'].append(symbol)
-                            logger.warning(f"  ⏸️ 因网络问题暂停")
-                        else:
-                            progress_data['failed_count'] += 1
-                            progress_data['failed_symbols'].append(symbol)
-                            logger.warning(f"  ❌ 更新失败")
+                    while pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        
+                        for future in done:
+                            current_index, symbol = pending.pop(future)
+                            i = processed
+                            processed += 1
+                            
+                            # 检查网络状态（每50只股票检查一次）
+                            if i > 0 and i % 50 == 0:
+                                network_status = self.data_fetcher.delay_manager.get_network_status()
+                                metrics = self.data_fetcher.get_metrics_summary()
+                                
+                                logger.info(f"网络状态检查 - 状态: {network_status.value}, 成功率: {metrics['success_rate']}")
+                                
+                                # 网络状态差时降低令牌速率而不是整体暂停，在途任务按新速率继续
+                                token_bucket = self.data_fetcher.delay_manager.token_bucket
+                                if network_status == NetworkStatus.BAD:
+                                    token_bucket.throttle(0.5)
+                                    logger.warning(f"网络状态差，请求速率降至 {token_bucket.refill_rate:.2f} 次/秒")
+                                    progress_data['network_pauses'] += 1
+                                elif network_status in (NetworkStatus.GOOD, NetworkStatus.EXCELLENT):
+                                    token_bucket.restore()
+                            
+                            logger.info("处理股票 %d/%d: %s", current_index + 1, total_stocks, symbol)
+                            
+                            # 获取单只股票的数据，写库由 flush_writes 批量完成
+                            status = None
+                            error_message = ''
+                            try:
+                                hist_data = future.result()
+                                
+                                if not hist_data.empty:
+                                    write_buffer.append((current_index, symbol, hist_data))
+                                    logger.info("  ✅ 获取到 %d 条记录", len(hist_data))
+                                else:
+                                    # 检查是否因为网络问题失败
+                                    if self.data_fetcher.delay_manager.should_pause():
+                                        status = 'paused'
+                                        self._paused_set.add(symbol)
+                                        append_failed_record(failed_log, symbol, status)
+                                        logger.warning("  ⏸️ 因网络问题暂停")
+                                    else:
+                                        status = 'failed'
+                                        self._failed_set.add(symbol)
+                                        append_failed_record(failed_log, symbol, status)
+                                        logger.warning("  ❌ 更新失败")
+                            
+                            except OpenCircuitError as e:
+                                status = 'paused'
+                                error_message = str(e)
+                                self._paused_set.add(symbol)
+                                append_failed_record(failed_log, symbol, status, error_message)
+                                logger.warning("  ⏸️ 因网络问题暂停")
+                            except Exception as e:
+                                status = 'failed'
+                                error_message = f"{type(e).__name__}: {e}"
+                                self._failed_set.add(symbol)
+                                append_failed_record(failed_log, symbol, status, error_message)
+                                self._recent_tracebacks.append(traceback.format_exc())
+                                logger.error("  ❌ 更新失败: %s: %s", type(e).__name__, e)
+                            
+                            progress_data['failed_count'] = len(self._failed_set)
+                            
+                            # 更新进度：未完成的最小下标之前的股票均已处理
+                            if pending:
+                                progress_data['last_processed_index'] = min(index for index, _ in pending.values()) - 1
+                            else:
+                                progress_data['last_processed_index'] = max(progress_data['last_processed_index'], current_index)
+                            
+                            # 追加增量事件，每处理10只股票批量写库并刷新一次缓冲，每500只股票保存一次完整快照
+                            if status is not None:
+                                append_event(current_index, symbol, status, 0)
+                                state_rows.append((symbol, status, 0, error_message))
+                            if (i + 1) % 10 == 0:
+                                flush_writes()
+                                flush_state()
+                                events_file.flush()
+                                
+                                # 添加网络指标到进度数据
+                                metrics = self.data_fetcher.get_metrics_summary()
+                                progress_data['current_network_status'] = metrics['network_status']
+                                progress_data['current_success_rate'] = metrics['success_rate']
+                            
+                            if (i + 1) % 500 == 0:
+                                events_file.flush()
+                                progress_data['last_update'] = datetime.now().isoformat()
+                                self.save_enhanced_progress(progress_data, progress_file, events_file)
+                            
+                            # 每10只股票显示一次进度（processed 此时至少为10）
+                            if (i + 1) % 10 == 0:
+                                processed_count = start_index + processed
+                                progress_pct = (processed_count / total_stocks) * 100
+                                elapsed_time = time.monotonic() - total_start_time
+                                avg_time_per_stock = elapsed_time / processed
+                                eta_seconds = (total_stocks - processed_count) * avg_time_per_stock
+                                
+                                logger.info("进度: %.1f%% (%d/%d) | 成功: %d | 失败: %d | 暂停: %d | "
+                                            "记录数: %d | 网络: %s | 预计剩余: %.1f分钟",
+                                            progress_pct, processed_count, total_stocks,
+                                            progress_data['success_count'], progress_data['failed_count'],
+                                            len(progress_data['paused_symbols']), progress_data['total_records'],
+                                            metrics['network_status'], eta_seconds / 60)
+                        
+                        # 检查是否需要因网络问题长时间暂停
+                        if not network_aborted and self.data_fetcher.delay_manager.should_pause():
+                            logger.warning("网络状态持续不佳，建议暂停批处理")
+                            logger.info("您可以稍后重新运行命令继续处理")
+                            network_aborted = True
+                        
+                        # 网络中断后不再提交新任务，等待在途任务完成
+                        if not network_aborted:
+                            while len(pending) < max_concurrency * 2 and submit_next():
+                                pass
                     
-                except Exception as e:
-                    progress_data['failed_count'] += 1
-                    progress_data['failed_symbols'].append(symbol)
-                    logger.error(f"  ❌ 更新失败: {e}")
-                    logger.error(f"  详细错误信息: {type(e).__name__}: {str(e)}")
-                    # 打印更详细的错误堆栈
-                    import traceback
-                    logger.error(f"  错误堆栈: {traceback.format_exc()}")
-                
-                # 更新进度
-                progress_data['last_processed_index'] = current_index
+                finally:
+                    # 无论正常结束、出错还是被中断，都先把已获取的数据写库，再关闭事件日志
+                    flush_writes()
+                    flush_state()
+            
+            # 因网络问题中断时重试也只会失败，保存进度后直接返回，稍后重新运行即可续传
+            if network_aborted:
+                logger.warning("网络中断，跳过失败股票重试，已保存进度")
                 progress_data['last_update'] = datetime.now().isoformat()
-                
-                # 添加网络指标到进度数据
-                metrics = self.data_fetcher.get_metrics_summary()
-                progress_data['current_network_status'] = metrics['network_status']
-                progress_data['current_success_rate'] = metrics['success_rate']
-                
-                # 每处理10只股票保存一次进度
-                if (i + 1) % 10 == 0:
-                    self.save_enhanced_progress(progress_data, progress_file)
-                
-                # 显示进度
-                processed_count = current_index + 1
-                progress_pct = (processed_count / total_stocks) * 100
-                elapsed_time = time.time() - total_start_time
-                
-                if processed_count > start_index:
-                    avg_time_per_stock = elapsed_time / (processed_count - start_index)
-                    remaining_stocks = total_stocks - processed_count
-                    eta_seconds = remaining_stocks * avg_time_per_stock
-                    
-                    if (i + 1) % 10 == 0:  # 每10只股票显示一次进度
-                        logger.info(f"进度: {progress_pct:.1f}% ({processed_count}/{total_stocks}) | "
-                                   f"成功: {progress_data['success_count']} | 失败: {progress_data['failed_count']} | "
-                                   f"暂停: {len(progress_data['paused_symbols'])} | "
-                                   f"记录数: {progress_data['total_records']:,} | "
-                                   f"网络: {metrics['network_status']} | "
-                                   f"预计剩余: {eta_seconds/60:.1f}分钟")
-                
-                # 检查是否需要因网络问题长时间暂停
-                if self.data_fetcher.delay_manager.should_pause():
-                    logger.warning("网络状态持续不佳，建议暂停批处理")
-                    logger.info("您可以稍后重新运行命令继续处理")
-                    break
-            
-            # 处理失败和暂停的股票（重试一次）
-            retry_symbols = progress_data['failed_symbols'] + progress_data['paused_symbols']
+                progress_data['recent_tracebacks'] = list(self._recent_tracebacks)
+                self.save_enhanced_progress(progress_data, progress_file)
+                return progress_data
+            
+            # 处理失败和暂停的股票（重试一次），重试过程中修改的是集合，这里的列表本身就是快照
+            retry_symbols = sorted(self._failed_set | self._paused_set)
             if retry_symbols:
                 logger.info(f"重试 {len(retry_symbols)} 只失败/暂停的股票...")
                 
-                # 等待一段时间让网络状态恢复
-                time.sleep(30)
+                # 等待一段时间让网络状态恢复，失败比例越高等待越久
+                recovery_wait = self._compute_recovery_wait(len(retry_symbols) / max(1, progress_data['total_stocks']))
+                logger.info(f"等待 {recovery_wait} 秒后开始重试")
+                time.sleep(recovery_wait)
                 
                 retry_success = 0
-                retry_symbols_copy = retry_symbols.copy()
                 
-                for symbol in retry_symbols_copy:
-                    try:
-                        updated_count = self.data_fetcher.update_stock_data_with_fixed_delay(symbol, days)
-                        if updated_count > 0:
-                            retry_success += 1
-                            progress_data['success_count'] += 1
-                            progress_data['total_records'] += updated_count
-                            
-                            # 从失败列表中移除
-                            if symbol in progress_data['failed_symbols']:
-                                progress_data['failed_symbols'].remove(symbol)
-                                progress_data['failed_count'] -= 1
-                            if symbol in progress_data['paused_symbols']:
-                                progress_data['paused_symbols'].remove(symbol)
-                            
-                            logger.info(f"  ✅ 重试成功: {symbol} ({updated_count} 条记录)")
-                        else:
-                            logger.warning(f"  ❌ 重试仍失败: {symbol}")
-                    except Exception as e:
-                        logger.error(f"  ❌ 重试失败: {symbol} - {e}")
+                with open(failed_log_path, 'a', encoding='utf-8', buffering=1) as failed_log:
+                    for symbol in retry_symbols:
+                        try:
+                            updated_count = self.data_fetcher.update_stock_data_with_fixed_delay(symbol, days)
+                            if updated_count > 0:
+                                retry_success += 1
+                                progress_data['success_count'] += 1
+                                progress_data['total_records'] += updated_count
+                                
+                                # 从失败集合中移除
+                                self._failed_set.discard(symbol)
+                                self._paused_set.discard(symbol)
+                                append_failed_record(failed_log, symbol, 'recovered')
+                                self.db.upsert_batch_state([(symbol, 'ok', updated_count, '')])
+                                progress_data['failed_count'] = len(self._failed_set)
+                                
+                                logger.info(f"  ✅ 重试成功: {symbol} ({updated_count} 条记录)")
+                            else:
+                                logger.warning(f"  ❌ 重试仍失败: {symbol}")
+                        except Exception as e:
+                            logger.error(f"  ❌ 重试失败: {symbol} - {e}")
                 
                 logger.info(f"重试完成，成功恢复 {retry_success} 只股票")
             
             # 最终统计
-            total_elapsed_time = time.time() - total_start_time
+            total_elapsed_time = time.monotonic() - total_start_time
             progress_data['end_time'] = datetime.now().isoformat()
+            progress_data['last_update'] = progress_data['end_time']
             progress_data['total_elapsed_time'] = total_elapsed_time
             
             # 获取最终网络指标
             final_metrics = self.data_fetcher.get_metrics_summary()
             progress_data['final_metrics'] = final_metrics
+            progress_data['recent_tracebacks'] = list(self._recent_tracebacks)
             
             logger.info(f"增强版批量更新完成!")
             logger.info(f"总股票数: {total_stocks:,}")
@@ -242,24 +415,115 @@ class EnhancedStockSelectorApp:
             logger.error(f"增强版批量更新历史数据失败: {e}")
             return {}
     
-    def save_enhanced_progress(self, progress_data: dict, progress_file: str = "data/enhanced_batch_progress.json"):
-        """保存增强版批处理进度"""
+    def _compute_recovery_wait(self, failure_rate: float) -> int:
+        """
+        根据失败比例计算重试前的等待时间
+        
+        Args:
+            failure_rate: 失败/暂停股票占总数的比例 (0-1)
+            
+        Returns:
+            等待秒数
+        """
+        k = int(failure_rate * 10)
+        return _RECOVERY_WAIT_FIB[min(max(k, 0), len(_RECOVERY_WAIT_FIB) - 1)]
+    
+    def _compact_failed_log(self, failed_log_path: str):
+        """按当前失败/暂停集合重写失败日志，去掉已被覆盖的历史记录"""
+        os.makedirs(os.path.dirname(failed_log_path), exist_ok=True)
+        
+        tmp_file = failed_log_path + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for symbol in sorted(self._failed_set):
+                append_failed_record(f, symbol, 'failed')
+            for symbol in sorted(self._paused_set):
+                append_failed_record(f, symbol, 'paused')
+        os.replace(tmp_file, failed_log_path)
+    
+    def save_enhanced_progress(self, progress_data: dict, progress_file: str = "data/enhanced_batch_progress.json",
+                               events_file=None):
+        """
+        保存增强版批处理进度快照（只含计数与断点，失败/暂停股票记录在失败日志中）
+        先写临时文件并落盘后再原子替换，快照已包含全部增量事件，因此随后清空事件日志
+        快照使用紧凑JSON，需要阅读时用 export_enhanced_progress_json 导出
+        
+        Args:
+            progress_data: 进度数据
+            progress_file: 进度快照文件路径
+            events_file: 已打开的事件日志句柄，提供时直接截断而不重新打开
+        """
         os.makedirs(os.path.dirname(progress_file), exist_ok=True)
         
-        with open(progress_file, 'w', encoding='utf-8') as f:
-            json.dump(progress_data, f, ensure_ascii=False, indent=2)
+        meta = {key: value for key, value in progress_data.items() if key not in _SYMBOL_SET_KEYS}
+        tmp_file = progress_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, progress_file)
+        
+        if events_file is not None:
+            events_file.flush()
+            events_file.truncate(0)
+        else:
+            open(_progress_events_path(progress_file), 'w', encoding='utf-8').close()
+    
+    def export_enhanced_progress_json(self, progress_file: str = "data/enhanced_batch_progress.json",
+                                      output_file: str = "data/enhanced_batch_progress_export.json"):
+        """
+        导出便于阅读的完整进度（含失败/暂停股票列表）
+        
+        Args:
+            progress_file: 进度快照文件路径
+            output_file: 导出文件路径
+        """
+        progress_data = self.load_enhanced_progress(progress_file)
+        if not progress_data:
+            print("没有找到增强版进度文件")
+            return
+        
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(progress_data, f, ensure_ascii=False, indent=2, default=_json_default)
+        
+        print(f"已导出进度: {output_file}")
     
     def load_enhanced_progress(self, progress_file: str = "data/enhanced_batch_progress.json") -> dict:
-        """加载增强版批处理进度"""
+        """加载增强版批处理进度：读取最近一次快照，重放其后的增量事件，再从失败日志重建失败/暂停股票"""
         if not os.path.exists(progress_file):
             return {}
         
         try:
             with open(progress_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                progress_data = json.load(f)
         except Exception as e:
             logger.error(f"加载增强版进度文件失败: {e}")
             return {}
+        
+        events_path = _progress_events_path(progress_file)
+        if os.path.exists(events_path):
+            with open(events_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # 中断时最后一行可能只写了一半
+                        continue
+                    
+                    if event['status'] == 'ok':
+                        progress_data['success_count'] = progress_data.get('success_count', 0) + 1
+                        progress_data['total_records'] = progress_data.get('total_records', 0) + event['records']
+                    progress_data['last_processed_index'] = max(progress_data.get('last_processed_index', -1),
+                                                                event['last'])
+        
+        # 旧版快照中仍带有股票列表时以其为基础
+        failed_set = set(progress_data.get('failed_symbols', []))
+        paused_set = set(progress_data.get('paused_symbols', []))
+        replay_failed_log(get_failed_log_path(progress_file), failed_set, paused_set)
+        progress_data['failed_symbols'] = sorted(failed_set)
+        progress_data['paused_symbols'] = sorted(paused_set)
+        progress_data['failed_count'] = len(failed_set)
+        
+        return progress_data
     
     def show_enhanced_progress_status(self):
         """显示增强版进度状态"""
@@ -278,6 +542,13 @@ class EnhancedStockSelectorApp:
         success_count = progress_data.get('success_count', 0)
         failed_count = progress_data.get('failed_count', 0)
         paused_count = len(progress_data.get('paused_symbols', []))
+        
+        # batch_state 表中有记录时直接按状态聚合计数
+        state_counts = self.db.get_batch_state_counts()
+        if state_counts:
+            success_count = state_counts.get('ok', 0)
+            failed_count = state_counts.get('failed', 0)
+            paused_count = state_counts.get('paused', 0)
         processed_count = success_count + failed_count + paused_count
         
         print(f"总股票数: {total_stocks:,}")
@@ -315,16 +586,31 @@ class EnhancedStockSelectorApp:
             print("没有找到进度文件")
             return
         
-        failed_symbols = progress_data.get('failed_symbols', [])
-        paused_symbols = progress_data.get('paused_symbols', [])
+        if self.db.get_batch_state_counts():
+            failed_symbols = self.db.get_batch_state_symbols(['failed'])
+            paused_symbols = self.db.get_batch_state_symbols(['paused'])
+        else:
+            failed_symbols = progress_data.get('failed_symbols', [])
+            paused_symbols = progress_data.get('paused_symbols', [])
         
         if not failed_symbols and not paused_symbols:
             print("没有需要恢复的股票")
             return
         
+        # 股票列表逐行写入单独的文本文件，计划文件中只引用其路径
+        failed_symbols_file = "data/stock_recovery_failed_symbols.txt"
+        paused_symbols_file = "data/stock_recovery_paused_symbols.txt"
+        for symbols_file, symbols in ((failed_symbols_file, failed_symbols),
+                                      (paused_symbols_file, paused_symbols)):
+            with open(symbols_file, 'w', encoding='utf-8') as f:
+                for symbol in symbols:
+                    f.write(symbol + '\n')
+        
         recovery_plan = {
-            'failed_symbols': failed_symbols,
-            'paused_symbols': paused_symbols,
+            'failed_symbols_file': failed_symbols_file,
+            'paused_symbols_file': paused_symbols_file,
+            'failed_count': len(failed_symbols),
+            'paused_count': len(paused_symbols),
             'total_to_recover': len(failed_symbols) + len(paused_symbols),
             'created_time': datetime.now().isoformat(),
             'recovery_strategy': {
@@ -380,6 +666,9 @@ class EnhancedStockSelectorApp:
             print("\n开始API测试...")
             print("-" * 40)
             
+            # 一次查询所有测试股票在数据库中的最新数据日期
+            last_dates = self.db.get_last_update_dates(test_symbols)
+            
             for i, symbol in enumerate(test_symbols, 1):
                 print(f"\n[{i}/{len(test_symbols)}] 测试股票: {symbol}")
                 
@@ -392,15 +681,12 @@ class EnhancedStockSelectorApp:
                 }
                 
                 try:
-                    start_time = time.time()
-                    
-                    # 获取API调用前的最新数据日期
-                    last_date_before = self.db.get_last_update_date(symbol)
+                    start_time = time.monotonic()
                     
                     # 直接获取今天的数据（不依赖数据库历史）
                     today_data = self.data_fetcher.get_today_stock_data(symbol)
                     
-                    response_time = time.time() - start_time
+                    response_time = time.monotonic() - start_time
                     test_detail['response_time'] = response_time
                     
                     # API调用成功（无论是否有数据）
@@ -418,7 +704,7 @@ class EnhancedStockSelectorApp:
                         
                         # 显示今天的数据详情
                         if 'date' in today_data.columns:
-                            data_dates = today_data['date'].tolist()
+                            data_dates = today_data['date'].dt.strftime('%Y-%m-%d').tolist()
                             print(f"  📊 今日数据日期: {', '.join(data_dates)}")
                         
                         print(f"  🎯 ✅ 成功获取今日数据: {today}")
@@ -438,10 +724,10 @@ class EnhancedStockSelectorApp:
                         print(f"  🎯 ⚠️ 今日无数据: {today}")
                         print(f"      可能原因: 市场未开盘、非交易日或数据源未更新")
                         
-                        # 获取数据库中的最新数据日期作为参考
-                        last_date_after = self.db.get_last_update_date(symbol)
-                        if last_date_after:
-                            print(f"  📊 数据库最新数据: {last_date_after}")
+                        # 数据库中的最新数据日期作为参考（此分支未写库，与测试前一致）
+                        last_date = last_dates.get(symbol)
+                        if last_date:
+                            print(f"  📊 数据库最新数据: {last_date}")
                         else:
                             print(f"  📊 数据库中无此股票数据")
                         
@@ -524,6 +810,7 @@ def create_enhanced_argument_parser():
   python enhanced_main.py --update-all-enhanced --days 60    # 增强版批量更新
   python enhanced_main.py --show-progress                    # 显示进度状态
   python enhanced_main.py --create-recovery-plan             # 创建恢复计划
+  python enhanced_main.py --export-json                      # 导出可读的进度JSON
   python enhanced_main.py --test-network                     # 测试网络状态
   python enhanced_main.py --test-api                         # 测试API连接性
   python enhanced_main.py --diagnose-network                 # 完整网络诊断
@@ -551,6 +838,9 @@ def create_enhanced_argument_parser():
                        help='显示增强版批处理进度状态')
     parser.add_argument('--create-recovery-plan', action='store_true',
                        help='为失败的股票创建恢复计划')
+    parser.add_argument('--export-json', nargs='?', const='data/enhanced_batch_progress_export.json',
+                       default=None, metavar='PATH',
+                       help='导出便于阅读的完整进度JSON (默认: data/enhanced_batch_progress_export.json)')
     parser.add_argument('--test-network', action='store_true',
                        help='测试网络状态和延迟策略')
     parser.add_argument('--diagnose-network', action='store_true',
@@ -565,6 +855,8 @@ def create_enhanced_argument_parser():
                        help='历史数据天数 (默认: 60)')
     parser.add_argument('--no-resume', action='store_true',
                        help='不使用断点续传，从头开始')
+    parser.add_argument('--concurrency', type=int, default=None,
+                       help='并发获取的股票数 (默认: 8，企业模式: 2)')
     
     return parser
 
@@ -600,6 +892,11 @@ def main():
             app.create_failed_stocks_recovery_plan()
             return
         
+        # 导出可读的进度
+        if args.export_json:
+            app.export_enhanced_progress_json(output_file=args.export_json)
+            return
+        
         # 测试网络状态
         if args.test_network:
             print("测试网络状态...")
@@ -645,9 +942,11 @@ def main():
             print("   如果中途中断，可以重新运行相同命令从中断处继续")
             
             resume = not args.no_resume
+            concurrency = args.concurrency or (2 if args.enterprise_mode else 8)
             result = app.update_all_stocks_historical_data_enhanced(
                 days=args.days,
-                resume=resume
+                resume=resume,
+                max_concurrency=concurrency
             )
             
             if result:
@@ -7,11 +7,16 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Optional, Any
 import logging
+import io
+import argparse
 from datetime import datetime, timedelta
 import os
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
 from openpyxl.chart import LineChart, Reference
 from database import DatabaseManager
 from enhanced_technical_indicators import EnhancedTechnicalIndicators
@@ -22,6 +27,44 @@ from utils import config_manager
 
 logger = logging.getLogger(__name__)
 
+# 选股结果工作表的数据列（排名列之后）及缺失值默认值
+_SELECTION_RESULT_COLUMNS = [
+    'symbol', 'name', 'close', 'comprehensive_score', 'technical_score',
+    'momentum_score', 'volume_score', 'volatility_score', 'price_change_5d',
+    'volume', 'turnover_rate', 'selection_date'
+]
+_SELECTION_RESULT_DEFAULTS = {
+    col: '' if col in ('symbol', 'name', 'selection_date') else 0
+    for col in _SELECTION_RESULT_COLUMNS
+}
+
+# 技术指标详情工作表的指标列（股票代码、名称之后），前两列保留4位小数，其余保留2位
+_TECHNICAL_DETAIL_COLUMNS = [
+    'macd', 'macd_signal', 'rsi', 'ma5', 'ma20', 'ma60', 'bb_upper', 'bb_lower',
+    'kdj_k', 'kdj_d', 'cci', 'williams_r', 'atr', 'volume_ratio'
+]
+_TECHNICAL_DETAIL_4DP_COUNT = 2
+
+# 各工作表的列宽（按列顺序，从A列开始）
+_SELECTION_RESULT_WIDTHS = [6, 12, 15, 10, 10, 10, 10, 10, 10, 10, 12, 10, 12]
+_TECHNICAL_DETAIL_WIDTHS = [12] * 16
+_KEY_VALUE_WIDTHS = [15, 20, 15, 15]
+_PERFORMANCE_ANALYSIS_WIDTHS = [12] * 8
+_SELECTION_SAMPLE_WIDTHS = [12, 15, 12, 20]
+_OVERVIEW_WIDTHS = [5, 20, 25, 40]
+_STRATEGY_SHEET_WIDTHS = [12] * 8
+_BACKTEST_COMPARISON_WIDTHS = [15] * 6
+
+# 条件格式标签到样式名的映射：评分标签 0/1/2 = >=80 / >=60 / <60，涨幅标签 1/2 = 上涨 / 下跌（0 不设样式）
+_SCORE_STYLE_NAMES = ('positive', 'neutral', 'negative')
+_CHANGE_STYLE_NAMES = (None, 'positive', 'negative')
+
+
+@lru_cache(maxsize=None)
+def _fixed_point_format(decimal_places: int) -> str:
+    """按小数位数缓存格式化模板，避免每次调用重新解析f-string格式说明"""
+    return f"{{:.{decimal_places}f}}"
+
 
 class EnhancedOutputManager:
     """增强版输出管理器"""
@@ -44,6 +87,14 @@ class EnhancedOutputManager:
         self.output_dir = "output"
         self._ensure_output_dir()
         
+        # 演练模式：报告只写入内存缓冲区，不落盘
+        self.dry_run = False
+        
+        # 单次报告内复用的查询结果，每个报告入口处清空
+        self._strategies_cache = None
+        self._db_stats_cache = None
+        self._market_stats_cache = None
+        
         # 样式配置
         self.styles = {
             'header': {
@@ -67,6 +118,9 @@ class EnhancedOutputManager:
             'neutral': {
                 'font': Font(color='000000'),
                 'alignment': Alignment(horizontal='center')
+            },
+            'label': {
+                'font': Font(bold=True)
             }
         }
     
@@ -75,28 +129,100 @@ class EnhancedOutputManager:
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
     
+    def _save_workbook(self, wb: Workbook, filename: str):
+        """
+        保存工作簿
+        
+        演练模式下写入内存缓冲区并记录大小，不创建文件
+        
+        Args:
+            wb: 工作簿实例
+            filename: 目标文件路径
+        """
+        if self.dry_run:
+            buffer = io.BytesIO()
+            wb.save(buffer)
+            logger.info(f"[演练模式] {filename} 未写入磁盘，大小 {buffer.getbuffer().nbytes} 字节")
+        else:
+            # 大块缓冲写入，减少小块系统调用；不主动fsync，交由关闭文件时的页缓存刷新
+            with open(filename, 'wb', buffering=1 << 20) as f:
+                wb.save(f)
+    
+    def _reset_report_caches(self):
+        """清空单次报告内的查询缓存"""
+        self._strategies_cache = None
+        self._db_stats_cache = None
+        self._market_stats_cache = None
+    
+    def _get_strategies_cached(self) -> Dict[str, Any]:
+        """获取可用策略配置（单次报告内只查询一次）"""
+        if self._strategies_cache is None:
+            self._strategies_cache = self.strategy_engine.get_available_strategies()
+        return self._strategies_cache
+    
+    def _get_db_stats_cached(self) -> Dict[str, int]:
+        """获取数据库统计信息（单次报告内只查询一次）"""
+        if self._db_stats_cache is None:
+            self._db_stats_cache = self.db.get_database_stats()
+        return self._db_stats_cache
+    
+    def _get_market_stats_cached(self) -> Dict[str, int]:
+        """获取股票市场分布（单次报告内只查询一次）"""
+        if self._market_stats_cache is None:
+            self._market_stats_cache = self.db.get_stock_count_by_market()
+        return self._market_stats_cache
+    
+    def _apply_column_widths(self, ws, widths: List[float]):
+        """
+        按列顺序设置列宽（只写模式下必须在写入第一行之前调用）
+        
+        Args:
+            ws: 工作表
+            widths: 列宽列表，第一个元素对应A列
+        """
+        for col, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(col)].width = width
+    
+    def _register_styles(self, wb: Workbook):
+        """
+        将样式配置注册为工作簿的命名样式
+        
+        命名样式绑定到具体工作簿，因此每个报告的工作簿都需要注册一次
+        
+        Args:
+            wb: 工作簿实例
+        """
+        for style_name, style in self.styles.items():
+            if style_name not in wb.named_styles:
+                wb.add_named_style(NamedStyle(name=style_name, **style))
+    
     def _apply_cell_style(self, cell, style_name: str):
-        """应用单元格样式"""
+        """应用单元格样式（使用已注册的命名样式）"""
         if style_name in self.styles:
-            style = self.styles[style_name]
-            if 'font' in style:
-                cell.font = style['font']
-            if 'fill' in style:
-                cell.fill = style['fill']
-            if 'alignment' in style:
-                cell.alignment = style['alignment']
+            cell.style = style_name
+    
+    def _styled_cell(self, ws, value: Any, style_name: str) -> WriteOnlyCell:
+        """创建带样式的只写单元格"""
+        cell = WriteOnlyCell(ws, value=value)
+        self._apply_cell_style(cell, style_name)
+        return cell
+    
+    def _styled_row(self, ws, values: List[Any], style_name: str) -> List[WriteOnlyCell]:
+        """将一行数据全部包装为同一样式的只写单元格"""
+        return [self._styled_cell(ws, value, style_name) for value in values]
     
     def _format_percentage(self, value: float, decimal_places: int = 2) -> str:
         """格式化百分比"""
-        if pd.isna(value):
+        # NaN 不等于自身，比 pd.isna 的通用分派快得多
+        if value is None or value != value:
             return "N/A"
-        return f"{value:.{decimal_places}f}%"
+        return _fixed_point_format(decimal_places).format(value) + "%"
     
     def _format_number(self, value: float, decimal_places: int = 2) -> str:
         """格式化数字"""
-        if pd.isna(value):
+        if value is None or value != value:
             return "N/A"
-        return f"{value:.{decimal_places}f}"
+        return _fixed_point_format(decimal_places).format(value)
     
     def create_strategy_selection_report(self, strategy_name: str, 
                                        max_results: int = 50) -> str:
@@ -112,6 +238,9 @@ class EnhancedOutputManager:
         """
         try:
             logger.info(f"开始生成策略选股报告: {strategy_name}")
+            self._reset_report_caches()
+            generated_at = datetime.now()
+            timestamp = generated_at.strftime('%Y%m%d_%H%M%S')
             
             # 执行策略选股
             selection_results = self.strategy_engine.execute_strategy(strategy_name, max_results)
@@ -120,14 +249,12 @@ class EnhancedOutputManager:
                 logger.warning(f"策略 {strategy_name} 没有选出任何股票")
                 return ""
             
-            # 创建Excel工作簿
-            wb = Workbook()
-            
-            # 删除默认工作表
-            wb.remove(wb.active)
+            # 创建Excel工作簿（只写模式，逐行写出，不在内存中保留整张表）
+            wb = Workbook(write_only=True)
+            self._register_styles(wb)
             
             # 1. 创建选股结果工作表
-            self._create_selection_results_sheet(wb, selection_results, strategy_name)
+            self._create_selection_results_sheet(wb, selection_results, strategy_name, generated_at)
             
             # 2. 创建技术指标详情工作表
             self._create_technical_details_sheet(wb, selection_results.head(20))
@@ -139,9 +266,8 @@ class EnhancedOutputManager:
             self._create_market_overview_sheet(wb)
             
             # 保存文件
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"{self.output_dir}/strategy_selection_{strategy_name}_{timestamp}.xlsx"
-            wb.save(filename)
+            self._save_workbook(wb, filename)
             
             logger.info(f"策略选股报告已生成: {filename}")
             return filename
@@ -150,19 +276,13 @@ class EnhancedOutputManager:
             logger.error(f"生成策略选股报告失败: {e}")
             return ""
     
-    def _create_selection_results_sheet(self, wb: Workbook, results: pd.DataFrame, strategy_name: str):
+    def _create_selection_results_sheet(self, wb: Workbook, results: pd.DataFrame, strategy_name: str,
+                                        generated_at: datetime):
         """创建选股结果工作表"""
         ws = wb.create_sheet(title="选股结果")
         
-        # 标题
-        ws['A1'] = f"策略选股结果 - {strategy_name}"
-        ws.merge_cells('A1:M1')
-        self._apply_cell_style(ws['A1'], 'header')
-        
-        # 基本信息
-        ws['A2'] = f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        ws['A3'] = f"选股数量: {len(results)} 只"
-        ws['A4'] = f"策略名称: {strategy_name}"
+        # 调整列宽
+        self._apply_column_widths(ws, _SELECTION_RESULT_WIDTHS)
         
         # 表头
         headers = [
@@ -171,55 +291,39 @@ class EnhancedOutputManager:
             '5日涨幅%', '成交量', '换手率%', '选股日期'
         ]
         
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=6, column=col, value=header)
-            self._apply_cell_style(cell, 'subheader')
-        
-        # 数据行
-        for row_idx, (_, row) in enumerate(results.iterrows(), 7):
-            ws.cell(row=row_idx, column=1, value=row_idx - 6)  # 排名
-            ws.cell(row=row_idx, column=2, value=row.get('symbol', ''))
-            ws.cell(row=row_idx, column=3, value=row.get('name', ''))
-            ws.cell(row=row_idx, column=4, value=row.get('close', 0))
-            ws.cell(row=row_idx, column=5, value=row.get('comprehensive_score', 0))
-            ws.cell(row=row_idx, column=6, value=row.get('technical_score', 0))
-            ws.cell(row=row_idx, column=7, value=row.get('momentum_score', 0))
-            ws.cell(row=row_idx, column=8, value=row.get('volume_score', 0))
-            ws.cell(row=row_idx, column=9, value=row.get('volatility_score', 0))
-            ws.cell(row=row_idx, column=10, value=row.get('price_change_5d', 0))
-            ws.cell(row=row_idx, column=11, value=row.get('volume', 0))
-            ws.cell(row=row_idx, column=12, value=row.get('turnover_rate', 0))
-            ws.cell(row=row_idx, column=13, value=row.get('selection_date', ''))
-            
-            # 应用条件格式
-            score_cell = ws.cell(row=row_idx, column=5)
-            if row.get('comprehensive_score', 0) >= 80:
-                self._apply_cell_style(score_cell, 'positive')
-            elif row.get('comprehensive_score', 0) >= 60:
-                self._apply_cell_style(score_cell, 'neutral')
-            else:
-                self._apply_cell_style(score_cell, 'negative')
-            
-            # 涨幅颜色
-            change_cell = ws.cell(row=row_idx, column=10)
-            if row.get('price_change_5d', 0) > 0:
-                self._apply_cell_style(change_cell, 'positive')
-            elif row.get('price_change_5d', 0) < 0:
-                self._apply_cell_style(change_cell, 'negative')
+        # 标题（只写模式不支持合并单元格，标题使用单个带样式的单元格）
+        ws.append([self._styled_cell(ws, f"策略选股结果 - {strategy_name}", 'header')])
+        ws.append([f"生成时间: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}"])
+        ws.append([f"选股数量: {len(results)} 只"])
+        ws.append([f"策略名称: {strategy_name}"])
+        ws.append([])
+        ws.append(self._styled_row(ws, headers, 'subheader'))
         
-        # 调整列宽
-        column_widths = [6, 12, 15, 10, 10, 10, 10, 10, 10, 10, 12, 10, 12]
-        for col, width in enumerate(column_widths, 1):
-            ws.column_dimensions[ws.cell(row=1, column=col).column_letter].width = width
+        # 数据行：一次取出所需列并补齐缺失值，按普通元组遍历
+        data = results.reindex(columns=_SELECTION_RESULT_COLUMNS).fillna(_SELECTION_RESULT_DEFAULTS)
+        
+        # 条件格式：综合评分列与5日涨幅列用无分支的算术运算一次性算出样式标签
+        scores = data['comprehensive_score'].to_numpy(dtype=np.float32)
+        changes = data['price_change_5d'].to_numpy(dtype=np.float32)
+        score_tags = ((scores < 80).astype(np.uint8) + (scores < 60)).tolist()
+        change_tags = ((changes > 0).astype(np.uint8) + 2 * (changes < 0)).tolist()
+        
+        for i, record in enumerate(data.itertuples(index=False, name=None)):
+            values = [i + 1, *record]
+            values[4] = self._styled_cell(ws, values[4], _SCORE_STYLE_NAMES[score_tags[i]])
+            
+            change_style = _CHANGE_STYLE_NAMES[change_tags[i]]
+            if change_style:
+                values[9] = self._styled_cell(ws, values[9], change_style)
+            
+            ws.append(values)
     
     def _create_technical_details_sheet(self, wb: Workbook, top_stocks: pd.DataFrame):
         """创建技术指标详情工作表"""
         ws = wb.create_sheet(title="技术指标详情")
         
-        # 标题
-        ws['A1'] = "技术指标详情 (前20只股票)"
-        ws.merge_cells('A1:P1')
-        self._apply_cell_style(ws['A1'], 'header')
+        # 调整列宽
+        self._apply_column_widths(ws, _TECHNICAL_DETAIL_WIDTHS)
         
         # 表头
         headers = [
@@ -228,141 +332,124 @@ class EnhancedOutputManager:
             'KDJ_K', 'KDJ_D', 'CCI', '威廉%R', 'ATR', '量比'
         ]
         
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            self._apply_cell_style(cell, 'subheader')
+        rows = [
+            [self._styled_cell(ws, "技术指标详情 (前20只股票)", 'header')],
+            [],
+            self._styled_row(ws, headers, 'subheader')
+        ]
         
-        # 获取技术指标数据
-        for row_idx, (_, stock) in enumerate(top_stocks.iterrows(), 4):
-            symbol = stock.get('symbol', '')
+        # 一次性批量计算所有股票的最新技术指标，并对整个数值块统一格式化
+        symbols = top_stocks['symbol'].tolist() if 'symbol' in top_stocks.columns else []
+        formatted = {}
+        failed_symbols = []
+        try:
+            latest_indicators = self.tech_indicators.calculate_all_indicators_batch(symbols, failed=failed_symbols)
             
-            try:
-                # 获取技术指标
-                indicators = self.tech_indicators.calculate_all_indicators(symbol)
+            if latest_indicators:
+                latest_df = pd.DataFrame.from_dict(latest_indicators, orient='index')
+                values = latest_df.reindex(columns=_TECHNICAL_DETAIL_COLUMNS, fill_value=0).to_numpy(dtype=float)
                 
-                if not indicators.empty:
-                    latest = indicators.iloc[-1]
-                    
-                    ws.cell(row=row_idx, column=1, value=symbol)
-                    ws.cell(row=row_idx, column=2, value=stock.get('name', ''))
-                    ws.cell(row=row_idx, column=3, value=self._format_number(latest.get('macd', 0), 4))
-                    ws.cell(row=row_idx, column=4, value=self._format_number(latest.get('macd_signal', 0), 4))
-                    ws.cell(row=row_idx, column=5, value=self._format_number(latest.get('rsi', 0), 2))
-                    ws.cell(row=row_idx, column=6, value=self._format_number(latest.get('ma5', 0), 2))
-                    ws.cell(row=row_idx, column=7, value=self._format_number(latest.get('ma20', 0), 2))
-                    ws.cell(row=row_idx, column=8, value=self._format_number(latest.get('ma60', 0), 2))
-                    ws.cell(row=row_idx, column=9, value=self._format_number(latest.get('bb_upper', 0), 2))
-                    ws.cell(row=row_idx, column=10, value=self._format_number(latest.get('bb_lower', 0), 2))
-                    ws.cell(row=row_idx, column=11, value=self._format_number(latest.get('kdj_k', 0), 2))
-                    ws.cell(row=row_idx, column=12, value=self._format_number(latest.get('kdj_d', 0), 2))
-                    ws.cell(row=row_idx, column=13, value=self._format_number(latest.get('cci', 0), 2))
-                    ws.cell(row=row_idx, column=14, value=self._format_number(latest.get('williams_r', 0), 2))
-                    ws.cell(row=row_idx, column=15, value=self._format_number(latest.get('atr', 0), 2))
-                    ws.cell(row=row_idx, column=16, value=self._format_number(latest.get('volume_ratio', 0), 2))
-                    
-            except Exception as e:
-                logger.error(f"获取股票 {symbol} 技术指标失败: {e}")
-                ws.cell(row=row_idx, column=1, value=symbol)
-                ws.cell(row=row_idx, column=2, value="数据获取失败")
+                text = np.empty(values.shape, dtype=object)
+                text[:, :_TECHNICAL_DETAIL_4DP_COUNT] = np.char.mod('%.4f', values[:, :_TECHNICAL_DETAIL_4DP_COUNT])
+                text[:, _TECHNICAL_DETAIL_4DP_COUNT:] = np.char.mod('%.2f', values[:, _TECHNICAL_DETAIL_4DP_COUNT:])
+                text[np.isnan(values)] = "N/A"
+                
+                formatted = dict(zip(latest_df.index, text.tolist()))
+        except Exception as e:
+            logger.error(f"批量计算技术指标失败: {e}")
+            # 批量查询或格式化出错时没有任何可用结果，全部标记为失败
+            formatted = {}
+            failed_symbols = symbols
+        failed_symbols = set(failed_symbols)
+        
+        # 组装数据行（纯字典查找，无数据库访问）
+        for _, stock in top_stocks.iterrows():
+            symbol = stock.get('symbol', '')
+            
+            if symbol in failed_symbols:
+                rows.append([symbol, "数据获取失败"])
+                continue
+            
+            indicator_values = formatted.get(symbol)
+            if indicator_values is None:
+                rows.append([])
+                continue
+            
+            rows.append([symbol, stock.get('name', ''), *indicator_values])
         
-        # 调整列宽
-        for col in range(1, 17):
-            ws.column_dimensions[ws.cell(row=1, column=col).column_letter].width = 12
+        for values in rows:
+            ws.append(values)
     
     def _create_strategy_config_sheet(self, wb: Workbook, strategy_name: str):
         """创建策略配置工作表"""
         ws = wb.create_sheet(title="策略配置")
         
+        # 调整列宽
+        self._apply_column_widths(ws, _KEY_VALUE_WIDTHS)
+        
         # 标题
-        ws['A1'] = f"策略配置 - {strategy_name}"
-        ws.merge_cells('A1:D1')
-        self._apply_cell_style(ws['A1'], 'header')
+        ws.append([self._styled_cell(ws, f"策略配置 - {strategy_name}", 'header')])
+        ws.append([])
         
         # 获取策略配置
-        strategies = self.strategy_engine.get_available_strategies()
+        strategies = self._get_strategies_cached()
         strategy_config = strategies.get(strategy_name, {})
         
-        row = 3
-        
         # 基本信息
-        ws.cell(row=row, column=1, value="策略名称").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=strategy_config.get('name', ''))
-        row += 1
-        
-        ws.cell(row=row, column=1, value="策略描述").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=strategy_config.get('description', ''))
-        row += 2
+        ws.append([self._styled_cell(ws, "策略名称", 'label'), strategy_config.get('name', '')])
+        ws.append([self._styled_cell(ws, "策略描述", 'label'), strategy_config.get('description', '')])
+        ws.append([])
         
         # 权重配置
-        ws.cell(row=row, column=1, value="权重配置").font = Font(bold=True)
-        row += 1
+        ws.append([self._styled_cell(ws, "权重配置", 'label')])
         
         weights = strategy_config.get('weights', {})
         for weight_name, weight_value in weights.items():
-            ws.cell(row=row, column=2, value=weight_name)
-            ws.cell(row=row, column=3, value=f"{weight_value:.1%}")
-            row += 1
+            ws.append([None, weight_name, f"{weight_value:.1%}"])
         
-        row += 1
+        ws.append([])
         
         # 筛选条件
-        ws.cell(row=row, column=1, value="筛选条件").font = Font(bold=True)
-        row += 1
+        ws.append([self._styled_cell(ws, "筛选条件", 'label')])
         
         filters = strategy_config.get('filters', {})
         for filter_name, filter_value in filters.items():
-            ws.cell(row=row, column=2, value=filter_name)
-            ws.cell(row=row, column=3, value=str(filter_value))
-            row += 1
-        
-        # 调整列宽
-        ws.column_dimensions['A'].width = 15
-        ws.column_dimensions['B'].width = 20
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 15
+            ws.append([None, filter_name, str(filter_value)])
     
     def _create_market_overview_sheet(self, wb: Workbook):
         """创建市场概况工作表"""
         ws = wb.create_sheet(title="市场概况")
         
+        # 调整列宽
+        self._apply_column_widths(ws, _KEY_VALUE_WIDTHS[:3])
+        
         # 标题
-        ws['A1'] = "市场概况"
-        ws.merge_cells('A1:D1')
-        self._apply_cell_style(ws['A1'], 'header')
+        ws.append([self._styled_cell(ws, "市场概况", 'header')])
+        ws.append([])
         
+        # 只写模式无法回写已输出的行，先组装全部行，出错时整体替换为失败提示
         try:
             # 获取数据库统计信息
-            stats = self.db.get_database_stats()
-            
-            row = 3
-            ws.cell(row=row, column=1, value="数据库统计").font = Font(bold=True)
-            row += 1
+            stats = self._get_db_stats_cached()
             
+            rows = [[self._styled_cell(ws, "数据库统计", 'label')]]
             for stat_name, stat_value in stats.items():
-                ws.cell(row=row, column=2, value=stat_name)
-                ws.cell(row=row, column=3, value=stat_value)
-                row += 1
+                rows.append([None, stat_name, stat_value])
             
             # 获取股票市场分布
-            market_stats = self.db.get_stock_count_by_market()
-            
-            row += 1
-            ws.cell(row=row, column=1, value="市场分布").font = Font(bold=True)
-            row += 1
+            market_stats = self._get_market_stats_cached()
             
+            rows.append([])
+            rows.append([self._styled_cell(ws, "市场分布", 'label')])
             for market, count in market_stats.items():
-                ws.cell(row=row, column=2, value=market)
-                ws.cell(row=row, column=3, value=count)
-                row += 1
+                rows.append([None, market, count])
             
         except Exception as e:
             logger.error(f"获取市场概况数据失败: {e}")
-            ws.cell(row=3, column=1, value="数据获取失败")
+            rows = [["数据获取失败"]]
         
-        # 调整列宽
-        ws.column_dimensions['A'].width = 15
-        ws.column_dimensions['B'].width = 20
-        ws.column_dimensions['C'].width = 15
+        for values in rows:
+            ws.append(values)
     
     def create_backtest_report(self, strategy_name: str, 
                              start_date: str, 
@@ -380,6 +467,9 @@ class EnhancedOutputManager:
         """
         try:
             logger.info(f"开始生成回测报告: {strategy_name}")
+            self._reset_report_caches()
+            generated_at = datetime.now()
+            timestamp = generated_at.strftime('%Y%m%d_%H%M%S')
             
             # 执行回测
             backtest_result = self.backtest.backtest_strategy(strategy_name, start_date, end_date)
@@ -388,9 +478,9 @@ class EnhancedOutputManager:
                 logger.error(f"回测失败: {backtest_result['error']}")
                 return ""
             
-            # 创建Excel工作簿
-            wb = Workbook()
-            wb.remove(wb.active)
+            # 创建Excel工作簿（只写模式）
+            wb = Workbook(write_only=True)
+            self._register_styles(wb)
             
             # 1. 创建回测概况工作表
             self._create_backtest_overview_sheet(wb, backtest_result)
@@ -402,9 +492,8 @@ class EnhancedOutputManager:
             self._create_selection_samples_sheet(wb, backtest_result)
             
             # 保存文件
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"{self.output_dir}/backtest_report_{strategy_name}_{timestamp}.xlsx"
-            wb.save(filename)
+            self._save_workbook(wb, filename)
             
             logger.info(f"回测报告已生成: {filename}")
             return filename
@@ -417,136 +506,87 @@ class EnhancedOutputManager:
         """创建回测概况工作表"""
         ws = wb.create_sheet(title="回测概况")
         
-        # 标题
-        ws['A1'] = f"回测概况 - {backtest_result.get('strategy', 'Unknown')}"
-        ws.merge_cells('A1:D1')
-        self._apply_cell_style(ws['A1'], 'header')
+        # 调整列宽
+        self._apply_column_widths(ws, _KEY_VALUE_WIDTHS)
         
-        row = 3
+        # 标题
+        ws.append([self._styled_cell(ws, f"回测概况 - {backtest_result.get('strategy', 'Unknown')}", 'header')])
+        ws.append([])
         
         # 基本信息
-        ws.cell(row=row, column=1, value="回测期间").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=backtest_result.get('backtest_period', ''))
-        row += 1
-        
-        ws.cell(row=row, column=1, value="测试次数").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=backtest_result.get('test_dates', 0))
-        row += 1
-        
-        ws.cell(row=row, column=1, value="总选股数").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=backtest_result.get('total_selections', 0))
-        row += 1
-        
-        ws.cell(row=row, column=1, value="回测时间").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=backtest_result.get('backtest_date', ''))
-        row += 2
+        ws.append([self._styled_cell(ws, "回测期间", 'label'), backtest_result.get('backtest_period', '')])
+        ws.append([self._styled_cell(ws, "测试次数", 'label'), backtest_result.get('test_dates', 0)])
+        ws.append([self._styled_cell(ws, "总选股数", 'label'), backtest_result.get('total_selections', 0)])
+        ws.append([self._styled_cell(ws, "回测时间", 'label'), backtest_result.get('backtest_date', '')])
+        ws.append([])
         
         # 表现总结
         performance = backtest_result.get('performance', {})
         summary = performance.get('summary', {})
         
         if summary:
-            ws.cell(row=row, column=1, value="表现总结").font = Font(bold=True)
-            row += 1
-            
-            ws.cell(row=row, column=2, value="主要收益率")
-            ws.cell(row=row, column=3, value=self._format_percentage(summary.get('primary_avg_return', 0)))
-            row += 1
-            
-            ws.cell(row=row, column=2, value="胜率")
-            ws.cell(row=row, column=3, value=self._format_percentage(summary.get('primary_positive_rate', 0)))
-            row += 1
-            
-            ws.cell(row=row, column=2, value="夏普比率")
-            ws.cell(row=row, column=3, value=self._format_number(summary.get('sharpe_ratio', 0)))
-            row += 1
-            
-            ws.cell(row=row, column=2, value="策略评级")
-            ws.cell(row=row, column=3, value=summary.get('strategy_rating', 'N/A'))
-            row += 1
-            
-            ws.cell(row=row, column=2, value="风险水平")
-            ws.cell(row=row, column=3, value=summary.get('risk_level', 'N/A'))
-        
-        # 调整列宽
-        ws.column_dimensions['A'].width = 15
-        ws.column_dimensions['B'].width = 20
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 15
+            ws.append([self._styled_cell(ws, "表现总结", 'label')])
+            ws.append([None, "主要收益率", self._format_percentage(summary.get('primary_avg_return', 0))])
+            ws.append([None, "胜率", self._format_percentage(summary.get('primary_positive_rate', 0))])
+            ws.append([None, "夏普比率", self._format_number(summary.get('sharpe_ratio', 0))])
+            ws.append([None, "策略评级", summary.get('strategy_rating', 'N/A')])
+            ws.append([None, "风险水平", summary.get('risk_level', 'N/A')])
     
     def _create_performance_analysis_sheet(self, wb: Workbook, backtest_result: Dict[str, Any]):
         """创建表现分析工作表"""
         ws = wb.create_sheet(title="表现分析")
         
-        # 标题
-        ws['A1'] = "各持有期表现分析"
-        ws.merge_cells('A1:H1')
-        self._apply_cell_style(ws['A1'], 'header')
+        # 调整列宽
+        self._apply_column_widths(ws, _PERFORMANCE_ANALYSIS_WIDTHS)
         
         # 表头
         headers = ['持有期', '有效交易', '平均收益%', '胜率%', '最大收益%', '最大亏损%', '标准差%', '中位数收益%']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            self._apply_cell_style(cell, 'subheader')
+        ws.append([self._styled_cell(ws, "各持有期表现分析", 'header')])
+        ws.append([])
+        ws.append(self._styled_row(ws, headers, 'subheader'))
         
         # 数据
         performance = backtest_result.get('performance', {})
         holding_periods = performance.get('holding_periods', {})
         
-        row = 4
         for period, data in holding_periods.items():
             if 'avg_return' in data:
-                ws.cell(row=row, column=1, value=period)
-                ws.cell(row=row, column=2, value=data.get('valid_trades', 0))
-                ws.cell(row=row, column=3, value=self._format_number(data.get('avg_return', 0)))
-                ws.cell(row=row, column=4, value=self._format_number(data.get('positive_rate', 0)))
-                ws.cell(row=row, column=5, value=self._format_number(data.get('max_return', 0)))
-                ws.cell(row=row, column=6, value=self._format_number(data.get('min_return', 0)))
-                ws.cell(row=row, column=7, value=self._format_number(data.get('std_return', 0)))
-                ws.cell(row=row, column=8, value=self._format_number(data.get('median_return', 0)))
-                
                 # 应用条件格式
-                avg_return_cell = ws.cell(row=row, column=3)
-                if data.get('avg_return', 0) > 0:
-                    self._apply_cell_style(avg_return_cell, 'positive')
-                else:
-                    self._apply_cell_style(avg_return_cell, 'negative')
-                
-                row += 1
-        
-        # 调整列宽
-        for col in range(1, 9):
-            ws.column_dimensions[ws.cell(row=1, column=col).column_letter].width = 12
+                return_style = 'positive' if data.get('avg_return', 0) > 0 else 'negative'
+                ws.append([
+                    period,
+                    data.get('valid_trades', 0),
+                    self._styled_cell(ws, self._format_number(data.get('avg_return', 0)), return_style),
+                    self._format_number(data.get('positive_rate', 0)),
+                    self._format_number(data.get('max_return', 0)),
+                    self._format_number(data.get('min_return', 0)),
+                    self._format_number(data.get('std_return', 0)),
+                    self._format_number(data.get('median_return', 0))
+                ])
     
     def _create_selection_samples_sheet(self, wb: Workbook, backtest_result: Dict[str, Any]):
         """创建选股样本工作表"""
         ws = wb.create_sheet(title="选股样本")
         
-        # 标题
-        ws['A1'] = "选股样本 (部分数据)"
-        ws.merge_cells('A1:D1')
-        self._apply_cell_style(ws['A1'], 'header')
+        # 调整列宽
+        self._apply_column_widths(ws, _SELECTION_SAMPLE_WIDTHS)
         
         # 表头
         headers = ['股票代码', '选股日期', '选股价格', '策略']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            self._apply_cell_style(cell, 'subheader')
+        ws.append([self._styled_cell(ws, "选股样本 (部分数据)", 'header')])
+        ws.append([])
+        ws.append(self._styled_row(ws, headers, 'subheader'))
         
         # 数据
         selections_sample = backtest_result.get('selections_sample', [])
         
-        for row_idx, selection in enumerate(selections_sample, 4):
-            ws.cell(row=row_idx, column=1, value=selection.get('symbol', ''))
-            ws.cell(row=row_idx, column=2, value=selection.get('selection_date', ''))
-            ws.cell(row=row_idx, column=3, value=selection.get('selection_price', 0))
-            ws.cell(row=row_idx, column=4, value=selection.get('strategy', ''))
-        
-        # 调整列宽
-        ws.column_dimensions['A'].width = 12
-        ws.column_dimensions['B'].width = 15
-        ws.column_dimensions['C'].width = 12
-        ws.column_dimensions['D'].width = 20
+        for selection in selections_sample:
+            ws.append([
+                selection.get('symbol', ''),
+                selection.get('selection_date', ''),
+                selection.get('selection_price', 0),
+                selection.get('strategy', '')
+            ])
     
     def create_comprehensive_report(self, strategy_names: List[str], 
                                   include_backtest: bool = True) -> str:
@@ -562,31 +602,56 @@ class EnhancedOutputManager:
         """
         try:
             logger.info(f"开始生成综合报告，策略: {strategy_names}")
+            self._reset_report_caches()
+            generated_at = datetime.now()
+            timestamp = generated_at.strftime('%Y%m%d_%H%M%S')
+            
+            # 1. 先执行所有策略并缓存结果，只保留选出股票的策略
+            # 各策略的选股相互独立，并行执行
+            strategy_results = {}
+            if strategy_names:
+                with ThreadPoolExecutor(max_workers=min(8, len(strategy_names))) as executor:
+                    futures = {
+                        strategy_name: executor.submit(self.strategy_engine.execute_strategy, strategy_name, 30)
+                        for strategy_name in strategy_names
+                    }
+                    
+                    for strategy_name, future in futures.items():
+                        try:
+                            results = future.result()
+                            if not results.empty:
+                                strategy_results[strategy_name] = results
+                            else:
+                                logger.warning(f"策略 {strategy_name} 没有选出任何股票，跳过")
+                        except Exception as e:
+                            logger.error(f"处理策略 {strategy_name} 时出错: {e}")
+            
+            valid_strategies = list(strategy_results)
+            if not valid_strategies:
+                logger.warning("所有策略均没有选出股票，不生成综合报告")
+                return ""
             
-            # 创建Excel工作簿
-            wb = Workbook()
-            wb.remove(wb.active)
+            # 创建Excel工作簿（只写模式），工作簿写入均在当前线程按策略顺序完成
+            wb = Workbook(write_only=True)
+            self._register_styles(wb)
             
-            # 1. 创建总览工作表
-            self._create_comprehensive_overview_sheet(wb, strategy_names)
+            # 2. 创建总览工作表
+            self._create_comprehensive_overview_sheet(wb, valid_strategies, generated_at)
             
-            # 2. 为每个策略创建选股结果工作表
-            for strategy_name in strategy_names:
+            # 3. 为每个策略创建选股结果工作表
+            for strategy_name, results in strategy_results.items():
                 try:
-                    results = self.strategy_engine.execute_strategy(strategy_name, 30)
-                    if not results.empty:
-                        self._create_strategy_sheet(wb, strategy_name, results)
+                    self._create_strategy_sheet(wb, strategy_name, results)
                 except Exception as e:
                     logger.error(f"处理策略 {strategy_name} 时出错: {e}")
             
-            # 3. 如果需要，添加回测结果
+            # 4. 如果需要，添加回测结果
             if include_backtest:
-                self._create_backtest_comparison_sheet(wb, strategy_names)
+                self._create_backtest_comparison_sheet(wb, valid_strategies)
             
             # 保存文件
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"{self.output_dir}/comprehensive_report_{timestamp}.xlsx"
-            wb.save(filename)
+            self._save_workbook(wb, filename)
             
             logger.info(f"综合报告已生成: {filename}")
             return filename
@@ -595,40 +660,36 @@ class EnhancedOutputManager:
             logger.error(f"生成综合报告失败: {e}")
             return ""
     
-    def _create_comprehensive_overview_sheet(self, wb: Workbook, strategy_names: List[str]):
+    def _create_comprehensive_overview_sheet(self, wb: Workbook, strategy_names: List[str],
+                                             generated_at: datetime):
         """创建综合总览工作表"""
         ws = wb.create_sheet(title="总览")
         
+        # 调整列宽
+        self._apply_column_widths(ws, _OVERVIEW_WIDTHS)
+        
         # 标题
-        ws['A1'] = "短线选股系统综合报告"
-        ws.merge_cells('A1:F1')
-        self._apply_cell_style(ws['A1'], 'header')
+        ws.append([self._styled_cell(ws, "短线选股系统综合报告", 'header')])
+        ws.append([])
         
         # 基本信息
-        ws['A3'] = f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        ws['A4'] = f"包含策略: {', '.join(strategy_names)}"
-        ws['A5'] = f"策略数量: {len(strategy_names)}"
+        ws.append([f"生成时间: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}"])
+        ws.append([f"包含策略: {', '.join(strategy_names)}"])
+        ws.append([f"策略数量: {len(strategy_names)}"])
+        ws.append([])
         
         # 策略列表
-        row = 7
-        ws.cell(row=row, column=1, value="策略列表").font = Font(bold=True)
-        row += 1
+        ws.append([self._styled_cell(ws, "策略列表", 'label')])
         
+        strategies = self._get_strategies_cached()
         for i, strategy_name in enumerate(strategy_names, 1):
-            strategies = self.strategy_engine.get_available_strategies()
             strategy_config = strategies.get(strategy_name, {})
-            
-            ws.cell(row=row, column=1, value=f"{i}.")
-            ws.cell(row=row, column=2, value=strategy_name)
-            ws.cell(row=row, column=3, value=strategy_config.get('name', ''))
-            ws.cell(row=row, column=4, value=strategy_config.get('description', ''))
-            row += 1
-        
-        # 调整列宽
-        ws.column_dimensions['A'].width = 5
-        ws.column_dimensions['B'].width = 20
-        ws.column_dimensions['C'].width = 25
-        ws.column_dimensions['D'].width = 40
+            ws.append([
+                f"{i}.",
+                strategy_name,
+                strategy_config.get('name', ''),
+                strategy_config.get('description', '')
+            ])
     
     def _create_strategy_sheet(self, wb: Workbook, strategy_name: str, results: pd.DataFrame):
         """为单个策略创建工作表"""
@@ -636,70 +697,59 @@ class EnhancedOutputManager:
         sheet_name = strategy_name[:25] if len(strategy_name) > 25 else strategy_name
         ws = wb.create_sheet(title=sheet_name)
         
-        # 标题
-        ws['A1'] = f"策略: {strategy_name}"
-        ws.merge_cells('A1:H1')
-        self._apply_cell_style(ws['A1'], 'header')
+        # 调整列宽
+        self._apply_column_widths(ws, _STRATEGY_SHEET_WIDTHS)
         
         # 表头
         headers = ['排名', '股票代码', '股票名称', '综合评分', '技术评分', '动量评分', '成交量评分', '5日涨幅%']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            self._apply_cell_style(cell, 'subheader')
+        ws.append([self._styled_cell(ws, f"策略: {strategy_name}", 'header')])
+        ws.append([])
+        ws.append(self._styled_row(ws, headers, 'subheader'))
         
         # 数据
-        for row_idx, (_, row) in enumerate(results.head(20).iterrows(), 4):
-            ws.cell(row=row_idx, column=1, value=row_idx - 3)
-            ws.cell(row=row_idx, column=2, value=row.get('symbol', ''))
-            ws.cell(row=row_idx, column=3, value=row.get('name', ''))
-            ws.cell(row=row_idx, column=4, value=row.get('comprehensive_score', 0))
-            ws.cell(row=row_idx, column=5, value=row.get('technical_score', 0))
-            ws.cell(row=row_idx, column=6, value=row.get('momentum_score', 0))
-            ws.cell(row=row_idx, column=7, value=row.get('volume_score', 0))
-            ws.cell(row=row_idx, column=8, value=row.get('price_change_5d', 0))
-        
-        # 调整列宽
-        for col in range(1, 9):
-            ws.column_dimensions[ws.cell(row=1, column=col).column_letter].width = 12
+        for rank, (_, row) in enumerate(results.head(20).iterrows(), 1):
+            ws.append([
+                rank,
+                row.get('symbol', ''),
+                row.get('name', ''),
+                row.get('comprehensive_score', 0),
+                row.get('technical_score', 0),
+                row.get('momentum_score', 0),
+                row.get('volume_score', 0),
+                row.get('price_change_5d', 0)
+            ])
     
     def _create_backtest_comparison_sheet(self, wb: Workbook, strategy_names: List[str]):
         """创建回测比较工作表"""
         ws = wb.create_sheet(title="回测比较")
         
-        # 标题
-        ws['A1'] = "策略回测比较"
-        ws.merge_cells('A1:F1')
-        self._apply_cell_style(ws['A1'], 'header')
+        # 调整列宽
+        self._apply_column_widths(ws, _BACKTEST_COMPARISON_WIDTHS)
         
         # 表头
         headers = ['策略名称', '平均收益%', '胜率%', '夏普比率', '策略评级', '风险水平']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            self._apply_cell_style(cell, 'subheader')
+        ws.append([self._styled_cell(ws, "策略回测比较", 'header')])
+        ws.append([])
+        ws.append(self._styled_row(ws, headers, 'subheader'))
         
         # 简化的回测数据（实际应用中需要真实回测）
-        row = 4
         for strategy_name in strategy_names:
-            ws.cell(row=row, column=1, value=strategy_name)
-            ws.cell(row=row, column=2, value="待回测")
-            ws.cell(row=row, column=3, value="待回测")
-            ws.cell(row=row, column=4, value="待回测")
-            ws.cell(row=row, column=5, value="待回测")
-            ws.cell(row=row, column=6, value="待回测")
-            row += 1
-        
-        # 调整列宽
-        for col in range(1, 7):
-            ws.column_dimensions[ws.cell(row=1, column=col).column_letter].width = 15
+            ws.append([strategy_name] + ["待回测"] * 5)
 
 
 def main():
     """测试增强版输出管理器"""
     from database import DatabaseManager
     
-    # 初始化
+    parser = argparse.ArgumentParser(description='增强版输出管理器测试')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='只在内存中生成报告，不写入磁盘')
+    args = parser.parse_args()
+    
+    # 初始化（三个报告共用同一个数据库管理器和输出管理器）
     db = DatabaseManager()
     output_manager = EnhancedOutputManager(db)
+    output_manager.dry_run = args.dry_run
     
     print("=== 增强版输出管理器测试 ===")
     
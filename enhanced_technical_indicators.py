@@ -6,13 +6,56 @@
 
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from typing import Dict, Tuple, Optional, List
 import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from database import DatabaseManager
 from utils import config_manager
 
 logger = logging.getLogger(__name__)
 
+# 指标计算所需的行情列
+_OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# 指标计算结果缓存的最大股票数
+_INDICATOR_CACHE_SIZE = 256
+
+# 批量计算时保存的EMA类指标递推状态字段，与 indicator_state 表的列一一对应
+_INDICATOR_STATE_FIELDS = ['ema_fast', 'ema_slow', 'macd_signal', 'rsi_avg_gain', 'rsi_avg_loss', 'kdj_k', 'kdj_d']
+
+# 信号与评分的分段查表：np.searchsorted(边界, 值, side='right') 得到区间下标，再到对应表中取值。
+# side='right' 时边界值归入右侧区间；闭区间的右端点用 np.nextafter 上移一个ulp，使其留在左侧区间
+# RSI区间：<20 | [20, 30) | [30, 70] | (70, 80] | >80
+_RSI_EDGES = np.array([20.0, 30.0, np.nextafter(70.0, np.inf), np.nextafter(80.0, np.inf)])
+_RSI_SCORE_DELTA = np.array([5.0, 15.0, 10.0, -10.0, -15.0])
+_RSI_SIGNALS = ('严重超卖', '超卖', '正常', '超买', '严重超买')
+
+# 布林带位置区间：<20 | [20, 80] | >80
+_BB_POSITION_EDGES = np.array([20.0, np.nextafter(80.0, np.inf)])
+_BB_POSITION_SCORE_DELTA = np.array([10.0, 7.5, -10.0])
+_BB_POSITION_SIGNALS = ('接近下轨', '正常区间', '接近上轨')
+
+# 量比区间：<0.5 | [0.5, 2] | >2
+_VOLUME_RATIO_EDGES = np.array([0.5, np.nextafter(2.0, np.inf)])
+_VOLUME_RATIO_SCORE_DELTA = np.array([-2.5, 0.0, 5.0])
+
+
+def _bucket_index(edges: np.ndarray, value: float) -> int:
+    """
+    查找数值所在的分段区间下标
+    
+    Args:
+        edges: 升序排列的区间边界
+        value: 待分段的数值（不能为NaN）
+        
+    Returns:
+        区间下标，范围 0 ~ len(edges)
+    """
+    return int(np.searchsorted(edges, value, side='right'))
+
 
 class EnhancedTechnicalIndicators:
     """增强版技术指标计算类"""
@@ -26,6 +69,285 @@ class EnhancedTechnicalIndicators:
         """
         self.db = db_manager
         self.config = config_manager
+        
+        # 指标计算结果缓存：{股票代码: (最新数据日期, 指标DataFrame)}，按最近使用顺序淘汰
+        self._indicator_cache = OrderedDict()
+    
+    # ------------------------------------------------------------------
+    # ndarray版指标计算：输入输出均为float64 ndarray，供批量计算时共用同一份输入数组
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _as_float_array(data: pd.Series, dtype=np.float64) -> np.ndarray:
+        """将序列转换为指定浮点类型的ndarray（默认float64，类型已一致时不复制）"""
+        return data.to_numpy(dtype=dtype, copy=False)
+    
+    @staticmethod
+    def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+        """向后平移 periods 个位置，空出的位置填NaN"""
+        shifted = np.full(len(values), np.nan)
+        if periods < len(values):
+            shifted[periods:] = values[:len(values) - periods]
+        return shifted
+    
+    def _calc_ema(self, values: np.ndarray, period: int,
+                  init: Optional[float] = None, start: int = 0) -> np.ndarray:
+        """
+        计算EMA（ndarray版）
+        
+        Args:
+            values: 输入数组
+            period: 计算周期
+            init: 热启动初值，即 start-1 位置的EMA值；不传则从首个值冷启动
+            start: 热启动时开始递推的位置，之前的位置为NaN
+            
+        Returns:
+            EMA数组
+        """
+        if init is None:
+            return pd.Series(values).ewm(span=period, adjust=False).mean().to_numpy()
+        
+        # adjust=False 的EMA是纯递推，把上一期的EMA放在首位即可接着往下算
+        ema = np.full(len(values), np.nan)
+        seeded = np.concatenate(([init], values[start:]))
+        ema[start:] = pd.Series(seeded).ewm(span=period, adjust=False).mean().to_numpy()[1:]
+        return ema
+    
+    def _calc_sma(self, values: np.ndarray, period: int) -> np.ndarray:
+        """计算SMA（ndarray版）"""
+        return pd.Series(values).rolling(window=period).mean().to_numpy()
+    
+    def _calc_macd(self, close: np.ndarray, fast_period: int, slow_period: int,
+                   signal_period: int, init: Optional[Dict[str, float]] = None, start: int = 0,
+                   state: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+        """
+        计算MACD（ndarray版），返回 macd、macd_signal、macd_histogram 三列
+        
+        init/start 用于从保存的递推状态热启动（见 _calc_ema），state 不为None时写入末行的递推状态
+        """
+        init = init or {}
+        
+        # 计算快慢EMA（EMA递推由pandas的编译实现完成，之后的运算全部在ndarray上进行）
+        ema_fast = self._calc_ema(close, fast_period, init.get('ema_fast'), start)
+        ema_slow = self._calc_ema(close, slow_period, init.get('ema_slow'), start)
+        
+        # 计算MACD线(DIF)
+        macd_line = ema_fast - ema_slow
+        
+        # 计算信号线(DEA)
+        signal_line = self._calc_ema(macd_line, signal_period, init.get('macd_signal'), start)
+        
+        if state is not None and len(close):
+            state.update(ema_fast=ema_fast[-1], ema_slow=ema_slow[-1], macd_signal=signal_line[-1])
+        
+        # 计算MACD柱状图：相减后原地乘2，省去一次中间数组的分配
+        histogram = np.empty_like(macd_line)
+        np.subtract(macd_line, signal_line, out=histogram)
+        histogram *= 2
+        
+        return {
+            'macd': macd_line,
+            'macd_signal': signal_line,
+            'macd_histogram': histogram
+        }
+    
+    def _calc_rsi(self, close: np.ndarray, period: int, init: Optional[Dict[str, float]] = None,
+                  start: int = 0, state: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """
+        计算RSI（ndarray版，威尔德平滑）
+        
+        init/start 用于从保存的平均涨跌幅热启动（start 之前的位置为NaN），state 不为None时写入末行的平均涨跌幅
+        """
+        # 计算价格变化（首日及缺失值的变化视为0）；热启动时 start 处的变化基于前一根K线，
+        # 即保存状态时的收盘价
+        delta = np.diff(close, prepend=np.nan)
+        
+        # 分离上涨和下跌
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        
+        # 使用威尔德平滑方法计算平均涨跌幅：涨跌两列放在同一个块中，一次ewm完成平滑
+        alpha = 1.0 / period
+        if init is None:
+            smoothed = pd.DataFrame({'gain': gain, 'loss': loss}).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+        else:
+            seeded = pd.DataFrame({
+                'gain': np.concatenate(([init['rsi_avg_gain']], gain[start:])),
+                'loss': np.concatenate(([init['rsi_avg_loss']], loss[start:]))
+            })
+            smoothed = np.full((len(close), 2), np.nan)
+            smoothed[start:] = seeded.ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+        
+        if state is not None and len(close):
+            state.update(rsi_avg_gain=smoothed[-1, 0], rsi_avg_loss=smoothed[-1, 1])
+        
+        # 计算RS和RSI
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = smoothed[:, 0] / smoothed[:, 1]
+            return 100 - (100 / (1 + rs))
+    
+    def _calc_bollinger(self, close: np.ndarray, period: int, std_dev: float) -> Dict[str, np.ndarray]:
+        """计算布林带（ndarray版），返回上中下轨、宽度和位置五列"""
+        n = len(close)
+        
+        if period > 1 and n >= period and not np.isnan(close).any():
+            # 用前缀和一次求出所有窗口的均值与样本标准差；先减去首个价格以减小大数相消带来的误差
+            shift = close[0]
+            shifted = close - shift
+            cum_sum = np.concatenate(([0.0], np.cumsum(shifted)))
+            cum_sq = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+            window_sum = cum_sum[period:] - cum_sum[:-period]
+            window_sq = cum_sq[period:] - cum_sq[:-period]
+            window_mean = window_sum / period
+            window_var = (window_sq - window_sum * window_mean) / (period - 1)
+            
+            # 计算中轨（移动平均线）与标准差，前 period-1 个位置保持NaN
+            middle_band = np.full(n, np.nan)
+            std = np.full(n, np.nan)
+            middle_band[period - 1:] = window_mean + shift
+            std[period - 1:] = np.sqrt(np.maximum(window_var, 0.0))
+        else:
+            # 数据不足或含缺失值时退回滚动窗口计算
+            middle_band = self._calc_sma(close, period)
+            std = pd.Series(close).rolling(window=period).std().to_numpy()
+        
+        # 计算上下轨
+        upper_band = middle_band + (std * std_dev)
+        lower_band = middle_band - (std * std_dev)
+        
+        # 计算布林带宽度和位置
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bb_width = (upper_band - lower_band) / middle_band * 100
+            bb_position = (close - lower_band) / (upper_band - lower_band) * 100
+        
+        return {
+            'bb_upper': upper_band,
+            'bb_middle': middle_band,
+            'bb_lower': lower_band,
+            'bb_width': bb_width,
+            'bb_position': bb_position
+        }
+    
+    def _calc_kdj(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                  k_period: int, d_period: int, j_period: int,
+                  init: Optional[Dict[str, float]] = None, start: int = 0,
+                  state: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+        """
+        计算KDJ（ndarray版），返回 kdj_k、kdj_d、kdj_j、kdj_rsv 四列
+        
+        RSV依赖滚动窗口，始终按完整数据计算；init/start 只用于K、D两条平滑线的热启动，
+        state 不为None时写入末行的K、D值
+        """
+        init = init or {}
+        
+        # 计算最高价和最低价的滚动窗口（pandas的滚动极值基于单调队列，整体为O(N)）
+        lowest_low = pd.Series(low).rolling(window=k_period).min().to_numpy()
+        highest_high = pd.Series(high).rolling(window=k_period).max().to_numpy()
+        
+        # 计算RSV（未成熟随机值）
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsv = (close - lowest_low) / (highest_high - lowest_low) * 100
+        
+        # 计算K值（RSV的移动平均）
+        k_values = self._calc_ema(rsv, d_period, init.get('kdj_k'), start)
+        
+        # 计算D值（K值的移动平均）
+        d_values = self._calc_ema(k_values, j_period, init.get('kdj_d'), start)
+        
+        if state is not None and len(close):
+            state.update(kdj_k=k_values[-1], kdj_d=d_values[-1])
+        
+        # 计算J值
+        j_values = 3 * k_values - 2 * d_values
+        
+        return {
+            'kdj_k': k_values,
+            'kdj_d': d_values,
+            'kdj_j': j_values,
+            'kdj_rsv': rsv
+        }
+    
+    def _calc_cci(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> np.ndarray:
+        """计算CCI（ndarray版）"""
+        # 计算典型价格
+        tp = (high + low + close) / 3
+        
+        # 在滑动窗口视图上一次性算出每个窗口的均值（典型价格的移动平均）和平均绝对偏差，
+        # 再直接得到CCI，前 period-1 个位置保持NaN
+        cci = np.full(len(tp), np.nan)
+        if len(tp) >= period:
+            windows = sliding_window_view(tp, period)
+            sma_tp = windows.mean(axis=1)
+            mad = np.abs(windows - sma_tp[:, None]).mean(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cci[period - 1:] = (tp[period - 1:] - sma_tp) / (0.015 * mad)
+        
+        return cci
+    
+    def _calc_williams_r(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> np.ndarray:
+        """计算威廉指标（ndarray版）"""
+        # 计算周期内最高价和最低价
+        highest_high = pd.Series(high).rolling(window=period).max().to_numpy()
+        lowest_low = pd.Series(low).rolling(window=period).min().to_numpy()
+        
+        # 计算威廉指标
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (highest_high - close) / (highest_high - lowest_low) * (-100)
+    
+    def _calc_momentum(self, close: np.ndarray, period: int) -> np.ndarray:
+        """计算动量指标（ndarray版）"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return close / self._shift(close, period) * 100
+    
+    def _calc_roc(self, close: np.ndarray, period: int) -> np.ndarray:
+        """计算ROC（ndarray版）"""
+        previous = self._shift(close, period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (close - previous) / previous * 100
+    
+    def _calc_obv(self, close: np.ndarray, volume: np.ndarray) -> np.ndarray:
+        """
+        计算OBV（ndarray版）
+        
+        成交量和累积结果使用float32：方向只取涨跌符号，float32约7位有效数字已超出展示精度，
+        而带宽减半；价格判断方向仍用float64，避免微小价差被舍入掉
+        """
+        # 计算价格变化方向（首日及缺失价格无法判断方向，按上涨计入）
+        direction = np.sign(np.diff(close, prepend=np.nan)).astype(np.float32)
+        direction[np.isnan(direction)] = 1.0
+        
+        # 根据价格变化方向调整成交量，并计算累积成交量（缺失成交量处保持NaN）
+        signed_volume = direction * volume.astype(np.float32, copy=False)
+        return pd.Series(signed_volume).cumsum().to_numpy()
+    
+    def _calc_atr(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> np.ndarray:
+        """计算ATR（ndarray版）"""
+        # 计算真实波幅
+        prev_close = self._shift(close, 1)
+        tr1 = high - low
+        tr2 = np.abs(high - prev_close)
+        tr3 = np.abs(low - prev_close)
+        
+        # 逐元素取三者最大值；fmax 忽略NaN（首日没有前收盘价），与 DataFrame.max(axis=1) 一致
+        true_range = np.fmax.reduce([tr1, tr2, tr3])
+        
+        # 计算ATR（真实波幅的移动平均）
+        return self._calc_sma(true_range, period)
+    
+    def _calc_volume_ratio(self, volume: np.ndarray, period: int) -> np.ndarray:
+        """计算量比（ndarray版，结果为float32）"""
+        volume = volume.astype(np.float32, copy=False)
+        
+        # 计算平均成交量
+        avg_volume = self._calc_sma(volume, period).astype(np.float32)
+        
+        # 计算量比
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return volume / avg_volume
+    
+    # ------------------------------------------------------------------
+    # Series版指标计算（对外接口）
+    # ------------------------------------------------------------------
     
     def calculate_ema(self, data: pd.Series, period: int) -> pd.Series:
         """
@@ -69,26 +391,10 @@ class EnhancedTechnicalIndicators:
         Returns:
             包含MACD、信号线、柱状图的DataFrame
         """
-        # 计算快慢EMA
-        ema_fast = self.calculate_ema(close_prices, fast_period)
-        ema_slow = self.calculate_ema(close_prices, slow_period)
-        
-        # 计算MACD线(DIF)
-        macd_line = ema_fast - ema_slow
-        
-        # 计算信号线(DEA)
-        signal_line = self.calculate_ema(macd_line, signal_period)
-        
-        # 计算MACD柱状图
-        histogram = 2 * (macd_line - signal_line)
-        
-        result = pd.DataFrame({
-            'macd': macd_line,
-            'macd_signal': signal_line,
-            'macd_histogram': histogram
-        })
-        
-        return result
+        return pd.DataFrame(
+            self._calc_macd(self._as_float_array(close_prices), fast_period, slow_period, signal_period),
+            index=close_prices.index
+        )
     
     def calculate_rsi(self, close_prices: pd.Series, period: int = 14) -> pd.Series:
         """
@@ -101,23 +407,7 @@ class EnhancedTechnicalIndicators:
         Returns:
             RSI序列
         """
-        # 计算价格变化
-        delta = close_prices.diff()
-        
-        # 分离上涨和下跌
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
-        
-        # 使用威尔德平滑方法计算平均涨跌幅
-        alpha = 1.0 / period
-        avg_gain = gain.ewm(alpha=alpha, adjust=False).mean()
-        avg_loss = loss.ewm(alpha=alpha, adjust=False).mean()
-        
-        # 计算RS和RSI
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
+        return pd.Series(self._calc_rsi(self._as_float_array(close_prices), period), index=close_prices.index)
     
     def calculate_bollinger_bands(self, close_prices: pd.Series, 
                                  period: int = 20, 
@@ -133,29 +423,10 @@ class EnhancedTechnicalIndicators:
         Returns:
             包含上轨、中轨、下轨的DataFrame
         """
-        # 计算中轨（移动平均线）
-        middle_band = self.calculate_sma(close_prices, period)
-        
-        # 计算标准差
-        std = close_prices.rolling(window=period).std()
-        
-        # 计算上下轨
-        upper_band = middle_band + (std * std_dev)
-        lower_band = middle_band - (std * std_dev)
-        
-        # 计算布林带宽度和位置
-        bb_width = (upper_band - lower_band) / middle_band * 100
-        bb_position = (close_prices - lower_band) / (upper_band - lower_band) * 100
-        
-        result = pd.DataFrame({
-            'bb_upper': upper_band,
-            'bb_middle': middle_band,
-            'bb_lower': lower_band,
-            'bb_width': bb_width,
-            'bb_position': bb_position
-        })
-        
-        return result
+        return pd.DataFrame(
+            self._calc_bollinger(self._as_float_array(close_prices), period, std_dev),
+            index=close_prices.index
+        )
     
     def calculate_kdj(self, high_prices: pd.Series, 
                      low_prices: pd.Series, 
@@ -177,30 +448,13 @@ class EnhancedTechnicalIndicators:
         Returns:
             包含K、D、J值的DataFrame
         """
-        # 计算最高价和最低价的滚动窗口
-        lowest_low = low_prices.rolling(window=k_period).min()
-        highest_high = high_prices.rolling(window=k_period).max()
-        
-        # 计算RSV（未成熟随机值）
-        rsv = (close_prices - lowest_low) / (highest_high - lowest_low) * 100
-        
-        # 计算K值（RSV的移动平均）
-        k_values = rsv.ewm(span=d_period, adjust=False).mean()
-        
-        # 计算D值（K值的移动平均）
-        d_values = k_values.ewm(span=j_period, adjust=False).mean()
-        
-        # 计算J值
-        j_values = 3 * k_values - 2 * d_values
-        
-        result = pd.DataFrame({
-            'kdj_k': k_values,
-            'kdj_d': d_values,
-            'kdj_j': j_values,
-            'kdj_rsv': rsv
-        })
-        
-        return result
+        return pd.DataFrame(
+            self._calc_kdj(
+                self._as_float_array(high_prices), self._as_float_array(low_prices),
+                self._as_float_array(close_prices), k_period, d_period, j_period
+            ),
+            index=close_prices.index
+        )
     
     def calculate_cci(self, high_prices: pd.Series,
                      low_prices: pd.Series,
@@ -218,21 +472,13 @@ class EnhancedTechnicalIndicators:
         Returns:
             CCI序列
         """
-        # 计算典型价格
-        typical_price = (high_prices + low_prices + close_prices) / 3
-        
-        # 计算典型价格的移动平均
-        sma_tp = typical_price.rolling(window=period).mean()
-        
-        # 计算平均绝对偏差
-        mad = typical_price.rolling(window=period).apply(
-            lambda x: np.mean(np.abs(x - x.mean())), raw=True
+        return pd.Series(
+            self._calc_cci(
+                self._as_float_array(high_prices), self._as_float_array(low_prices),
+                self._as_float_array(close_prices), period
+            ),
+            index=close_prices.index
         )
-        
-        # 计算CCI
-        cci = (typical_price - sma_tp) / (0.015 * mad)
-        
-        return cci
     
     def calculate_williams_r(self, high_prices: pd.Series,
                            low_prices: pd.Series,
@@ -250,14 +496,13 @@ class EnhancedTechnicalIndicators:
         Returns:
             威廉指标序列
         """
-        # 计算周期内最高价和最低价
-        highest_high = high_prices.rolling(window=period).max()
-        lowest_low = low_prices.rolling(window=period).min()
-        
-        # 计算威廉指标
-        williams_r = (highest_high - close_prices) / (highest_high - lowest_low) * (-100)
-        
-        return williams_r
+        return pd.Series(
+            self._calc_williams_r(
+                self._as_float_array(high_prices), self._as_float_array(low_prices),
+                self._as_float_array(close_prices), period
+            ),
+            index=close_prices.index
+        )
     
     def calculate_momentum(self, close_prices: pd.Series, period: int = 10) -> pd.Series:
         """
@@ -270,8 +515,7 @@ class EnhancedTechnicalIndicators:
         Returns:
             动量指标序列
         """
-        momentum = close_prices / close_prices.shift(period) * 100
-        return momentum
+        return pd.Series(self._calc_momentum(self._as_float_array(close_prices), period), index=close_prices.index)
     
     def calculate_roc(self, close_prices: pd.Series, period: int = 12) -> pd.Series:
         """
@@ -284,8 +528,7 @@ class EnhancedTechnicalIndicators:
         Returns:
             ROC序列
         """
-        roc = (close_prices - close_prices.shift(period)) / close_prices.shift(period) * 100
-        return roc
+        return pd.Series(self._calc_roc(self._as_float_array(close_prices), period), index=close_prices.index)
     
     def calculate_obv(self, close_prices: pd.Series, volume: pd.Series) -> pd.Series:
         """
@@ -298,18 +541,10 @@ class EnhancedTechnicalIndicators:
         Returns:
             OBV序列
         """
-        # 计算价格变化方向
-        price_change = close_prices.diff()
-        
-        # 根据价格变化方向调整成交量
-        obv_volume = volume.copy()
-        obv_volume[price_change < 0] = -obv_volume[price_change < 0]
-        obv_volume[price_change == 0] = 0
-        
-        # 计算累积成交量
-        obv = obv_volume.cumsum()
-        
-        return obv
+        return pd.Series(
+            self._calc_obv(self._as_float_array(close_prices), self._as_float_array(volume, np.float32)),
+            index=volume.index
+        )
     
     def calculate_atr(self, high_prices: pd.Series,
                      low_prices: pd.Series,
@@ -327,17 +562,13 @@ class EnhancedTechnicalIndicators:
         Returns:
             ATR序列
         """
-        # 计算真实波幅
-        tr1 = high_prices - low_prices
-        tr2 = np.abs(high_prices - close_prices.shift(1))
-        tr3 = np.abs(low_prices - close_prices.shift(1))
-        
-        true_range = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        
-        # 计算ATR（真实波幅的移动平均）
-        atr = true_range.rolling(window=period).mean()
-        
-        return atr
+        return pd.Series(
+            self._calc_atr(
+                self._as_float_array(high_prices), self._as_float_array(low_prices),
+                self._as_float_array(close_prices), period
+            ),
+            index=high_prices.index
+        )
     
     def calculate_volume_ratio(self, volume_data: pd.Series, period: int = 5) -> pd.Series:
         """
@@ -350,13 +581,10 @@ class EnhancedTechnicalIndicators:
         Returns:
             量比序列
         """
-        # 计算平均成交量
-        avg_volume = volume_data.rolling(window=period).mean()
-        
-        # 计算量比
-        volume_ratio = volume_data / avg_volume
-        
-        return volume_ratio
+        return pd.Series(
+            self._calc_volume_ratio(self._as_float_array(volume_data, np.float32), period),
+            index=volume_data.index
+        )
     
     def calculate_all_indicators(self, symbol: str) -> pd.DataFrame:
         """
@@ -375,137 +603,288 @@ class EnhancedTechnicalIndicators:
             logger.warning(f"股票 {symbol} 没有历史数据")
             return pd.DataFrame()
         
+        return self._calculate_indicators_from_data(symbol, hist_data)
+    
+    def calculate_all_indicators_batch(self, symbols: List[str],
+                                       n_workers: Optional[int] = None,
+                                       failed: Optional[List[str]] = None) -> Dict[str, pd.Series]:
+        """
+        批量计算多只股票的最新技术指标
+        
+        一次查询取出所有股票的历史数据，再按股票分组并行计算，避免逐只查询数据库；
+        MACD、RSI、KDJ的EMA递推从上次保存的状态热启动，只需递推新增的K线，计算后再保存末行状态
+        
+        Args:
+            symbols: 股票代码列表
+            n_workers: 并行计算的线程数，默认使用CPU核数
+            failed: 传入列表时追加计算出错的股票代码（单只股票出错不影响其他股票）
+            
+        Returns:
+            {股票代码: 最新一行技术指标}，没有历史数据或计算出错的股票不包含在内
+        """
+        all_data = self.db.get_stock_data_batch(symbols, days=120, columns=_OHLCV_COLUMNS)
+        
+        if all_data.empty:
+            return {}
+        
+        groups = list(all_data.groupby('symbol', sort=False))
+        
+        # 上次保存的递推状态，以及本次计算后各股票的末行状态
+        saved_states = self.db.get_indicator_states([symbol for symbol, _ in groups])
+        new_states = [{} for _ in groups]
+        
+        def calculate(index: int) -> Optional[pd.DataFrame]:
+            symbol, hist_data = groups[index]
+            try:
+                return self._calculate_indicators_from_data(symbol, hist_data,
+                                                            saved_states.get(symbol), new_states[index])
+            except Exception as e:
+                logger.error(f"计算股票 {symbol} 技术指标失败: {e}")
+                new_states[index].clear()
+                return None
+        
+        # 各股票的计算相互独立；numpy/pandas的数值运算会释放GIL，可以用线程并行
+        max_workers = min(n_workers or os.cpu_count() or 1, len(groups))
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(calculate, range(len(groups))))
+        else:
+            results = [calculate(index) for index in range(len(groups))]
+        
+        latest = {}
+        for (symbol, _), indicators in zip(groups, results):
+            if indicators is None:
+                if failed is not None:
+                    failed.append(symbol)
+            elif not indicators.empty:
+                latest[symbol] = indicators.iloc[-1]
+        
+        # 保存末行递推状态供下次热启动；计算出错或数据缺失导致状态不完整的股票不保存
+        state_rows = []
+        for (symbol, _), state in zip(groups, new_states):
+            values = [state.get(field) for field in ['close', *_INDICATOR_STATE_FIELDS]]
+            if 'date' in state and all(value is not None and np.isfinite(value) for value in values):
+                state_rows.append((symbol, state['date'], state['params'], *(float(value) for value in values)))
+        self.db.upsert_indicator_states(state_rows)
+        
+        return latest
+    
+    def _indicator_state_params(self) -> str:
+        """
+        生成递推状态对应的指标参数标识，参数变化后已保存的状态不再可用
+        
+        Returns:
+            MACD快慢线/信号线、RSI、KDJ周期拼成的字符串
+        """
+        macd_config = self.config.get('technical.macd', {})
+        rsi_config = self.config.get('technical.rsi', {})
+        kdj_config = self.config.get('technical.kdj', {})
+        return ','.join(str(value) for value in (
+            macd_config.get('fast_period', 12),
+            macd_config.get('slow_period', 26),
+            macd_config.get('signal_period', 9),
+            rsi_config.get('period', 14),
+            kdj_config.get('k_period', 9),
+            kdj_config.get('d_period', 3),
+            kdj_config.get('j_period', 3)
+        ))
+    
+    def _calculate_indicators_from_data(self, symbol: str, hist_data: pd.DataFrame,
+                                        init_state: Optional[Dict] = None,
+                                        state_out: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        基于已加载的历史数据计算所有技术指标
+        
+        Args:
+            symbol: 股票代码
+            hist_data: 历史数据DataFrame
+            init_state: 上次保存的递推状态（可选）。状态日期在数据中且之后有新K线、参数一致时，
+                MACD、RSI、KDJ只从状态日期之后开始递推，之前各行的这些列为NaN
+            state_out: 传入字典时写入末行的递推状态（date、params、close 及 _INDICATOR_STATE_FIELDS）
+            
+        Returns:
+            包含所有技术指标的DataFrame
+        """
         # 确保数据按日期排序
         hist_data = hist_data.sort_values('date').reset_index(drop=True)
         
-        # 提取价格和成交量数据
-        high_prices = hist_data['high']
-        low_prices = hist_data['low']
-        close_prices = hist_data['close']
-        volume_data = hist_data['volume']
-        
-        # 初始化结果DataFrame
-        result = pd.DataFrame()
-        result['date'] = hist_data['date']
-        result['symbol'] = symbol
-        result['close'] = close_prices
-        result['high'] = high_prices
-        result['low'] = low_prices
-        result['volume'] = volume_data
+        # 价格和成交量只转换一次，所有指标共用；价格保持float64精度，
+        # 成交量只参与OBV和量比这两个以带宽为主的计算，使用float32
+        high = self._as_float_array(hist_data['high'])
+        low = self._as_float_array(hist_data['low'])
+        close = self._as_float_array(hist_data['close'])
+        volume = self._as_float_array(hist_data['volume'], np.float32)
+        
+        # 结果各列先收集到字典中（均为ndarray），最后一次性构建DataFrame，避免逐列插入和多次concat
+        columns = {
+            'date': hist_data['date'].to_numpy(),
+            'symbol': symbol,
+            'close': hist_data['close'].to_numpy(),
+            'high': hist_data['high'].to_numpy(),
+            'low': hist_data['low'].to_numpy(),
+            'volume': hist_data['volume'].to_numpy()
+        }
+        
+        # 热启动：保存状态的那根K线必须在本次数据中、收盘价未变（历史数据未被重新复权或修正），
+        # 且其后还有新K线，否则冷启动完整递推
+        params = self._indicator_state_params()
+        init = None
+        start = 0
+        if init_state is not None and init_state.get('params') == params:
+            matches = np.flatnonzero(columns['date'] == init_state['date'])
+            if (matches.size and matches[0] + 1 < len(hist_data)
+                    and np.isclose(close[matches[0]], init_state['close'])):
+                init = init_state
+                start = int(matches[0]) + 1
+        
+        if state_out is not None and len(hist_data):
+            state_out.update(date=str(columns['date'][-1]), params=params, close=close[-1])
         
         try:
             # MACD指标
             macd_config = self.config.get('technical.macd', {})
-            macd_data = self.calculate_macd(
-                close_prices,
+            columns.update(self._calc_macd(
+                close,
                 fast_period=macd_config.get('fast_period', 12),
                 slow_period=macd_config.get('slow_period', 26),
-                signal_period=macd_config.get('signal_period', 9)
-            )
-            result = pd.concat([result, macd_data], axis=1)
+                signal_period=macd_config.get('signal_period', 9),
+                init=init, start=start, state=state_out
+            ))
             
             # RSI指标
             rsi_config = self.config.get('technical.rsi', {})
-            result['rsi'] = self.calculate_rsi(
-                close_prices,
-                period=rsi_config.get('period', 14)
-            )
+            columns['rsi'] = self._calc_rsi(close, period=rsi_config.get('period', 14),
+                                            init=init, start=start, state=state_out)
             
             # 移动平均线
             ma_periods = self.config.get('technical.ma_periods', [5, 10, 20, 60])
             for period in ma_periods:
-                result[f'ma{period}'] = self.calculate_sma(close_prices, period)
+                columns[f'ma{period}'] = self._calc_sma(close, period)
             
             # 布林带
             bb_config = self.config.get('technical.bollinger', {})
-            bb_data = self.calculate_bollinger_bands(
-                close_prices,
+            columns.update(self._calc_bollinger(
+                close,
                 period=bb_config.get('period', 20),
                 std_dev=bb_config.get('std_dev', 2.0)
-            )
-            result = pd.concat([result, bb_data], axis=1)
+            ))
             
             # KDJ指标
             kdj_config = self.config.get('technical.kdj', {})
-            kdj_data = self.calculate_kdj(
-                high_prices, low_prices, close_prices,
+            columns.update(self._calc_kdj(
+                high, low, close,
                 k_period=kdj_config.get('k_period', 9),
                 d_period=kdj_config.get('d_period', 3),
-                j_period=kdj_config.get('j_period', 3)
-            )
-            result = pd.concat([result, kdj_data], axis=1)
+                j_period=kdj_config.get('j_period', 3),
+                init=init, start=start, state=state_out
+            ))
             
             # CCI指标
             cci_config = self.config.get('technical.cci', {})
-            result['cci'] = self.calculate_cci(
-                high_prices, low_prices, close_prices,
-                period=cci_config.get('period', 14)
-            )
+            columns['cci'] = self._calc_cci(high, low, close, period=cci_config.get('period', 14))
             
             # 威廉指标
             wr_config = self.config.get('technical.williams_r', {})
-            result['williams_r'] = self.calculate_williams_r(
-                high_prices, low_prices, close_prices,
-                period=wr_config.get('period', 14)
-            )
+            columns['williams_r'] = self._calc_williams_r(high, low, close, period=wr_config.get('period', 14))
             
             # 动量指标
             momentum_config = self.config.get('technical.momentum', {})
-            result['momentum'] = self.calculate_momentum(
-                close_prices,
-                period=momentum_config.get('period', 10)
-            )
+            columns['momentum'] = self._calc_momentum(close, period=momentum_config.get('period', 10))
             
             # ROC指标
             roc_config = self.config.get('technical.roc', {})
-            result['roc'] = self.calculate_roc(
-                close_prices,
-                period=roc_config.get('period', 12)
-            )
+            columns['roc'] = self._calc_roc(close, period=roc_config.get('period', 12))
             
             # OBV指标
-            result['obv'] = self.calculate_obv(close_prices, volume_data)
+            columns['obv'] = self._calc_obv(close, volume)
             
             # ATR指标
             atr_config = self.config.get('technical.atr', {})
-            result['atr'] = self.calculate_atr(
-                high_prices, low_prices, close_prices,
-                period=atr_config.get('period', 14)
-            )
+            columns['atr'] = self._calc_atr(high, low, close, period=atr_config.get('period', 14))
             
             # 量比
             volume_config = self.config.get('technical.volume_ratio', {})
-            result['volume_ratio'] = self.calculate_volume_ratio(
-                volume_data,
-                period=volume_config.get('base_period', 5)
-            )
+            columns['volume_ratio'] = self._calc_volume_ratio(volume, period=volume_config.get('base_period', 5))
             
         except Exception as e:
             logger.error(f"计算股票 {symbol} 技术指标时出错: {e}")
-            
+        
+        # 出错时保留已计算出的列，与逐列写入时的行为一致；
+        # 各列ndarray均为本函数新建，copy=False 直接交给DataFrame，不再逐列复制一遍
+        result = pd.DataFrame(columns, copy=False)
+        
         return result
     
-    def detect_comprehensive_signals(self, symbol: str) -> Dict[str, str]:
+    def _get_indicators(self, symbol: str) -> pd.DataFrame:
+        """
+        获取股票的技术指标，最新数据日期未变化时复用上次的计算结果
+        
+        Args:
+            symbol: 股票代码
+            
+        Returns:
+            包含所有技术指标的DataFrame
+        """
+        latest_date = self.db.get_last_update_date(symbol)
+        
+        cached = self._indicator_cache.get(symbol)
+        if cached is not None and latest_date is not None and cached[0] == latest_date:
+            self._indicator_cache.move_to_end(symbol)
+            return cached[1]
+        
+        indicators = self.calculate_all_indicators(symbol)
+        
+        if latest_date is not None and not indicators.empty:
+            self._indicator_cache[symbol] = (latest_date, indicators)
+            self._indicator_cache.move_to_end(symbol)
+            if len(self._indicator_cache) > _INDICATOR_CACHE_SIZE:
+                self._indicator_cache.popitem(last=False)
+        
+        return indicators
+    
+    @staticmethod
+    def _latest_values(indicators: pd.DataFrame) -> Dict[str, Optional[float]]:
+        """
+        将最新一行指标转换为普通字典，数值转为float，缺失值和非数值转为None
+        
+        Args:
+            indicators: 技术指标DataFrame
+            
+        Returns:
+            {指标名: 数值或None}
+        """
+        latest = {}
+        for key, value in indicators.iloc[-1].to_dict().items():
+            if isinstance(value, (int, float, np.integer, np.floating)) and value == value:
+                latest[key] = float(value)
+            else:
+                latest[key] = None
+        return latest
+    
+    def detect_comprehensive_signals(self, symbol: str,
+                                     indicators: Optional[pd.DataFrame] = None) -> Dict[str, str]:
         """
         综合技术指标信号检测
         
         Args:
             symbol: 股票代码
+            indicators: 已计算好的技术指标（可选），不传则自动获取
             
         Returns:
             综合信号字典
         """
-        indicators = self.calculate_all_indicators(symbol)
+        if indicators is None:
+            indicators = self._get_indicators(symbol)
         
         if indicators.empty:
             return {'综合信号': '无数据'}
         
         # 获取最新数据
-        latest = indicators.iloc[-1]
+        latest = self._latest_values(indicators)
         signals = {}
         
         # MACD信号
-        if pd.notna(latest.get('macd')) and pd.notna(latest.get('macd_signal')):
+        if latest.get('macd') is not None and latest.get('macd_signal') is not None:
             if latest['macd'] > latest['macd_signal']:
                 if latest['macd'] > 0:
                     signals['MACD'] = '强势看涨'
@@ -521,36 +900,22 @@ class EnhancedTechnicalIndicators:
         
         # RSI信号
         rsi = latest.get('rsi')
-        if pd.notna(rsi):
-            if rsi > 80:
-                signals['RSI'] = '严重超买'
-            elif rsi > 70:
-                signals['RSI'] = '超买'
-            elif rsi < 20:
-                signals['RSI'] = '严重超卖'
-            elif rsi < 30:
-                signals['RSI'] = '超卖'
-            else:
-                signals['RSI'] = '正常'
+        if rsi is not None:
+            signals['RSI'] = _RSI_SIGNALS[_bucket_index(_RSI_EDGES, rsi)]
         else:
             signals['RSI'] = '无信号'
         
         # 布林带信号
         bb_pos = latest.get('bb_position')
-        if pd.notna(bb_pos):
-            if bb_pos > 80:
-                signals['布林带'] = '接近上轨'
-            elif bb_pos < 20:
-                signals['布林带'] = '接近下轨'
-            else:
-                signals['布林带'] = '正常区间'
+        if bb_pos is not None:
+            signals['布林带'] = _BB_POSITION_SIGNALS[_bucket_index(_BB_POSITION_EDGES, bb_pos)]
         else:
             signals['布林带'] = '无信号'
         
         # KDJ信号
         kdj_k = latest.get('kdj_k')
         kdj_d = latest.get('kdj_d')
-        if pd.notna(kdj_k) and pd.notna(kdj_d):
+        if kdj_k is not None and kdj_d is not None:
             if kdj_k > 80 and kdj_d > 80:
                 signals['KDJ'] = '超买'
             elif kdj_k < 20 and kdj_d < 20:
@@ -581,29 +946,32 @@ class EnhancedTechnicalIndicators:
         
         return signals
     
-    def calculate_technical_score(self, symbol: str) -> float:
+    def calculate_technical_score(self, symbol: str,
+                                  indicators: Optional[pd.DataFrame] = None) -> float:
         """
         计算技术指标综合评分
         
         Args:
             symbol: 股票代码
+            indicators: 已计算好的技术指标（可选），不传则自动获取
             
         Returns:
             技术指标评分 (0-100)
         """
-        indicators = self.calculate_all_indicators(symbol)
+        if indicators is None:
+            indicators = self._get_indicators(symbol)
         
         if indicators.empty:
             return 0.0
         
-        latest = indicators.iloc[-1]
+        latest = self._latest_values(indicators)
         score = 50.0  # 基础分数
         
         try:
             # MACD评分 (权重: 25%)
             macd = latest.get('macd', 0)
             macd_signal = latest.get('macd_signal', 0)
-            if pd.notna(macd) and pd.notna(macd_signal):
+            if macd is not None and macd_signal is not None:
                 if macd > macd_signal and macd > 0:
                     score += 12.5
                 elif macd > macd_signal:
@@ -615,32 +983,20 @@ class EnhancedTechnicalIndicators:
             
             # RSI评分 (权重: 20%)
             rsi = latest.get('rsi', 50)
-            if pd.notna(rsi):
-                if 30 <= rsi <= 70:
-                    score += 10  # 正常区间
-                elif 20 <= rsi < 30:
-                    score += 15  # 超卖反弹机会
-                elif rsi < 20:
-                    score += 5   # 严重超卖
-                elif 70 < rsi <= 80:
-                    score -= 10  # 超买
-                else:
-                    score -= 15  # 严重超买
+            if rsi is not None:
+                # 严重超卖+5，超卖反弹机会+15，正常区间+10，超买-10，严重超买-15
+                score += _RSI_SCORE_DELTA[_bucket_index(_RSI_EDGES, rsi)]
             
             # 布林带评分 (权重: 15%)
             bb_pos = latest.get('bb_position', 50)
-            if pd.notna(bb_pos):
-                if 20 <= bb_pos <= 80:
-                    score += 7.5
-                elif bb_pos < 20:
-                    score += 10  # 接近下轨，反弹机会
-                else:
-                    score -= 10  # 接近上轨，回调风险
+            if bb_pos is not None:
+                # 接近下轨（反弹机会）+10，正常区间+7.5，接近上轨（回调风险）-10
+                score += _BB_POSITION_SCORE_DELTA[_bucket_index(_BB_POSITION_EDGES, bb_pos)]
             
             # KDJ评分 (权重: 15%)
             kdj_k = latest.get('kdj_k', 50)
             kdj_d = latest.get('kdj_d', 50)
-            if pd.notna(kdj_k) and pd.notna(kdj_d):
+            if kdj_k is not None and kdj_d is not None:
                 if kdj_k > kdj_d and kdj_k < 80:
                     score += 7.5
                 elif kdj_k < kdj_d and kdj_k > 20:
@@ -654,7 +1010,7 @@ class EnhancedTechnicalIndicators:
             ma5 = latest.get('ma5')
             ma20 = latest.get('ma20')
             close = latest.get('close')
-            if pd.notna(ma5) and pd.notna(ma20) and pd.notna(close):
+            if ma5 is not None and ma20 is not None and close is not None:
                 if close > ma5 > ma20:
                     score += 7.5  # 多头排列
                 elif close < ma5 < ma20:
@@ -662,17 +1018,15 @@ class EnhancedTechnicalIndicators:
             
             # 成交量评分 (权重: 10%)
             volume_ratio = latest.get('volume_ratio', 1)
-            if pd.notna(volume_ratio):
-                if volume_ratio > 2:
-                    score += 5  # 放量
-                elif volume_ratio < 0.5:
-                    score -= 2.5  # 缩量
+            if volume_ratio is not None:
+                # 缩量-2.5，正常0，放量+5
+                score += _VOLUME_RATIO_SCORE_DELTA[_bucket_index(_VOLUME_RATIO_EDGES, volume_ratio)]
             
         except Exception as e:
             logger.error(f"计算技术评分时出错: {e}")
         
         # 确保评分在0-100范围内
-        return max(0, min(100, score))
+        return max(0, min(100, float(score)))
 
 
 def main():
@@ -707,14 +1061,14 @@ def main():
     
     # 计算综合信号
     print("\n2. 计算综合技术信号...")
-    signals = enhanced_tech.detect_comprehensive_signals(test_symbol)
+    signals = enhanced_tech.detect_comprehensive_signals(test_symbol, indicators)
     
     for signal_type, signal_value in signals.items():
         print(f"  {signal_type}: {signal_value}")
     
     # 计算技术评分
     print("\n3. 计算技术指标评分...")
-    score = enhanced_tech.calculate_technical_score(test_symbol)
+    score = enhanced_tech.calculate_technical_score(test_symbol, indicators)
     print(f"  技术指标综合评分: {score:.2f}/100")
 
 
@@ -7,13 +7,20 @@
 import requests
 import time
 import random
+import asyncio
+from datetime import timedelta
 from typing import Dict, Any, Optional
 import logging
+import aiohttp
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
+# 连接池配置：缓存的主机连接池数量及每个主机保持的连接数
+POOL_CONNECTIONS = 32
+POOL_MAXSIZE = 64
+
 
 class EnterpriseNetworkAdapter:
     """企业网络环境适配器"""
@@ -42,7 +49,12 @@ class EnterpriseNetworkAdapter:
             allowed_methods=["HEAD", "GET", "OPTIONS"]
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # 扩大连接池，使保持连接的套接字可以在后续请求中复用，避免重复TCP/TLS握手
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=POOL_CONNECTIONS,
+            pool_maxsize=POOL_MAXSIZE
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
@@ -118,6 +130,95 @@ class EnterpriseNetworkAdapter:
             logger.error(f"请求异常: {e}")
             return None
     
+    async def _acquire_token_async(self, bucket: Dict[str, float], lock: asyncio.Lock):
+        """
+        异步令牌桶：桶容量为突发限制，每 min_delay 秒补充一个令牌
+        
+        Args:
+            bucket: 令牌桶状态 {'tokens': 当前令牌数, 'updated': 上次补充时间}
+            lock: 保护令牌桶状态的锁
+        """
+        while True:
+            async with lock:
+                now = time.monotonic()
+                bucket['tokens'] = min(
+                    float(self.burst_limit),
+                    bucket['tokens'] + (now - bucket['updated']) / self.min_delay
+                )
+                bucket['updated'] = now
+                
+                if bucket['tokens'] >= 1:
+                    bucket['tokens'] -= 1
+                    return
+                
+                wait_time = (1 - bucket['tokens']) * self.min_delay
+            
+            await asyncio.sleep(wait_time)
+    
+    async def safe_request_async(self, session: aiohttp.ClientSession, url: str,
+                                 semaphore: asyncio.Semaphore,
+                                 bucket: Dict[str, float],
+                                 lock: asyncio.Lock) -> Dict[str, Any]:
+        """
+        异步安全请求，受并发上限和令牌桶速率共同约束
+        
+        Args:
+            session: aiohttp会话
+            url: 请求地址
+            semaphore: 并发上限信号量
+            bucket: 令牌桶状态
+            lock: 令牌桶锁
+            
+        Returns:
+            测试结果字典（success、status_code、response_time）
+        """
+        result = {'success': False, 'status_code': None, 'response_time': None}
+        
+        async with semaphore:
+            await self._acquire_token_async(bucket, lock)
+            logger.info(f"测试连接: {url}")
+            
+            start_time = time.monotonic()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    result['status_code'] = response.status
+                    result['response_time'] = timedelta(seconds=time.monotonic() - start_time)
+                    
+                    if response.status == 403:
+                        logger.warning(f"访问被拒绝 (403): {url}")
+                    elif response.status == 429:
+                        logger.warning(f"请求过于频繁 (429): {url}")
+                    elif response.status < 400:
+                        result['success'] = True
+                    else:
+                        logger.error(f"请求异常: HTTP {response.status} {url}")
+                        
+            except asyncio.TimeoutError as e:
+                logger.error(f"请求超时: {url} {e}")
+            except aiohttp.ClientError as e:
+                logger.error(f"连接错误: {e}")
+        
+        return result
+    
+    async def test_connectivity_async(self, test_urls) -> Dict[str, Any]:
+        """并发测试多个地址的连通性"""
+        semaphore = asyncio.Semaphore(self.burst_limit)
+        bucket = {'tokens': float(self.burst_limit), 'updated': time.monotonic()}
+        lock = asyncio.Lock()
+        timeout = aiohttp.ClientTimeout(total=30)
+        
+        # 沿用同步会话的请求头（压缩格式交由aiohttp按自身支持情况协商）；禁用SSL验证（如果企业网络有SSL拦截）
+        headers = {k: v for k, v in self.session.headers.items() if k.lower() != 'accept-encoding'}
+        async with aiohttp.ClientSession(headers=headers, timeout=timeout,
+                                         connector=aiohttp.TCPConnector(ssl=False)) as session:
+            responses = await asyncio.gather(*[
+                self.safe_request_async(session, url, semaphore, bucket, lock)
+                for url in test_urls
+            ])
+        
+        return dict(zip(test_urls, responses))
+    
     def test_connectivity(self) -> Dict[str, Any]:
         """测试连通性"""
         test_urls = [
@@ -126,19 +227,25 @@ class EnterpriseNetworkAdapter:
             'https://hq.sinajs.cn/list=sh000001'
         ]
         
-        results = {}
-        
-        for url in test_urls:
-            logger.info(f"测试连接: {url}")
-            response = self.safe_request(url)
-            
-            results[url] = {
-                'success': response is not None,
-                'status_code': response.status_code if response else None,
-                'response_time': getattr(response, 'elapsed', None)
-            }
-        
-        return results
+        return asyncio.run(self.test_connectivity_async(test_urls))
+
+
+_shared_adapter: Optional[EnterpriseNetworkAdapter] = None
+
+
+def get_shared_adapter() -> EnterpriseNetworkAdapter:
+    """
+    获取进程内共享的适配器实例
+    
+    共享实例复用同一个会话的连接池，并让突发限制的请求计数跨调用累计
+    
+    Returns:
+        EnterpriseNetworkAdapter实例
+    """
+    global _shared_adapter
+    if _shared_adapter is None:
+        _shared_adapter = EnterpriseNetworkAdapter()
+    return _shared_adapter
 
 
 def create_enterprise_friendly_akshare_patch():
@@ -154,7 +261,7 @@ def create_enterprise_friendly_akshare_patch():
     
     def patched_stock_zh_a_hist(*args, **kwargs):
         """企业网络友好的股票历史数据获取"""
-        adapter = EnterpriseNetworkAdapter()
+        adapter = get_shared_adapter()
         
         try:
             # 添加延迟
@@ -5,18 +5,24 @@
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import socket
 import ssl
-import dns.resolver
+import sys
 import time
 import json
+import threading
 from datetime import datetime
-from typing import Dict, List, Any
+from urllib.parse import urlparse
+from typing import TYPE_CHECKING, Dict, List, Any, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 import logging
-import akshare as ak
 import urllib3
 from urllib3.exceptions import InsecureRequestWarning
 
+if TYPE_CHECKING:
+    import dns.resolver
+
 # 禁用SSL警告
 urllib3.disable_warnings(InsecureRequestWarning)
 
@@ -24,12 +30,82 @@ urllib3.disable_warnings(InsecureRequestWarning)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# akshare功能测试的总超时时间（秒），超时未返回的函数记为失败
+AKSHARE_TEST_TIMEOUT = 30
+
+# HTTP探测在响应未给出Content-Length时最多读取的正文字节数
+HTTP_PROBE_MAX_READ = 65536
+
+# Linux 客户端TCP Fast Open选项（内核4.11+）；标准库未导出该常量时在Linux上使用其取值30，其他平台不启用
+TCP_FASTOPEN_CONNECT = getattr(socket, 'TCP_FASTOPEN_CONNECT', 30 if sys.platform.startswith('linux') else None)
+
+# HTTP探测结果中保留的响应头（非详细模式）
+KEEP_HEADERS = ('server', 'content-type', 'content-length', 'cf-ray')
+
+
+class TTLDNSCache:
+    """按记录TTL缓存的DNS解析结果，同一域名在TTL内只向DNS服务器查询一次"""
+    
+    def __init__(self, resolver: 'dns.resolver.Resolver'):
+        """
+        初始化缓存
+        
+        Args:
+            resolver: 实际执行查询的解析器
+        """
+        self.resolver = resolver
+        
+        # {(域名, 记录类型): (过期时刻, IP列表)}
+        self._entries: Dict[Tuple[str, str], Tuple[float, List[str]]] = {}
+        # 每个域名一把锁：并发解析同一域名时只有一个线程真正查询，其余等待后直接命中缓存
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    def resolve(self, host: str, rrtype: str = 'A') -> List[str]:
+        """
+        解析域名，TTL内直接返回缓存结果
+        
+        Args:
+            host: 域名
+            rrtype: 记录类型
+            
+        Returns:
+            IP列表；解析失败时抛出dnspython的异常（失败结果不缓存）
+        """
+        key = (host, rrtype)
+        with self._lock:
+            host_lock = self._locks.setdefault(key, threading.Lock())
+        
+        with host_lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() < entry[0]:
+                return entry[1]
+            
+            answers = self.resolver.resolve(host, rrtype)
+            ips = [str(answer) for answer in answers]
+            self._entries[key] = (time.monotonic() + answers.rrset.ttl, ips)
+            return ips
+
 
 class NetworkDiagnostic:
     """网络诊断器"""
     
-    def __init__(self):
-        """初始化诊断器"""
+    # 不同的User-Agent及对应的请求头，类加载时构建一次，各次请求直接复用
+    USER_AGENT_HEADERS = (
+        ('default', {}),
+        ('chrome', {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}),
+        ('firefox', {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0'}),
+        ('mobile', {'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1'})
+    )
+    
+    def __init__(self, verbose: bool = False):
+        """
+        初始化诊断器
+        
+        Args:
+            verbose: 是否在结果中保留完整的响应头和证书主体/颁发者信息
+        """
+        self.verbose = verbose
         self.results = {
             'timestamp': datetime.now().isoformat(),
             'tests': {}
@@ -53,6 +129,39 @@ class NetworkDiagnostic:
             'https://api.finance.sina.com.cn/suggest/',
             'https://hq.sinajs.cn/list=sh000001'
         ]
+        
+        # DNS和SSL测试的主机：测试域名加上测试URL的主机，按出现顺序去重，每个主机只测一次
+        self.test_hosts = list(dict.fromkeys(
+            self.test_domains + [urlparse(url).hostname for url in self.test_urls]
+        ))
+        
+        # 所有DNS查询共用一个解析器：只读取一次系统配置，查询状态复用，
+        # 自带的LRU缓存让同一次运行中的重复查询直接命中。
+        # dnspython 在创建诊断器时才导入，仅导入本模块时不必加载
+        import dns.resolver
+        self.resolver = dns.resolver.Resolver()
+        self.resolver.cache = dns.resolver.LRUCache(256)
+        self.resolver.timeout = 2
+        self.resolver.lifetime = 3
+        
+        # DNS解析结果缓存，DNS测试与SSL测试共用，同一域名只查询一次
+        self.dns_cache = TTLDNSCache(self.resolver)
+        
+        # SSL上下文只创建一次，所有SSL探测共用；保存每个域名的TLS会话，
+        # 再次探测同一域名时用会话票据恢复，走简短握手
+        self.ssl_context = ssl.create_default_context()
+        self.ssl_context.minimum_version = ssl.TLSVersion.TLSv1_2
+        self.ssl_context.options &= ~ssl.OP_NO_TICKET
+        self._ssl_sessions: Dict[str, ssl.SSLSession] = {}
+        
+        # 公网IP探测结果，同一诊断器内只探测一次
+        self._public_ip: Optional[str] = None
+        
+        # 所有HTTP探测共用一个会话，同一主机的请求复用keep-alive连接，省去重复的TCP和TLS握手
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
     def test_basic_connectivity(self) -> Dict[str, Any]:
         """测试基本网络连通性"""
@@ -67,32 +176,50 @@ class NetworkDiagnostic:
         
         try:
             # 测试基本互联网访问
-            response = requests.get('https://www.baidu.com', timeout=10)
+            response = self.session.get('https://www.baidu.com', timeout=10)
             results['internet_access'] = response.status_code == 200
             logger.info(f"基本互联网访问: {'✅ 正常' if results['internet_access'] else '❌ 异常'}")
         except Exception as e:
             results['errors'].append(f"互联网访问测试失败: {e}")
             logger.error(f"互联网访问测试失败: {e}")
         
-        # 测试DNS解析
-        for domain in self.test_domains:
-            try:
-                answers = dns.resolver.resolve(domain, 'A')
-                ips = [str(answer) for answer in answers]
-                results['dns_resolution'][domain] = {
-                    'success': True,
-                    'ips': ips
-                }
-                logger.info(f"DNS解析 {domain}: ✅ {ips}")
-            except Exception as e:
-                results['dns_resolution'][domain] = {
-                    'success': False,
-                    'error': str(e)
-                }
-                logger.error(f"DNS解析 {domain}: ❌ {e}")
+        # 测试DNS解析：各域名的查询相互独立，并发执行，总耗时接近最慢的一次查询
+        with ThreadPoolExecutor(max_workers=len(self.test_hosts)) as executor:
+            futures = {executor.submit(self._resolve_domain, domain): domain for domain in self.test_hosts}
+            for future in as_completed(futures):
+                domain = futures[future]
+                success, detail = future.result()
+                if success:
+                    results['dns_resolution'][domain] = {
+                        'success': True,
+                        'ips': detail
+                    }
+                else:
+                    results['dns_resolution'][domain] = {
+                        'success': False,
+                        'error': detail
+                    }
         
         return results
     
+    def _resolve_domain(self, domain: str) -> Tuple[bool, Any]:
+        """
+        解析单个域名（在线程池中执行）
+        
+        Args:
+            domain: 域名
+            
+        Returns:
+            (是否成功, IP列表或错误信息)
+        """
+        try:
+            ips = self.dns_cache.resolve(domain)
+            logger.info(f"DNS解析 {domain}: ✅ {ips}")
+            return True, ips
+        except Exception as e:
+            logger.error(f"DNS解析 {domain}: ❌ {e}")
+            return False, str(e)
+    
     def test_ssl_connectivity(self) -> Dict[str, Any]:
         """测试SSL连接"""
         logger.info("测试SSL连接...")
@@ -102,39 +229,125 @@ class NetworkDiagnostic:
             'certificate_info': {}
         }
         
-        for domain in self.test_domains:
-            try:
-                # 创建SSL上下文
-                context = ssl.create_default_context()
-                
-                # 测试SSL连接
-                with socket.create_connection((domain, 443), timeout=10) as sock:
-                    with context.wrap_socket(sock, server_hostname=domain) as ssock:
-                        cert = ssock.getpeercert()
-                        
-                        results['ssl_tests'][domain] = {
-                            'success': True,
-                            'protocol': ssock.version(),
-                            'cipher': ssock.cipher()
-                        }
-                        
-                        results['certificate_info'][domain] = {
+        # 各域名的握手相互独立，并发执行
+        with ThreadPoolExecutor(max_workers=len(self.test_hosts)) as executor:
+            futures = {executor.submit(self._probe_ssl, domain): domain for domain in self.test_hosts}
+            for future in as_completed(futures):
+                domain = futures[future]
+                ssl_test, cert_info = future.result()
+                results['ssl_tests'][domain] = ssl_test
+                if cert_info is not None:
+                    results['certificate_info'][domain] = cert_info
+        
+        return results
+    
+    def _probe_ssl(self, domain: str) -> Tuple[Dict[str, Any], Any]:
+        """
+        对单个域名进行SSL握手测试（在线程池中执行）
+        
+        Args:
+            domain: 域名
+            
+        Returns:
+            (SSL测试结果, 证书信息)，失败时证书信息为None
+        """
+        try:
+            # 测试SSL连接
+            sock, address = self._connect(domain, 443)
+            with sock:
+                with self.ssl_context.wrap_socket(sock, server_hostname=domain,
+                                                  session=self._ssl_sessions.get(domain)) as ssock:
+                    cert = ssock.getpeercert()
+                    if ssock.session is not None:
+                        self._ssl_sessions[domain] = ssock.session
+                    
+                    ssl_test = {
+                        'success': True,
+                        'address': address,
+                        'protocol': ssock.version(),
+                        'cipher': ssock.cipher(),
+                        'session_reused': ssock.session_reused
+                    }
+                    
+                    if self.verbose:
+                        cert_info = {
                             'subject': dict(x[0] for x in cert['subject']),
                             'issuer': dict(x[0] for x in cert['issuer']),
                             'version': cert['version'],
                             'not_after': cert['notAfter']
                         }
-                        
-                        logger.info(f"SSL连接 {domain}: ✅ 正常")
-                        
-            except Exception as e:
-                results['ssl_tests'][domain] = {
-                    'success': False,
-                    'error': str(e)
-                }
-                logger.error(f"SSL连接 {domain}: ❌ {e}")
+                    else:
+                        # 默认只保留诊断用得到的通用名和到期时间
+                        cert_info = {
+                            'common_name': next((value for rdn in cert['subject'] for key, value in rdn
+                                                 if key == 'commonName'), None),
+                            'not_after': cert['notAfter']
+                        }
+                    
+                    logger.info(f"SSL连接 {domain}: ✅ 正常")
+                    return ssl_test, cert_info
+                    
+        except Exception as e:
+            logger.error(f"SSL连接 {domain}: ❌ {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }, None
+    
+    def _connect(self, domain: str, port: int, timeout: float = 10) -> Tuple[socket.socket, str]:
+        """
+        建立到域名的TCP连接，依次尝试该域名的各个IP，跳过连不上的地址
         
-        return results
+        直接使用DNS缓存中的IP字面量连接，省去每次连接时系统解析器(getaddrinfo)的完整流程；
+        缓存解析失败时退回系统解析一次，以便区分DNS问题和SSL问题
+        
+        Args:
+            domain: 域名
+            port: 端口
+            timeout: 每个地址的连接超时时间（秒）
+            
+        Returns:
+            (已连接的socket, 实际连接的IP)
+        """
+        try:
+            addresses = [(ip, port) for ip in self.dns_cache.resolve(domain)]
+        except Exception:
+            infos = socket.getaddrinfo(domain, port, socket.AF_INET, socket.SOCK_STREAM,
+                                       flags=socket.AI_NUMERICSERV)
+            addresses = [info[4] for info in infos]
+        
+        last_error = None
+        for address in addresses:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            self._tune_socket(sock)
+            try:
+                sock.connect(address)
+                return sock, address[0]
+            except OSError as e:
+                sock.close()
+                last_error = e
+                logger.warning(f"连接 {domain} ({address[0]}) 失败，尝试下一个地址: {e}")
+        
+        raise last_error or OSError(f"{domain} 没有可用的IP地址")
+    
+    @staticmethod
+    def _tune_socket(sock: socket.socket):
+        """
+        设置探测连接的TCP选项
+        
+        关闭Nagle算法，避免握手阶段的小包被延迟；支持时启用TCP Fast Open，
+        让握手数据随SYN一起发出。TFO只有在内核和对端都支持时才生效，不支持时忽略
+        
+        Args:
+            sock: 尚未连接的socket
+        """
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if TCP_FASTOPEN_CONNECT is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, TCP_FASTOPEN_CONNECT, 1)
+            except OSError:
+                pass
     
     def test_http_requests(self) -> Dict[str, Any]:
         """测试HTTP请求"""
@@ -146,47 +359,90 @@ class NetworkDiagnostic:
             'proxy_tests': {}
         }
         
-        # 不同的User-Agent
-        user_agents = {
-            'default': None,
-            'chrome': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'firefox': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
-            'mobile': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1'
-        }
-        
-        # 测试不同URL
+        # 测试不同URL：各URL并发请求；同一URL的各User-Agent在一个线程内依次请求，
+        # 共用会话中该主机的同一条keep-alive连接，每个主机只需一次TLS握手
         for url in self.test_urls:
             results['url_tests'][url] = {}
-            
-            for ua_name, ua_string in user_agents.items():
-                try:
-                    headers = {}
-                    if ua_string:
-                        headers['User-Agent'] = ua_string
-                    
-                    start_time = time.time()
-                    response = requests.get(url, headers=headers, timeout=15, verify=False)
-                    response_time = time.time() - start_time
-                    
-                    results['url_tests'][url][ua_name] = {
-                        'success': True,
-                        'status_code': response.status_code,
-                        'response_time': response_time,
-                        'content_length': len(response.content),
-                        'headers': dict(response.headers)
-                    }
-                    
-                    logger.info(f"HTTP请求 {url} ({ua_name}): ✅ {response.status_code} ({response_time:.2f}s)")
-                    
-                except Exception as e:
-                    results['url_tests'][url][ua_name] = {
-                        'success': False,
-                        'error': str(e)
-                    }
-                    logger.error(f"HTTP请求 {url} ({ua_name}): ❌ {e}")
+        
+        with ThreadPoolExecutor(max_workers=len(self.test_urls)) as executor:
+            futures = {executor.submit(self._probe_url, url): url for url in self.test_urls}
+            for future in as_completed(futures):
+                results['url_tests'][futures[future]] = future.result()
         
         return results
     
+    def _probe_url(self, url: str) -> Dict[str, Dict[str, Any]]:
+        """
+        依次使用各User-Agent请求同一URL（在线程池中执行）
+        
+        Args:
+            url: 请求地址
+            
+        Returns:
+            {User-Agent名称: 请求测试结果}
+        """
+        return {ua_name: self._probe_http(url, ua_name, headers) for ua_name, headers in self.USER_AGENT_HEADERS}
+    
+    def _probe_http(self, url: str, ua_name: str, headers: Dict[str, str]) -> Dict[str, Any]:
+        """
+        使用指定User-Agent请求单个URL（在线程池中执行）
+        
+        Args:
+            url: 请求地址
+            ua_name: User-Agent名称
+            headers: 预先构建的请求头，空字典表示使用默认User-Agent
+            
+        Returns:
+            请求测试结果
+        """
+        try:
+            # 流式请求：收到响应头即停止计时，不下载完整正文
+            start_time = time.time()
+            with self.session.get(url, headers=headers, timeout=15, verify=False, stream=True) as response:
+                response_time = time.time() - start_time
+                
+                # 优先使用Content-Length；没有时最多读取 HTTP_PROBE_MAX_READ 字节，超出部分视为截断。
+                # 不超过该大小的正文完整读完，连接才能放回连接池供下一个User-Agent复用；
+                # 更大的正文不再下载，关闭响应时连接随之丢弃
+                content_truncated = False
+                if 'content-length' in response.headers:
+                    content_length = int(response.headers['content-length'])
+                    if content_length <= HTTP_PROBE_MAX_READ:
+                        _ = response.content
+                else:
+                    body = b''
+                    for chunk in response.iter_content(chunk_size=8192):
+                        body += chunk
+                        if len(body) > HTTP_PROBE_MAX_READ:
+                            content_truncated = True
+                            break
+                    content_length = min(len(body), HTTP_PROBE_MAX_READ)
+                
+                logger.info(f"HTTP请求 {url} ({ua_name}): ✅ {response.status_code} ({response_time:.2f}s)")
+                
+                # 默认只保留少量用于判断服务端和拦截情况的响应头
+                if self.verbose:
+                    kept_headers = dict(response.headers)
+                else:
+                    kept_headers = {key: response.headers[key] for key in KEEP_HEADERS if key in response.headers}
+                
+                return {
+                    'success': True,
+                    'status_code': response.status_code,
+                    'response_time': response_time,
+                    'content_length': content_length,
+                    'content_truncated': content_truncated,
+                    'set_cookie': 'set-cookie' in response.headers,
+                    'headers': kept_headers
+                }
+            
+        except Exception as e:
+            logger.error(f"HTTP请求 {url} ({ua_name}): ❌ {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
     def test_akshare_functions(self) -> Dict[str, Any]:
         """测试akshare具体功能"""
         logger.info("测试akshare具体功能...")
@@ -195,6 +451,19 @@ class NetworkDiagnostic:
             'akshare_tests': {}
         }
         
+        # akshare 会连带加载pandas、lxml等大量模块，只在需要测试时才导入；
+        # 未安装时记录失败，其余网络测试不受影响
+        try:
+            import akshare as ak
+        except ImportError as e:
+            results['akshare_tests']['import'] = {
+                'success': False,
+                'error': str(e),
+                'error_type': type(e).__name__
+            }
+            logger.error(f"akshare 导入失败: {e}")
+            return results
+        
         # 测试不同的akshare函数
         test_functions = [
             ('stock_zh_a_spot_em', lambda: ak.stock_zh_a_spot_em()),
@@ -202,31 +471,61 @@ class NetworkDiagnostic:
             ('stock_individual_info_em', lambda: ak.stock_individual_info_em(symbol="000001"))
         ]
         
-        for func_name, func in test_functions:
-            try:
-                start_time = time.time()
-                result = func()
-                response_time = time.time() - start_time
-                
-                results['akshare_tests'][func_name] = {
-                    'success': True,
-                    'response_time': response_time,
-                    'data_shape': result.shape if hasattr(result, 'shape') else None,
-                    'data_type': str(type(result))
-                }
-                
-                logger.info(f"akshare {func_name}: ✅ 成功 ({response_time:.2f}s)")
-                
-            except Exception as e:
-                results['akshare_tests'][func_name] = {
-                    'success': False,
-                    'error': str(e),
-                    'error_type': type(e).__name__
-                }
-                logger.error(f"akshare {func_name}: ❌ {e}")
+        # 各函数并发调用，并设置总超时，避免某个接口卡住时拖住其余测试
+        executor = ThreadPoolExecutor(max_workers=len(test_functions))
+        futures = {executor.submit(self._run_akshare_function, func_name, func): func_name
+                   for func_name, func in test_functions}
+        try:
+            for future in as_completed(futures, timeout=AKSHARE_TEST_TIMEOUT):
+                results['akshare_tests'][futures[future]] = future.result()
+        except FuturesTimeoutError:
+            for future, func_name in futures.items():
+                if func_name not in results['akshare_tests']:
+                    results['akshare_tests'][func_name] = {
+                        'success': False,
+                        'error': f"{AKSHARE_TEST_TIMEOUT}秒内未返回",
+                        'error_type': 'TimeoutError'
+                    }
+                    logger.error(f"akshare {func_name}: ❌ 超时")
+        finally:
+            # 不等待卡住的调用结束，线程在后台自行退出
+            executor.shutdown(wait=False, cancel_futures=True)
         
         return results
     
+    def _run_akshare_function(self, func_name: str, func) -> Dict[str, Any]:
+        """
+        调用单个akshare函数并记录耗时（在线程池中执行）
+        
+        Args:
+            func_name: 函数名
+            func: 无参数的调用函数
+            
+        Returns:
+            测试结果
+        """
+        try:
+            start_time = time.time()
+            result = func()
+            response_time = time.time() - start_time
+            
+            logger.info(f"akshare {func_name}: ✅ 成功 ({response_time:.2f}s)")
+            
+            return {
+                'success': True,
+                'response_time': response_time,
+                'data_shape': result.shape if hasattr(result, 'shape') else None,
+                'data_type': str(type(result))
+            }
+            
+        except Exception as e:
+            logger.error(f"akshare {func_name}: ❌ {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': type(e).__name__
+            }
+    
     def test_proxy_detection(self) -> Dict[str, Any]:
         """检测代理设置"""
         logger.info("检测代理设置...")
@@ -249,10 +548,9 @@ class NetworkDiagnostic:
         
         # 检查requests的代理设置
         try:
-            session = requests.Session()
             results['requests_proxy'] = {
-                'proxies': session.proxies,
-                'trust_env': session.trust_env
+                'proxies': self.session.proxies,
+                'trust_env': self.session.trust_env
             }
         except Exception as e:
             results['requests_proxy']['error'] = str(e)
@@ -278,42 +576,69 @@ class NetworkDiagnostic:
         except Exception as e:
             logger.error(f"获取本地IP失败: {e}")
         
-        try:
-            # 获取公网IP
-            response = requests.get('https://httpbin.org/ip', timeout=10)
-            if response.status_code == 200:
-                results['public_ip'] = response.json().get('origin')
-        except Exception as e:
-            logger.error(f"获取公网IP失败: {e}")
+        results['public_ip'] = self._get_public_ip()
         
         try:
-            # 获取DNS服务器
-            import subprocess
-            result = subprocess.run(['nslookup', 'baidu.com'], capture_output=True, text=True, timeout=10)
-            # 简单解析DNS服务器信息
-            if 'Server:' in result.stdout:
-                lines = result.stdout.split('\n')
-                for line in lines:
-                    if 'Server:' in line:
-                        dns_server = line.split('Server:')[1].strip()
-                        if dns_server:
-                            results['dns_servers'].append(dns_server)
+            # 获取DNS服务器：直接读取系统解析配置（/etc/resolv.conf 或 Windows 注册表），
+            # 不需要启动子进程，也不发起DNS查询
+            results['dns_servers'] = [str(server) for server in self.resolver.nameservers]
         except Exception as e:
             logger.error(f"获取DNS服务器失败: {e}")
         
         return results
     
+    def _get_public_ip(self) -> Optional[str]:
+        """
+        获取公网IP，同一诊断器内只探测一次
+        
+        优先使用纯HTTP的 ifconfig.me（无需TLS握手），失败时再退回 httpbin.org
+        
+        Returns:
+            公网IP，全部失败时返回None
+        """
+        if self._public_ip is not None:
+            return self._public_ip
+        
+        try:
+            response = self.session.get('http://ifconfig.me/ip', timeout=5)
+            if response.status_code == 200 and response.text.strip():
+                self._public_ip = response.text.strip()
+                return self._public_ip
+        except Exception as e:
+            logger.warning(f"通过 ifconfig.me 获取公网IP失败，改用 httpbin.org: {e}")
+        
+        try:
+            response = self.session.get('https://httpbin.org/ip', timeout=10)
+            if response.status_code == 200:
+                self._public_ip = response.json().get('origin')
+        except Exception as e:
+            logger.error(f"获取公网IP失败: {e}")
+        
+        return self._public_ip
+    
     def run_full_diagnostic(self) -> Dict[str, Any]:
         """运行完整诊断"""
         logger.info("开始网络诊断...")
         
-        # 运行所有测试
-        self.results['tests']['basic_connectivity'] = self.test_basic_connectivity()
-        self.results['tests']['ssl_connectivity'] = self.test_ssl_connectivity()
-        self.results['tests']['http_requests'] = self.test_http_requests()
-        self.results['tests']['akshare_functions'] = self.test_akshare_functions()
-        self.results['tests']['proxy_detection'] = self.test_proxy_detection()
-        self.results['tests']['network_info'] = self.get_network_info()
+        # 各项测试之间没有依赖，且基本都在等待网络I/O，并发运行，总耗时接近最慢的一项
+        tests = [
+            ('basic_connectivity', self.test_basic_connectivity),
+            ('ssl_connectivity', self.test_ssl_connectivity),
+            ('http_requests', self.test_http_requests),
+            ('akshare_functions', self.test_akshare_functions),
+            ('proxy_detection', self.test_proxy_detection),
+            ('network_info', self.get_network_info)
+        ]
+        
+        try:
+            with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+                futures = [(name, executor.submit(test)) for name, test in tests]
+                
+                # 按固定顺序写入结果，保证报告结构稳定
+                for name, future in futures:
+                    self.results['tests'][name] = future.result()
+        finally:
+            self.session.close()
         
         return self.results
     
@@ -322,8 +647,10 @@ class NetworkDiagnostic:
         import os
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
+        # 先整体编码再一次写入：json.dump 会把每个片段分别写入文件，片段数与值的数量同级
+        report = json.dumps(self.results, ensure_ascii=False, indent=2, default=str)
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, ensure_ascii=False, indent=2, default=str)
+            f.write(report)
         
         logger.info(f"诊断报告已生成: {output_file}")
         
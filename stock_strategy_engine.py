@@ -5,7 +5,7 @@
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Iterator
 import logging
 from datetime import datetime, timedelta
 from database import DatabaseManager
@@ -247,19 +247,22 @@ class StockStrategyEngine:
             logger.error(f"计算价格动量失败 {symbol}: {e}")
             return 0.0
     
-    def execute_strategy(self, strategy_name: str, 
-                        max_results: int = 50,
-                        custom_filters: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    def iter_execute_strategy(self, strategy_name: str, 
+                              max_results: int = 50,
+                              custom_filters: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
         """
-        执行指定策略
+        逐只产出策略选股结果
+        
+        评分结果已按综合评分降序排列，因此按顺序产出的行即为最终排序，
+        调用方可以边取边写，无需先把全部结果组装成DataFrame
         
         Args:
             strategy_name: 策略名称
             max_results: 最大返回结果数
             custom_filters: 自定义筛选条件
             
-        Returns:
-            选股结果DataFrame
+        Yields:
+            选股结果字典（一只股票一行）
         """
         if strategy_name not in self.strategies:
             raise ValueError(f"未知策略: {strategy_name}")
@@ -272,13 +275,13 @@ class StockStrategyEngine:
             stock_list = self.db.get_stock_list()
             if stock_list.empty:
                 logger.warning("没有可用的股票数据")
-                return pd.DataFrame()
+                return
             
             symbols = stock_list['symbol'].tolist()
             logger.info(f"获取到 {len(symbols)} 只股票")
             
-            # 2. 应用技术指标筛选
-            strategy_filters = strategy_config.get('filters', {})
+            # 2. 应用技术指标筛选（复制一份，避免自定义条件污染共享的策略配置）
+            strategy_filters = dict(strategy_config.get('filters', {}))
             if custom_filters:
                 strategy_filters.update(custom_filters)
             
@@ -286,7 +289,7 @@ class StockStrategyEngine:
             
             if not filtered_symbols:
                 logger.warning("技术筛选后没有符合条件的股票")
-                return pd.DataFrame()
+                return
             
             # 3. 计算综合评分
             logger.info(f"开始计算 {len(filtered_symbols)} 只股票的综合评分...")
@@ -296,85 +299,104 @@ class StockStrategyEngine:
             
             if scores_df.empty:
                 logger.warning("评分计算后没有有效结果")
-                return pd.DataFrame()
+                return
             
             # 4. 应用评分筛选
             min_score = strategy_filters.get('min_score', 0)
             scores_df = scores_df[scores_df['comprehensive_score'] >= min_score]
+            scores_df = scores_df.sort_values('comprehensive_score', ascending=False, kind='stable')
             
-            # 5. 添加额外的市场数据
-            enhanced_results = []
+        except Exception as e:
+            logger.error(f"执行策略 {strategy_name} 时出错: {e}")
+            return
+        
+        # 5. 添加额外的市场数据，逐只产出
+        produced = 0
+        
+        for _, row in scores_df.head(max_results * 2).iterrows():  # 多取一些以备筛选
+            if produced >= max_results:
+                break
             
-            for _, row in scores_df.head(max_results * 2).iterrows():  # 多取一些以备筛选
-                symbol = row['symbol']
-                
-                try:
-                    # 获取最新市场数据
-                    latest_data = self.db.get_stock_data(symbol, days=1)
-                    if latest_data.empty:
-                        continue
-                    
-                    latest = latest_data.iloc[-1]
-                    
-                    # 计算额外指标
-                    price_change_5d = self.calculate_price_momentum(symbol, 5)
-                    
-                    # 获取股票基本信息
-                    stock_info = stock_list[stock_list['symbol'] == symbol]
-                    stock_name = stock_info['name'].iloc[0] if not stock_info.empty else symbol
-                    
-                    result_row = {
-                        'symbol': symbol,
-                        'name': stock_name,
-                        'close': latest['close'],
-                        'comprehensive_score': row['comprehensive_score'],
-                        'technical_score': row.get('technical_score', 0),
-                        'momentum_score': row.get('momentum_score', 0),
-                        'volume_score': row.get('volume_score', 0),
-                        'volatility_score': row.get('volatility_score', 0),
-                        'price_change_5d': price_change_5d,
-                        'volume': latest.get('volume', 0),
-                        'turnover_rate': latest.get('turnover_rate', 0),
-                        'strategy': strategy_name,
-                        'selection_date': datetime.now().strftime('%Y-%m-%d'),
-                        'selection_time': datetime.now().strftime('%H:%M:%S')
-                    }
-                    
-                    # 应用最终筛选条件
-                    include_result = True
-                    
-                    # 5日涨跌幅筛选
-                    if 'min_price_change_5d' in strategy_filters:
-                        if price_change_5d < strategy_filters['min_price_change_5d']:
-                            include_result = False
-                    
-                    # 波动率筛选
-                    if 'max_volatility' in strategy_filters:
-                        volatility_score = row.get('volatility_score', 0)
-                        if volatility_score > strategy_filters['max_volatility']:
-                            include_result = False
-                    
-                    if include_result:
-                        enhanced_results.append(result_row)
-                        
-                except Exception as e:
-                    logger.error(f"处理股票 {symbol} 时出错: {e}")
-                    continue
+            symbol = row['symbol']
             
-            # 6. 转换为DataFrame并排序
-            if enhanced_results:
-                result_df = pd.DataFrame(enhanced_results)
-                result_df = result_df.sort_values('comprehensive_score', ascending=False)
-                result_df = result_df.head(max_results).reset_index(drop=True)
+            try:
+                # 获取最新市场数据
+                latest_data = self.db.get_stock_data(symbol, days=1)
+                if latest_data.empty:
+                    continue
                 
-                logger.info(f"策略 {strategy_name} 执行完成，选出 {len(result_df)} 只股票")
-                return result_df
-            else:
-                logger.warning(f"策略 {strategy_name} 执行完成，但没有符合条件的股票")
-                return pd.DataFrame()
+                latest = latest_data.iloc[-1]
                 
-        except Exception as e:
-            logger.error(f"执行策略 {strategy_name} 时出错: {e}")
+                # 计算额外指标
+                price_change_5d = self.calculate_price_momentum(symbol, 5)
+                
+                # 获取股票基本信息
+                stock_info = stock_list[stock_list['symbol'] == symbol]
+                stock_name = stock_info['name'].iloc[0] if not stock_info.empty else symbol
+                
+                result_row = {
+                    'symbol': symbol,
+                    'name': stock_name,
+                    'close': latest['close'],
+                    'comprehensive_score': row['comprehensive_score'],
+                    'technical_score': row.get('technical_score', 0),
+                    'momentum_score': row.get('momentum_score', 0),
+                    'volume_score': row.get('volume_score', 0),
+                    'volatility_score': row.get('volatility_score', 0),
+                    'price_change_5d': price_change_5d,
+                    'volume': latest.get('volume', 0),
+                    'turnover_rate': latest.get('turnover_rate', 0),
+                    'strategy': strategy_name,
+                    'selection_date': datetime.now().strftime('%Y-%m-%d'),
+                    'selection_time': datetime.now().strftime('%H:%M:%S')
+                }
+                
+                # 应用最终筛选条件
+                include_result = True
+                
+                # 5日涨跌幅筛选
+                if 'min_price_change_5d' in strategy_filters:
+                    if price_change_5d < strategy_filters['min_price_change_5d']:
+                        include_result = False
+                
+                # 波动率筛选
+                if 'max_volatility' in strategy_filters:
+                    volatility_score = row.get('volatility_score', 0)
+                    if volatility_score > strategy_filters['max_volatility']:
+                        include_result = False
+                
+                if include_result:
+                    produced += 1
+                    yield result_row
+                    
+            except Exception as e:
+                logger.error(f"处理股票 {symbol} 时出错: {e}")
+                continue
+    
+    def execute_strategy(self, strategy_name: str, 
+                        max_results: int = 50,
+                        custom_filters: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """
+        执行指定策略
+        
+        Args:
+            strategy_name: 策略名称
+            max_results: 最大返回结果数
+            custom_filters: 自定义筛选条件
+            
+        Returns:
+            选股结果DataFrame
+        """
+        enhanced_results = list(self.iter_execute_strategy(strategy_name, max_results, custom_filters))
+        
+        # 6. 转换为DataFrame（结果已按综合评分降序产出）
+        if enhanced_results:
+            result_df = pd.DataFrame(enhanced_results)
+            
+            logger.info(f"策略 {strategy_name} 执行完成，选出 {len(result_df)} 只股票")
+            return result_df
+        else:
+            logger.warning(f"策略 {strategy_name} 执行完成，但没有符合条件的股票")
             return pd.DataFrame()
     
     def execute_multiple_strategies(self, strategy_names: List[str], 
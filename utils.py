@@ -5,6 +5,7 @@
 
 import yaml
 import os
+import json
 import logging
 from datetime import datetime, date
 from typing import Dict, Any, Optional
@@ -433,6 +434,64 @@ def filter_outliers(data: pd.Series, threshold: float = 3.0) -> pd.Series:
     return data[(data >= lower_bound) & (data <= upper_bound)]
 
 
+def get_failed_log_path(progress_file: str) -> str:
+    """
+    获取批处理进度文件对应的失败股票日志路径
+    
+    Args:
+        progress_file: 批处理进度文件路径
+        
+    Returns:
+        失败股票日志(jsonl)路径
+    """
+    return os.path.splitext(progress_file)[0].replace('_progress', '') + '_failed.jsonl'
+
+
+def append_failed_record(fh, symbol: str, status: str, error: str = ''):
+    """
+    向失败股票日志追加一条记录
+    
+    Args:
+        fh: 以追加模式打开的日志文件
+        symbol: 股票代码
+        status: failed / paused / recovered
+        error: 错误信息
+    """
+    fh.write(json.dumps({'symbol': symbol, 'status': status, 'ts': get_current_timestamp(), 'err': error},
+                        ensure_ascii=False) + '\n')
+
+
+def replay_failed_log(log_path: str, failed: set, paused: set):
+    """
+    按顺序重放失败股票日志，更新失败/暂停集合
+    
+    Args:
+        log_path: 失败股票日志路径
+        failed: 失败股票集合（原地更新）
+        paused: 暂停股票集合（原地更新）
+    """
+    if not os.path.exists(log_path):
+        return
+    
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中断时最后一行可能只写了一半
+                continue
+            
+            symbol = record.get('symbol')
+            status = record.get('status')
+            if status == 'failed':
+                failed.add(symbol)
+            elif status == 'paused':
+                paused.add(symbol)
+            elif status == 'recovered':
+                failed.discard(symbol)
+                paused.discard(symbol)
+
+
 # 全局配置管理器实例
 config_manager = ConfigManager()
 